@@ -0,0 +1,101 @@
+"""File size and read throughput of mapped files in each storage layout.
+
+Run from the repository root:
+
+    python -m benchmarks.layouts --cells 8 --epochs 40 --output benchmarks.jsonl
+
+The synthetic mapped files are migrated to every layout in dissonance.io.LAYOUTS.
+Reads reopen the files every run, so the h5 chunk cache starts empty, but the
+OS page cache is warm after the first run: throughput is decompression bound
+rather than disk bound. Drop the page cache between runs to time true cold reads.
+
+Synthetic traces are float64 noise and barely compress. Recorded traces are
+quantized by the amplifier's ADC and shrink several times with shuffle.
+"""
+import datetime
+import json
+import platform
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import click
+import h5py
+import numpy as np
+
+from .run import commit, measure
+from .synthetic import Dataset, write_dataset
+
+
+def read_responses(paths: List[Path]) -> int:
+    """Read every response and spike train as the epoch types do. Returns samples read."""
+    buffer = np.empty(0)
+    nsamples = 0
+    for path in paths:
+        with h5py.File(path, "r") as f:
+            for epochgrp in f["experiment"].values():
+                ds = epochgrp["Amp1"]
+                n = ds.shape[0]
+                if len(buffer) < n:
+                    buffer = np.empty(n)
+                ds.read_direct(buffer[:n])
+                if "Spikes" in epochgrp:
+                    np.array(epochgrp["Spikes"][:], dtype=int)
+                nsamples += n
+    return nsamples
+
+
+def bench_layout(name: str, sources: List[Path], folder: Path, repeat: int) -> Dict:
+    from dissonance.io import LAYOUTS, migrate
+
+    paths = [folder / name / path.name for path in sources]
+    for path in paths:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    for source, path in zip(sources, paths):
+        migrate(source, LAYOUTS[name], path)
+    writetime = time.perf_counter() - start
+
+    nsamples = read_responses(paths)
+    result = measure(lambda: read_responses(paths), repeat)
+    return dict(
+        result, layout=name, write=writetime,
+        nbytes=sum(path.stat().st_size for path in paths),
+        throughput=nsamples * 8 / result["median"] / 2 ** 20)
+
+
+@click.command()
+@click.option("--files", default=2, help="Experiment files.")
+@click.option("--cells", default=4, help="Cells per file.")
+@click.option("--epochs", default=20, help="Epochs per protocol and light mean.")
+@click.option("--seconds", default=2.0, help="Trace length in seconds at 10 kHz.")
+@click.option("--repeat", default=3, help="Timed reads per layout.")
+@click.option("--only", multiple=True, help="Only benchmark these layouts.")
+@click.option("--output", type=click.Path(path_type=Path), default=None, help="JSON lines file results are appended to.")
+def main(files, cells, epochs, seconds, repeat, only, output):
+    from dissonance.io import LAYOUTS
+
+    dataset = Dataset(files=files, cells=cells, epochs=epochs, seconds=seconds)
+    header = dict(
+        commit=commit(), date=datetime.datetime.now().isoformat(timespec="seconds"),
+        python=platform.python_version(), h5py=h5py.__version__,
+        dataset=dataset.asdict())
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = Path(tmpdir)
+        sources = write_dataset(folder / "source", dataset, symphony=False)
+
+        for name in (only or LAYOUTS):
+            result = dict(header, benchmark="read_layout", **bench_layout(name, sources, folder, repeat))
+            click.echo(
+                f"{name:<12} {result['nbytes'] / 2**20:8.1f} MB  write {result['write']:.3f}s  "
+                f"read median {result['median']:.4f}s  {result['throughput']:8.1f} MB/s")
+            if output is not None:
+                with open(output, "a") as f:
+                    f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Time the load -> query -> analyze -> plot path on synthetic data.
+
+Run from the repository root:
+
+    python -m benchmarks.run --cells 8 --epochs 40 --output benchmarks.jsonl
+
+Each benchmark appends one JSON line to the output file holding the commit, the
+dataset shape and the timings in seconds, so runs can be compared across commits.
+"""
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import click
+import numpy as np
+
+# PLOT WITHOUT A DISPLAY
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtWidgets import QApplication
+
+from .synthetic import Dataset, write_dataset
+
+PARAMNAMES = [
+    "led", "protocolname", "celltype", "genotype", "cellname",
+    "lightmean", "lightamplitude", "tracetype", "startdate", "holdingpotential"]
+SPLITS = [
+    "holdingpotential", "genotype", "lightmean",
+    "celltype", "cellname", "lightamplitude"]
+
+
+def commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def measure(func: Callable, repeat: int, setup: Callable = None) -> Dict:
+    """Time func repeat times. setup is called untimed before each call and its result passed to func."""
+    times = []
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return dict(
+        repeat=repeat, min=min(times), median=float(np.median(times)),
+        mean=float(np.mean(times)), max=max(times))
+
+
+class Suite:
+    """Benchmarks over one synthetic dataset. Each bench_ method times one step of the path."""
+
+    def __init__(self, dataset: Dataset, folder: Path, repeat: int):
+        self.dataset = dataset
+        self.repeat = repeat
+        self.rawdir = folder / "raw"
+        self.mapdir = folder / "mapped"
+
+        self.symphonyfiles = write_dataset(self.rawdir, dataset, symphony=True)
+        self.mappedfiles = write_dataset(self.mapdir, dataset, symphony=False)
+
+        from dissonance import io
+        self.reader = io.DissonanceReader(self.mappedfiles)
+        self.epochio = self.reader.to_epoch_io(PARAMNAMES, nprocesses=1)
+
+    @property
+    def names(self) -> List[str]:
+        return [name[6:] for name in dir(self) if name.startswith("bench_")]
+
+    def run(self, name: str) -> Dict:
+        return getattr(self, f"bench_{name}")()
+
+    def bench_to_h5(self):
+        from dissonance.io import SymphonyIO
+        outputpath = self.rawdir / "to_h5.h5"
+
+        def to_h5():
+            sio = SymphonyIO(self.symphonyfiles[0])
+            try:
+                sio.to_h5(outputpath)
+            finally:
+                sio.close()
+        return measure(to_h5, self.repeat)
+
+    def bench_convert(self):
+        from dissonance.io import SymphonyConverter
+        outputpath = self.rawdir / "convert.h5"
+        return measure(
+            lambda _: SymphonyConverter(self.symphonyfiles[0], nprocesses=1).convert(outputpath, incremental=False),
+            self.repeat, setup=lambda: outputpath.unlink(missing_ok=True))
+
+    def bench_to_params(self):
+        return measure(
+            lambda: self.reader.to_params(PARAMNAMES, nprocesses=1), self.repeat)
+
+    def bench_to_params_cold(self):
+        from dissonance.io import ParamsIndex
+
+        # INDEX IS REBUILT FROM THE H5 FILES
+        def drop_index():
+            for path in self.mappedfiles:
+                ParamsIndex(path).path.unlink(missing_ok=True)
+        return measure(
+            lambda _: self.reader.to_params(PARAMNAMES, nprocesses=1),
+            self.repeat, setup=drop_index)
+
+    def bench_query(self):
+        # ONE QUERY PER CELL AS IF CLICKING THROUGH THE TREE
+        cells = self.epochio.frame.cellname.unique()
+        return measure(
+            lambda: [self.epochio.query([dict(cellname=cell)]) for cell in cells],
+            self.repeat)
+
+    def bench_query_materialize(self):
+        cells = self.epochio.frame.cellname.unique()
+        return measure(
+            lambda: [
+                [len(epoch.trace) for epoch in self.epochio.query([dict(cellname=cell)]).epoch]
+                for cell in cells],
+            self.repeat)
+
+    def bench_tree(self):
+        from dissonance.analysis import AnalysisTree
+        return measure(
+            lambda: AnalysisTree("Benchmark", SPLITS, self.epochio.frame), self.repeat)
+
+    def bench_groupby(self):
+        from dissonance.epochtypes import groupby
+        frame = self.epochio.query([dict(tracetype="spiketrace")])
+        return measure(
+            lambda: groupby(frame, ["cellname", "lightmean", "lightamplitude"]), self.repeat)
+
+    def bench_detect_spikes(self):
+        from dissonance.analysis_functions import detect_spikes
+        traces = [
+            self.dataset.trace(np.random.default_rng(ii), True)[0]
+            for ii in range(self.dataset.epochs)]
+        return measure(
+            lambda: [detect_spikes(trace) for trace in traces], self.repeat)
+
+    def bench_detect_spikes_batch(self):
+        from dissonance.analysis_functions import detect_spikes_batch
+        traces = np.vstack([
+            self.dataset.trace(np.random.default_rng(ii), True)[0]
+            for ii in range(self.dataset.epochs)])
+        return measure(lambda: detect_spikes_batch(traces), self.repeat)
+
+    def bench_psth(self):
+        from dissonance.analysis_functions.psth import calculate_psth
+        epochs = list(self.epochio.query([dict(tracetype="spiketrace")]).epoch)
+        for epoch in epochs:
+            epoch.spikes
+        return measure(
+            lambda: [calculate_psth(epoch) for epoch in epochs], self.repeat)
+
+    def bench_plot(self):
+        from dissonance.analysis import BrowsingAnalysis
+        from dissonance.analysis.charting import MplCanvas
+        from PyQt5.QtWidgets import QWidget
+        analysis = BrowsingAnalysis(SPLITS)
+
+        # SAME CANVAS THE VIEWER DRAWS ON, OFFLINE CANVASES BLOCK ON plt.show
+        parent = QWidget()
+        parent.resize(800, 600)
+        canvas = MplCanvas(parent)
+        frame = self.epochio.frame
+
+        # PLOT THE SUMMARY OF EVERY CELL AND THE FIRST EPOCH OF EACH, AS THE VIEWER WOULD
+        nodes = [
+            ("lightmean", dict(cellname=cell, lightmean=lightmean))
+            for cell, lightmean in frame[["cellname", "lightmean"]].drop_duplicates().values]
+        nodes.extend(
+            ("startdate", dict(startdate=startdate))
+            for startdate in frame.groupby("cellname").startdate.first())
+
+        def plot():
+            for level, filters in nodes:
+                analysis.plot(level, self.epochio.query([filters]), canvas)
+                canvas.draw()
+        return measure(plot, self.repeat)
+
+
+@click.command()
+@click.option("--files", default=2, help="Experiment files.")
+@click.option("--cells", default=4, help="Cells per file.")
+@click.option("--protocols", default=",".join(Dataset().protocols), help="Comma separated protocols each cell runs.")
+@click.option("--epochs", default=20, help="Epochs per protocol and light mean.")
+@click.option("--seconds", default=2.0, help="Trace length in seconds at 10 kHz.")
+@click.option("--repeat", default=3, help="Timed runs per benchmark.")
+@click.option("--only", multiple=True, help="Only run these benchmarks.")
+@click.option("--output", type=click.Path(path_type=Path), default=None, help="JSON lines file results are appended to.")
+@click.option("--workdir", type=click.Path(path_type=Path), default=None, help="Write synthetic files here instead of a temporary folder.")
+def main(files, cells, protocols, epochs, seconds, repeat, only, output, workdir):
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    dataset = Dataset(
+        files=files, cells=cells, protocols=protocols.split(","),
+        epochs=epochs, seconds=seconds)
+    header = dict(
+        commit=commit(), date=datetime.datetime.now().isoformat(timespec="seconds"),
+        python=platform.python_version(), numpy=np.__version__,
+        dataset=dataset.asdict())
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = Path(tmpdir) if workdir is None else workdir
+        start = time.perf_counter()
+        suite = Suite(dataset, folder, repeat)
+        click.echo(f"synthesized {dataset.nepochs} epochs in {time.perf_counter() - start:.1f}s")
+
+        for name in (only or suite.names):
+            result = dict(header, benchmark=name, **suite.run(name))
+            click.echo(f"{name:<20} median {result['median']:.4f}s  min {result['min']:.4f}s")
+            if output is not None:
+                with open(output, "a") as f:
+                    f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Synthetic symphony and mapped dissonance files for benchmarking.
+
+Both writers produce the same experiment for the same Dataset: cells alternate
+between spike (cell attached) and whole cell recordings, each cell runs every
+protocol at every light mean, and spike traces carry spikes at a rate that rises
+during the stimulus. Mapped files look like the output of ``SymphonyIO.to_h5``.
+"""
+import datetime
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import h5py
+import numpy as np
+
+SAMPLERATE = 10000.0
+PRETIME, STIMTIME = 500.0, 10.0
+LIGHTAMPLITUDES = [0.001, 0.004, 0.016, 0.064]
+CELLTYPES = ["RGC\\OFF-transient", "RGC\\OFF-sustained", "RGC\\ON-alpha"]
+PROTOCOLS = ["LedPulse", "LedPulseFamily"]
+
+# SPIKES PER SECOND BEFORE AND DURING RESPONSE
+BASERATE, STIMRATE = 5.0, 80.0
+SPIKE = -20.0 * np.exp(-0.5 * ((np.arange(11) - 5) / 1.5) ** 2)
+
+
+@dataclass
+class Dataset:
+    """Shape of a synthetic experiment.
+
+    Args:
+            files (int): Experiment files, one per recording day
+            cells (int): Cells per file
+            protocols (List[str]): Protocols each cell runs
+            lightmeans (List[float]): Background levels each protocol runs at
+            epochs (int): Epochs per protocol and light mean
+            seconds (float): Trace length at 10 kHz
+            genotype (str): Folder the files are written to
+            seed (int): Seed for traces and spike times
+    """
+    files: int = 2
+    cells: int = 4
+    protocols: List[str] = field(default_factory=lambda: list(PROTOCOLS))
+    lightmeans: List[float] = field(default_factory=lambda: [0.0, 0.5])
+    epochs: int = 20
+    seconds: float = 2.0
+    genotype: str = "GG2 KO"
+    seed: int = 0
+
+    @property
+    def samples(self) -> int:
+        return int(self.seconds * SAMPLERATE)
+
+    @property
+    def nepochs(self) -> int:
+        return self.files * self.cells * len(self.protocols) * len(self.lightmeans) * self.epochs
+
+    def asdict(self) -> Dict:
+        return dict(asdict(self), samples=self.samples, nepochs=self.nepochs)
+
+    def filenames(self) -> List[str]:
+        # SYMPHONYIO READS THE EXPERIMENT DATE FROM THE FILE NAME
+        return [f"2022-01-15{chr(ord('A') + ii)}.h5" for ii in range(self.files)]
+
+    def epochs_for(self, fileidx: int) -> Iterator[Tuple]:
+        """(cell, protocol, lightmean, lightamplitude, startdate, spiketrace) for each epoch in file"""
+        start = datetime.datetime(2022, 1, 15, 9) + datetime.timedelta(days=fileidx)
+        seconds = 0
+        for cc in range(self.cells):
+            for protocol in self.protocols:
+                for lightmean in self.lightmeans:
+                    for ee in range(self.epochs):
+                        seconds += self.seconds + 1
+                        # ONLY THE FAMILY STEPS THROUGH AMPLITUDES
+                        yield (
+                            cc, protocol, lightmean,
+                            LIGHTAMPLITUDES[ee % len(LIGHTAMPLITUDES) if protocol == "LedPulseFamily" else -1],
+                            start + datetime.timedelta(seconds=seconds),
+                            cc % 2 == 0)
+
+    def trace(self, rng: np.random.Generator, spiketrace: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """Response trace and the indices of the spikes in it"""
+        n = self.samples
+        if not spiketrace:
+            # SLOW INWARD CURRENT AFTER STIMULUS ON TOP OF NOISE
+            t = np.arange(n) - int(PRETIME * 10)
+            response = np.where(t > 0, -50.0 * (t / 2000.0) * np.exp(1 - t / 2000.0), 0.0)
+            return rng.normal(scale=2.0, size=n) + response, np.array([], dtype=int)
+
+        rate = np.full(n, BASERATE / SAMPLERATE)
+        onset = int(PRETIME * 10)
+        rate[onset:onset + int(0.3 * SAMPLERATE)] = STIMRATE / SAMPLERATE
+        spikes = np.flatnonzero(rng.random(n) < rate)
+        spikes = spikes[(spikes >= len(SPIKE)) & (spikes < n - len(SPIKE))]
+        # REFRACTORY PERIOD
+        spikes = spikes[np.diff(spikes, prepend=-100) > 20]
+
+        trace = rng.normal(scale=0.5, size=n)
+        for offset, val in enumerate(SPIKE):
+            trace[spikes + offset - len(SPIKE) // 2] += val
+        return trace, spikes
+
+
+def ticks(date: datetime.datetime) -> int:
+    return (date - datetime.datetime(1, 1, 1)) // datetime.timedelta(microseconds=1) * 10
+
+
+def write_symphony_file(filepath: Path, dataset: Dataset, fileidx: int = 0) -> Path:
+    """Symphony file for the fileidx'th recording day of dataset"""
+    rng = np.random.default_rng((dataset.seed, fileidx))
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    with h5py.File(filepath, "w") as f:
+        experiment = f.create_group("experiment-0000")
+        blocks = dict()
+        for ii, (cc, protocolname, lightmean, lightamplitude, startdate, spiketrace) in enumerate(dataset.epochs_for(fileidx)):
+            cellpath = f"epochGroups/epochGroup-{cc:04d}"
+            if cellpath not in experiment:
+                cell = experiment.create_group(cellpath)
+                cell.create_group("source").attrs["label"] = f"c{cc}"
+                cell.create_group("source/properties").attrs["type"] = CELLTYPES[cc % len(CELLTYPES)]
+
+            # ONE BLOCK PER CELL, PROTOCOL AND LIGHT MEAN
+            key = (cc, protocolname, lightmean)
+            if key not in blocks:
+                blocks[key] = experiment.create_group(
+                    f"{cellpath}/epochBlocks/edu.wisc.sinhalab.protocols.{protocolname}-{len(blocks):04d}")
+                blocks[key].create_group("protocolParameters").attrs.update(dict(
+                    led="Green LED", lightAmplitude=LIGHTAMPLITUDES[-1], lightMean=lightmean,
+                    preTime=PRETIME, stimTime=STIMTIME, tailTime=dataset.seconds * 1000 - PRETIME - STIMTIME,
+                    sampleRate=SAMPLERATE, numberOfAverages=float(dataset.epochs)))
+            block = blocks[key]
+
+            epoch = block.create_group(f"epochs/epoch-{ii:04d}")
+            epoch.attrs["startTimeDotNetDateTimeOffsetTicks"] = ticks(startdate)
+            epoch.attrs["endTimeDotNetDateTimeOffsetTicks"] = ticks(
+                startdate + datetime.timedelta(seconds=dataset.seconds))
+            epoch.create_group("protocolParameters").attrs.update(dict(
+                ndf=1.0, lightAmplitude=lightamplitude))
+            epoch.create_group("backgrounds/Amp1-0000").attrs["value"] = 0.0 if spiketrace else -60.0
+
+            trace, _ = dataset.trace(rng, spiketrace)
+            data = np.empty(len(trace), dtype=[("quantity", "<f8"), ("units", "S2")])
+            data["quantity"], data["units"] = trace, b"pA"
+            response = epoch.create_group("responses/Amp1-0000")
+            response.attrs.update(dict(sampleRate=SAMPLERATE, sampleRateUnits="Hz"))
+            response.create_dataset("data", data=data)
+
+            stimulus = epoch.create_group("stimuli/Green LED-0000/parameters")
+            stimulus.attrs.update(dict(amplitude=lightamplitude, mean=lightmean))
+    return filepath
+
+
+def write_mapped_file(filepath: Path, dataset: Dataset, fileidx: int = 0) -> Path:
+    """Mapped dissonance file for the fileidx'th recording day of dataset, spikes included"""
+    rng = np.random.default_rng((dataset.seed, fileidx))
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    expdate = filepath.stem[:10].replace("-", "")
+    with h5py.File(filepath, "w") as f:
+        experiment = f.create_group("experiment")
+        for ii, (cc, protocolname, lightmean, lightamplitude, startdate, spiketrace) in enumerate(dataset.epochs_for(fileidx)):
+            grp = experiment.create_group(f"epoch{startdate.timestamp()}")
+            grp.attrs.update(dict(
+                path=f"/experiment-0000/epochGroups/epochGroup-{cc:04d}/epochs/epoch-{ii:04d}",
+                cellname=f"{expdate}{filepath.stem[10:]}_c{cc}", celltype=CELLTYPES[cc % len(CELLTYPES)],
+                genotype=dataset.genotype, protocolname=protocolname,
+                tracetype="spiketrace" if spiketrace else "wholetrace",
+                holdingpotential="nan" if spiketrace else "excitation",
+                startdate=str(startdate), enddate=str(startdate + datetime.timedelta(seconds=dataset.seconds)),
+                interpulseinterval=0, led="Green LED", numberofaverages=float(dataset.epochs),
+                pretime=PRETIME, stimtime=STIMTIME, tailtime=dataset.seconds * 1000 - PRETIME - STIMTIME,
+                samplerate=SAMPLERATE, ndf=1.0, backgroundval=0.0 if spiketrace else -60.0,
+                lightamplitude=lightamplitude, lightmean=lightmean,
+                lightamplitudeSU=lightamplitude, lightmeanSU=lightmean))
+
+            trace, spikes = dataset.trace(rng, spiketrace)
+            grp.create_dataset("Amp1", data=trace, dtype=float)
+            if spiketrace:
+                grp.create_dataset("Spikes", data=spikes, dtype=float)
+            grp.create_group("stimuli/Green LED").attrs.update(dict(
+                amplitude=lightamplitude, mean=lightmean))
+    return filepath
+
+
+def write_dataset(folder: Path, dataset: Dataset, symphony: bool = True) -> List[Path]:
+    """Write every file of dataset to folder/genotype. Symphony files if symphony else mapped."""
+    writer = write_symphony_file if symphony else write_mapped_file
+    return [
+        writer(folder / dataset.genotype / name, dataset, ii)
+        for ii, name in enumerate(dataset.filenames())]
@@ -162,5 +162,79 @@ def browse(paramname: str):
     open_browsing_window(folders, gui_params)
 
 
+@cli.command()
+@click.argument("folders", nargs=-1, type=click.STRING)
+@click.option("--processes", "-n", type=click.INT, default=None, help="Spike detection workers. Defaults to cpu count.")
+@click.option("--protocol", type=click.STRING, default=None, help="Only convert epochs of this protocol.")
+@click.option("--restart", is_flag=True, help="Rewrite every epoch, even if unchanged.")
+@click.option("--layout", type=click.Choice(list(io.LAYOUTS)), default="gzip", help="How responses and spikes are stored.")
+def convert(folders, processes: int, protocol: str, restart: bool, layout: str):
+    """Convert symphony files in RAW_DIR/FOLDER to dissonance files in MAP_DIR/FOLDER"""
+    for folder in folders:
+        wodir = MAP_DIR / folder
+        for file in sorted((RAW_DIR / folder).glob("*.h5")):
+            try:
+                converter = io.SymphonyConverter(
+                    file, nprocesses=processes, layout=io.LAYOUTS[layout])
+                converter.convert(wodir / file.name, protocolname=protocol, incremental=not restart)
+            except Exception as e:
+                logger.error(f"Couldn't convert {file}")
+                logger.error(e)
+
+
+@cli.command()
+@click.argument("folders", nargs=-1, type=click.STRING)
+@click.option("--layout", type=click.Choice(list(io.LAYOUTS)), default="gzip", help="Layout to rewrite responses and spikes with.")
+def migrate(folders, layout: str):
+    """Rewrite MAP_DIR/FOLDER files with another storage layout"""
+    for folder in folders:
+        for file in sorted((MAP_DIR / folder).glob("*.h5")):
+            try:
+                before = file.stat().st_size
+                nepochs = io.migrate(file, io.LAYOUTS[layout])
+                logger.info(
+                    f"{file.name}: {nepochs} epochs, {before / 2**20:.1f} MB -> {file.stat().st_size / 2**20:.1f} MB")
+            except Exception as e:
+                logger.error(f"Couldn't migrate {file}")
+                logger.error(e)
+
+
+@cli.command()
+@click.argument("paramname", type=click.Choice(list(parameters)))
+@click.option("--folder", "folders", multiple=True, help="Folders in MAP_DIR to analyze. Defaults to the preset's genotypes.")
+@click.option("--output", "-o", type=click.Path(path_type=Path), default=Path("."), help="Folder tables are written to.")
+@click.option("--processes", "-n", type=click.INT, default=None, help="Cells summarized in parallel. Defaults to cpu count.")
+@click.option("--format", "fmt", type=click.Choice(["csv", "parquet"]), default="csv", help="Table file format.")
+def analyze(paramname: str, folders, output: Path, processes: int, fmt: str):
+    """Write per-cell and per-genotype metrics and Hill/Weber fits of a preset without the viewer"""
+    from .analysis import summary
+
+    presetfolders, params = parameters[paramname]
+    paths = io.dissonanceio.get_files(folders or presetfolders, root=MAP_DIR)
+    frame = summary.load_params(
+        paths, params.paramnames, params.protocols, params.filter_path,
+        nprocesses=processes or 5)
+    logger.info(f"{paramname}: summarizing {frame.cellname.nunique()} cells")
+
+    tables = summary.summarize(frame, nprocesses=processes)
+    for path in summary.write_tables(tables, output, paramname, fmt):
+        logger.info(f"Wrote {path}")
+
+
+@cli.command()
+@click.argument("folders", nargs=-1, type=click.STRING)
+@click.option("--restart", is_flag=True, help="Recompute metrics that are already stored.")
+def derive(folders, restart: bool):
+    """Store metrics and PSTHs of every epoch in MAP_DIR/FOLDER files"""
+    for folder in folders:
+        for file in sorted((MAP_DIR / folder).glob("*.h5")):
+            try:
+                written = io.DissonanceUpdater(file).derive(restart=restart)
+                logger.info(f"{file.name}: derived metrics for {written} epochs")
+            except Exception as e:
+                logger.error(f"Couldn't derive metrics for {file}")
+                logger.error(e)
+
+
 if __name__ == "__main__":
     cli()
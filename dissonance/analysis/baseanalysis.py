@@ -28,6 +28,16 @@ class IAnalysis(ABC):
     def tracestype(self) -> EpochBlock:
         ...
 
+    def prepare(self, level: str, eframe: pd.DataFrame):
+        """Read and compute everything plot needs for eframe.
+
+        Runs off the GUI thread, so it must not touch the canvas.
+
+        Returns:
+                object: Passed to plot as grps
+        """
+        return None
+
     @abstractproperty
-    def plot(self, eframe: pd.DataFrame, canvas: MplCanvas = None):
+    def plot(self, level: str, eframe: pd.DataFrame, canvas: MplCanvas = None, grps=None):
         ...
@@ -17,8 +17,24 @@ class BrowsingAnalysis(IAnalysis):
     def __str__(self):
         return type(self).__name__
 
-    def plot(self, level: str, eframe: pd.DataFrame, canvas: MplCanvas = None):
+    def prepare(self, level: str, eframe: pd.DataFrame) -> pd.DataFrame:
+        """Group epochs and compute the PSTHs and mean traces the summary plots use"""
+        if level not in ("lightmean", "lightamplitude"):
+            return None
+
+        grps = groupby(eframe, self.labels)
+        for epochs in grps.epoch:
+            if epochs.type == "spiketrace":
+                epochs.psth
+            else:
+                epochs.trace
+        return grps
+
+    def plot(self, level: str, eframe: pd.DataFrame, canvas: MplCanvas = None, grps: pd.DataFrame = None):
         """Map node level to analysis run & plots created.
+
+        Args:
+                grps (pd.DataFrame): Result of prepare. Grouped here if not provided.
         """
         self.currentplots = []
         self.canvas = canvas
@@ -26,9 +42,9 @@ class BrowsingAnalysis(IAnalysis):
         if level == "startdate":
             self.plot_single_epoch(eframe, self.canvas)
         elif level == "lightmean":
-            self.plot_summary_epochs(eframe, self.canvas)
+            self.plot_summary_epochs(eframe, self.canvas, grps)
         elif level == "lightamplitude":
-            self.plot_summary_epochs(eframe, self.canvas)
+            self.plot_summary_epochs(eframe, self.canvas, grps)
 
     def plot_single_epoch(self, eframe: pd.DataFrame, canvas):
 
@@ -37,12 +53,13 @@ class BrowsingAnalysis(IAnalysis):
         plttr = PlotTrace(axes[0], epoch)
         self.currentplots.append(plttr)
 
-    def plot_summary_epochs(self, eframe: pd.DataFrame, canvas: MplCanvas = None):
+    def plot_summary_epochs(self, eframe: pd.DataFrame, canvas: MplCanvas = None, grps: pd.DataFrame = None):
         """Plot faceted mean psth
         """
+        if grps is None:
+            grps = groupby(eframe, self.labels)
 
         if eframe.tracetype.iloc[0] == "spiketrace":
-            grps = groupby(eframe, self.labels)
             n, m = grps.shape[0], 2
             axes = canvas.grid_axis(n, m)
             axii = 0
@@ -62,13 +79,6 @@ class BrowsingAnalysis(IAnalysis):
                 self.currentplots.extend([pltpsth, pltraster])
 
         elif eframe.tracetype.iloc[0] == "wholetrace":
-            grps = groupby(eframe, self.labels)
-            n, m = grps.shape[0], 2
-            axes = canvas.grid_axis(n, m)
-            axii = 0
-
-            grps = groupby(eframe, self.labels)
-
             # BUILD GRID
             n = grps.shape[0]
             axes = canvas.grid_axis(n, 1)
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Tuple
+
+import pandas as pd
+
+# 512 MB
+DEFAULT_MAXBYTES = 512 * 2 ** 20
+
+
+def selection_key(level: str, filters: List[Dict], useincludeflag: bool = True) -> Tuple:
+    """Hashable key of a tree selection. Independent of the order nodes were selected in."""
+    paths = sorted(
+        (tuple(path.items()) for path in filters),
+        key=repr)
+    return level, tuple(paths), useincludeflag
+
+
+def result_nbytes(eframe: pd.DataFrame, grps: pd.DataFrame = None) -> int:
+    """Approximate bytes held by a query and the groups prepared from it"""
+    nbytes = int(eframe.memory_usage(index=True).sum())
+    if grps is not None:
+        nbytes += sum(epochs.nbytes for epochs in grps.epoch)
+    return nbytes
+
+
+class ResultCache:
+    """Least recently used results bounded by their total size.
+
+    Entries are stored with a token describing the data they were computed from
+    (e.g. params version and row positions). A lookup with a different token is
+    a miss and drops the entry.
+
+    Args:
+            maxbytes (int): Budget for all entries. Oldest entries are evicted past it.
+    """
+
+    def __init__(self, maxbytes: int = DEFAULT_MAXBYTES):
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, token: Any = None) -> Any:
+        """Value stored for key if it was stored with token, else None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        storedtoken, value, _ = entry
+        if storedtoken != token:
+            self.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any, nbytes: int, token: Any = None) -> bool:
+        """Store value. Values larger than the whole budget aren't stored.
+
+        Returns:
+                bool: Whether value was stored
+        """
+        self.pop(key)
+        if nbytes > self.maxbytes:
+            return False
+
+        while self._entries and self.nbytes + nbytes > self.maxbytes:
+            self.pop(next(iter(self._entries)))
+
+        self._entries[key] = (token, value, nbytes)
+        self.nbytes += nbytes
+        return True
+
+    def pop(self, key: Hashable) -> Any:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.nbytes -= entry[2]
+        return entry[1]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.nbytes = 0
@@ -0,0 +1,90 @@
+from typing import Tuple
+
+import numpy as np
+from matplotlib.axes import Axes
+from matplotlib.lines import Line2D
+
+# POINTS KEPT FOR A BIN ARE ITS MIN AND MAX
+MINBINS = 200
+
+
+def minmax_indices(y: np.ndarray, nbins: int) -> np.ndarray:
+    """Indices of the min and max of y in each of nbins bins, in trace order.
+
+    First and last samples are kept so the line spans the same x range. Returns
+    every index if y has no more than 2 points per bin.
+    """
+    n = len(y)
+    if n <= 2 * nbins + 2:
+        return np.arange(n)
+
+    # PAD LAST BIN WITH ITS FINAL VALUE, PADDED INDICES ARE CLIPPED BACK
+    binsize = -(-n // nbins)
+    nbins = -(-n // binsize)
+    padded = np.empty(nbins * binsize, dtype=y.dtype)
+    padded[:n] = y
+    padded[n:] = y[-1]
+    bins = padded.reshape(nbins, binsize)
+
+    offsets = np.arange(nbins) * binsize
+    imin = offsets + np.argmin(bins, axis=1)
+    imax = offsets + np.argmax(bins, axis=1)
+    idx = np.empty(2 * nbins + 2, dtype=int)
+    idx[1:-1:2] = np.minimum(imin, imax)
+    idx[2:-1:2] = np.maximum(imin, imax)
+    idx[0], idx[-1] = 0, n - 1
+    return np.minimum(idx, n - 1)
+
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray, nbins: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Min/max envelope of y over x. Peaks are kept, unlike plain downsampling."""
+    idx = minmax_indices(y, nbins)
+    return x[idx], y[idx]
+
+
+class DecimatedLine:
+    """Line showing min/max envelope of x, y with about one bin per axis pixel.
+
+    The visible range is decimated again whenever the axis x limits change, so
+    zooming in shows full resolution. x must be increasing.
+
+    Args:
+            ax (Axes): Axis to plot on
+            x (np.ndarray): Sample positions
+            y (np.ndarray): Sample values
+            args, kwargs: Passed to ax.plot
+    """
+
+    def __init__(self, ax: Axes, x: np.ndarray, y: np.ndarray, *args, **kwargs):
+        self.ax = ax
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+
+        self.line: Line2D = ax.plot(*self.decimated(), *args, **kwargs)[0]
+        # CALLABLE INSTANCES ARE HELD STRONGLY BY THE REGISTRY, SO THE LINE OWNS THIS
+        self.cid = ax.callbacks.connect("xlim_changed", self)
+
+    @property
+    def nbins(self) -> int:
+        return max(int(self.ax.get_window_extent().width), MINBINS)
+
+    def decimated(self, xlim: Tuple[float, float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Envelope of points within xlim, plus one point either side"""
+        lo, hi = 0, len(self.x)
+        if xlim is not None:
+            xmin, xmax = sorted(xlim)
+            lo = max(np.searchsorted(self.x, xmin, side="left") - 1, 0)
+            hi = min(np.searchsorted(self.x, xmax, side="right") + 1, len(self.x))
+        return minmax_decimate(self.x[lo:hi], self.y[lo:hi], self.nbins)
+
+    def __call__(self, ax: Axes):
+        self.line.set_data(*self.decimated(ax.get_xlim()))
+
+    def remove(self):
+        self.ax.callbacks.disconnect(self.cid)
+        self.line.remove()
+
+
+def plot_decimated(ax: Axes, x: np.ndarray, y: np.ndarray, *args, **kwargs) -> Line2D:
+    """ax.plot for long traces. See DecimatedLine."""
+    return DecimatedLine(ax, x, y, *args, **kwargs).line
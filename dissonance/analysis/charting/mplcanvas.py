@@ -5,7 +5,8 @@ from matplotlib.backends.backend_qt5agg import \
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
 
-mpl.use('Qt5Agg')
+# FALLS BACK TO THE DEFAULT BACKEND WITHOUT A DISPLAY (BATCH ANALYSIS)
+mpl.use('Qt5Agg', force=False)
 mpl.rcParams["axes.spines.right"] = False
 mpl.rcParams["axes.spines.top"] = False
 mpl.rcParams["xtick.top"] = False
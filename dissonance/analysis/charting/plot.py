@@ -13,7 +13,8 @@ from matplotlib.pyplot import Axes
 from scipy.stats import sem, ttest_ind
 
 from ...epochtypes import IEpoch, WholeEpoch, WholeEpochs, SpikeEpoch, SpikeEpochs
-from ...analysis_functions import HillEquation, WeberEquation
+from ...analysis_functions import HillEquation, WeberEquation, batchfit
+from .decimate import plot_decimated
 
 
 import logging
@@ -123,20 +124,22 @@ class PlotPsth(PlotBase):
     def append_trace(self, epochs:Union[SpikeEpoch, SpikeEpochs], label):
         self.cntr += 1
 
-        seconds_conversion = 10000 / 100
+        binsize = getattr(epochs, "binsize", 100)
+        seconds_conversion = 10000 / binsize
+        self.ax.set_xlabel(f"{binsize / 10:g}ms bins")
         if isinstance(epochs, IEpoch):
             n = 1
             psth = epochs.psth
             name = epochs.get_unique("genotype")[0]
             pretime = epochs.get_unique("pretime")[0]
-            ttp = (epochs.timetopeak - pretime/100) / seconds_conversion
+            ttp = (epochs.timetopeak - pretime/binsize) / seconds_conversion
         elif isinstance(epochs, SpikeEpochs):
             n = len(epochs)
             psth = epochs.psth
 
             name = epochs.get_unique("genotype")[0]
             pretime = epochs.get_unique("pretime")[0]
-            ttp = (epochs.timetopeak - pretime/100) / seconds_conversion
+            ttp = (epochs.timetopeak - pretime/binsize) / seconds_conversion
         else:
             psth = np.mean(
                 [
@@ -149,7 +152,7 @@ class PlotPsth(PlotBase):
             pretime = epochs.epoch.iloc[0].stimtime
 
         # CALCULATE TTP AND MAX PEAK
-        X = (np.arange(len(psth)) - pretime/100) / (seconds_conversion)
+        X = (np.arange(len(psth)) - pretime/binsize) / (seconds_conversion)
 
         # PLOT VALUES SHIFT BY STIM TIME - DOTTED LINED FOR BOTH TTP AND PEAK AMP
         peakamp = epochs.peakamplitude
@@ -351,9 +354,10 @@ class PlotWholeTrace(PlotBase):
         label += "\n"+metricstr
 
 
-        # PLOT TRACE VALUES
+        # PLOT TRACE VALUES - DECIMATED TO AXIS WIDTH, VALUES KEEP FULL RESOLUTION
         X = np.arange(len(epoch.trace)) - pretime
-        self.ax.plot(
+        plot_decimated(
+            self.ax,
             X,
             epoch.trace, label=label,
             color=color,
@@ -440,27 +444,32 @@ class PlotTrace(PlotBase):
         else:
             label = f'{epoch.get("cellname")[0]}, {epoch.get("lightamplitude")[0]}, {epoch.get("lightmean")}'
 
+        # READ ONCE, EPOCH TRACES AREN'T CACHED
+        trace = epoch.trace
+
         # PLOT SPIKES IF SPIKETRACE
         if (hasattr(epoch, "spikes")):
-            y = epoch.trace[epoch.spikes]
+            y = trace[epoch.spikes]
             self.ax.scatter(
                 epoch.spikes - pretime,
                 y,
                 marker="x", color=self.colors[epoch.genotype])
 
         # IF WHOLE TRACE AND HAS SPIKES, PLOT INTERPOLATED TOO
-        X = np.arange(len(epoch.trace)) - pretime
+        X = np.arange(len(trace)) - pretime
         if (epoch.type.lower() == "wholetrace" and epoch.has_spikes):
             y = epoch.interpolated
-            self.ax.plot(
+            plot_decimated(
+                self.ax,
                 X,
                 y,
                 "--", color=self.colors[epoch.genotype])
 
-        # PLOT TRACE VALUES
-        self.ax.plot(
+        # PLOT TRACE VALUES - DECIMATED TO AXIS WIDTH, VALUES KEEP FULL RESOLUTION
+        plot_decimated(
+            self.ax,
             X,
-            epoch.trace, label=label,
+            trace, label=label,
             color=self.colors[epoch.get("genotype")[0]],
             alpha=0.4)
 
@@ -472,7 +481,7 @@ class PlotTrace(PlotBase):
         self.ax.set_xticklabels(xlabels)
 
         self.labels.append(label)
-        self.values.append(epoch.trace)
+        self.values.append(trace)
 
     def to_csv(self, outputdir=None):
         columns = "Chart Label Time Value".split()
@@ -1194,16 +1203,21 @@ class PlotHill(PlotBase):
 
         # TODO will this be done on epoch level?
         # FIT HILL TO EACH CELL - ONLY PLOT PEAK AMOPLITUDES
+        cellnames, datasets = [], []
         for cellname, frame in eframe.groupby(["cellname"]):
             frame = frame.sort_values(["lightamplitude"])
             X = frame.lightamplitude.values
             Y = frame.epoch.apply(lambda x: x.peakamplitude).values
 
             Y = -1 * Y if max(Y) < 0 else Y
+            cellnames.append(cellname)
+            datasets.append((X, Y))
 
-            hill = HillEquation()
-            hill.fit(X, Y)
-            self.fits[cellname] = hill
+        # EACH CELL STARTS FROM THE PREVIOUS CELL'S FIT
+        fits = batchfit.fit_batch(datasets, "hill")
+        for cellname, row in zip(cellnames, fits.to_dict("records")):
+            if row["success"]:
+                self.fits[cellname] = batchfit.fitted("hill", row)
 
         # FIT HILL TO AVERAGE OF PEAK AMPLITUDES
         df = eframe.copy()
@@ -1266,6 +1280,7 @@ class PlotWeber(PlotBase):
         self.cntr += 1
 
         # FIT HILL TO EACH CELL - ONLY PLOT PEAK AMPLITUDES
+        cellnames, datasets = [], []
         for cellname, framef in eframe.groupby(["cellname"]):
             # GET 100 PCT CONTRAST VALUES
             minamp0 = framef.loc[framef.lightmean == 0.0]
@@ -1280,11 +1295,13 @@ class PlotWeber(PlotBase):
 
             X = frame.lightmean.values
             Y = frame.epoch.apply(lambda x: x.gain).values
+            cellnames.append(cellname)
+            datasets.append((X, Y))
 
-            weber = WeberEquation()
-            weber.fit(X, Y)
-
-            self.fits[genotype][cellname] = weber
+        fits = batchfit.fit_batch(datasets, "weber")
+        for cellname, row in zip(cellnames, fits.to_dict("records")):
+            if row["success"]:
+                self.fits[genotype][cellname] = batchfit.fitted("weber", row)
 
         # GET VALUES FOR A TTEST
         minamp0 = eframe.loc[(eframe.lightmean == 0.0), "lightamplitude"].min()
@@ -0,0 +1,235 @@
+"""Per-cell and per-genotype summary tables without the viewer.
+
+Cells are summarized in separate processes, each opening its own files read
+only. Every cell yields one row per block of epochs (light mean, amplitude, ...)
+with the metrics of the block's mean response, plus Hill (peak amplitude x
+light amplitude) and Weber (gain x background) fits where the cell has the data.
+Genotype rows average the cell rows and are fit the same way.
+"""
+import logging
+import multiprocessing as mp
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import h5py
+import numpy as np
+import pandas as pd
+from scipy.stats import sem
+
+from ..analysis_functions.batchfit import fit_batch
+from ..epochtypes import groupby
+from ..io import DissonanceReader
+from ..io.dissonanceio import frame_to_epochs
+
+logger = logging.getLogger(__name__)
+
+# COLUMNS SEPARATING CELLS AND THE CONDITIONS WITHIN A CELL, WHEN IN THE PARAMS TABLE
+CELLKEYS = ["genotype", "celltype", "cellname", "tracetype", "holdingpotential"]
+BLOCKKEYS = ["protocolname", "lightmean", "lightamplitude"]
+METRICS = ["peakamplitude", "timetopeaksec", "gain"]
+FITCOLUMNS = ["model", "lightmean", "expnt", "base", "rmax", "xhalf", "beta", "ihalf", "r2"]
+
+
+def load_params(paths: List[Path], paramnames: List[str], protocols: List[str] = None, filterpath: Path = None, nprocesses: int = 5) -> pd.DataFrame:
+    """Params table of included epochs. Startdates listed in filterpath are excluded."""
+    params = DissonanceReader(paths).to_params(paramnames, nprocesses=nprocesses)
+    if protocols is not None:
+        params = params.loc[params.protocolname.isin(protocols)]
+    if filterpath is not None and Path(filterpath).exists():
+        unchecked = set(pd.read_csv(
+            filterpath, parse_dates=["startdate"]).iloc[:, 0].values)
+        params = params.loc[~params.startdate.isin(unchecked)]
+    return params.reset_index(drop=True)
+
+
+def epoch_metric(epoch, name: str) -> float:
+    """Metric of an epoch or block. NaN where the epoch type has none."""
+    try:
+        return float(getattr(epoch, name))
+    except Exception:
+        return np.nan
+
+
+def block_metrics(block) -> Dict[str, float]:
+    """METRICS of a block's mean response"""
+    return dict(
+        nepochs=len(block.epochs),
+        **{metric: epoch_metric(block, metric) for metric in METRICS})
+
+
+def hill_data(X: np.ndarray, Y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(X, Y) to Hill fit response amplitude to light amplitude. None if it can't be fit."""
+    Y = -1 * Y if max(Y) < 0 else Y
+    if len(np.unique(X)) < 4:
+        return None
+    return X, Y
+
+
+def weber_data(lightmeans: np.ndarray, lightamplitudes: np.ndarray, gains: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(X, Y) to Weber fit gain at 100% contrast (plus the dimmest flash in darkness) to background. None if it can't be fit."""
+    lightmeans, lightamplitudes, gains = map(np.asarray, (lightmeans, lightamplitudes, gains))
+    dark = lightmeans == 0.0
+    mindark = lightamplitudes[dark].min() if dark.any() else np.nan
+    keep = (
+        ((lightmeans == lightamplitudes) | (dark & (lightamplitudes == mindark)))
+        & (lightamplitudes > 0) & np.isfinite(gains))
+    if len(np.unique(lightmeans[keep])) < 2:
+        return None
+
+    order = np.argsort(lightmeans[keep], kind="stable")
+    return lightmeans[keep][order], gains[keep][order]
+
+
+def batch_fits(datasets: List[Tuple[np.ndarray, np.ndarray]], labels: List[Dict], model: str) -> List[Dict]:
+    """Rows of the successful fits of model to datasets. Each fit starts from the previous one."""
+    if len(datasets) == 0:
+        return []
+    table = fit_batch(datasets, model, labels)
+    table = table.loc[table.success].drop(columns=["n", "success"])
+    return table.to_dict("records")
+
+
+def fit_hill(X: np.ndarray, Y: np.ndarray) -> Dict[str, float]:
+    """Hill fit of response amplitude to light amplitude. None if it can't be fit."""
+    data = hill_data(X, Y)
+    fits = batch_fits([data], [dict()], "hill") if data is not None else []
+    return fits[0] if fits else None
+
+
+def fit_weber(lightmeans: np.ndarray, lightamplitudes: np.ndarray, gains: np.ndarray) -> Dict[str, float]:
+    """Weber fit of gain at 100% contrast (plus the dimmest flash in darkness) to background"""
+    data = weber_data(lightmeans, lightamplitudes, gains)
+    fits = batch_fits([data], [dict()], "weber") if data is not None else []
+    return fits[0] if fits else None
+
+
+def hill_fits(frame: pd.DataFrame, keys: List[str], amplitudes: pd.Series) -> List[Dict]:
+    """Hill fit of amplitudes to light amplitude for each group of keys and light mean"""
+    if "lightamplitude" not in frame or "lightmean" not in frame:
+        return []
+    keys = [*keys, "lightmean"]
+    datasets, labels = [], []
+    for key, grp in frame.groupby(keys, sort=False, dropna=False):
+        data = hill_data(grp.lightamplitude.values, amplitudes.loc[grp.index].values.astype(float))
+        if data is not None:
+            datasets.append(data)
+            labels.append(dict(zip(keys, key)))
+    return batch_fits(datasets, labels, "hill")
+
+
+def weber_fits(frame: pd.DataFrame, keys: List[str]) -> List[Dict]:
+    """Weber fit of gain to light mean for each group of keys"""
+    if "lightamplitude" not in frame or "lightmean" not in frame:
+        return []
+    datasets, labels = [], []
+    for key, grp in frame.groupby(keys, sort=False, dropna=False):
+        data = weber_data(grp.lightmean.values, grp.lightamplitude.values, grp.gain.values)
+        if data is not None:
+            datasets.append(data)
+            labels.append(dict(zip(keys, key)))
+    return batch_fits(datasets, labels, "weber")
+
+
+def summarize_cell(frame: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Block metrics and fits for the epochs of one cell
+
+    Args:
+            frame (pd.DataFrame): Params table rows of a single cell
+
+    Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: Block rows and fit rows
+    """
+    cellkeys = [key for key in CELLKEYS if key in frame]
+    blockkeys = [key for key in BLOCKKEYS if key in frame]
+
+    files = {path: h5py.File(str(path), "r") for path in frame.exppath.unique()}
+    try:
+        frame = frame.copy()
+        frame["epoch"] = frame_to_epochs(
+            frame, {path: f["experiment"] for path, f in files.items()}, lazy=False)
+        frame = frame.loc[frame.epoch.notnull()]
+
+        # BLOCKS OF A SINGLE EPOCH TYPE, TRACE TYPES ARE SPLIT BY CELLKEYS
+        rows = []
+        for _, grp in frame.groupby(cellkeys, sort=False, dropna=False):
+            for block in groupby(grp, cellkeys + blockkeys).itertuples(index=False):
+                labels = {key: getattr(block, key) for key in cellkeys + blockkeys}
+                rows.append(dict(labels, **block_metrics(block.epoch)))
+
+        # HILL FIT TO EACH EPOCH'S PEAK AMPLITUDE, AS PlotHill DOES
+        peakamplitudes = pd.Series(
+            [epoch_metric(epoch, "peakamplitude") for epoch in frame.epoch.values],
+            index=frame.index)
+    finally:
+        for f in files.values():
+            f.close()
+
+    blocks = pd.DataFrame(rows)
+    fits = hill_fits(frame, cellkeys, peakamplitudes)
+    if len(blocks):
+        fits.extend(weber_fits(blocks, cellkeys))
+    return blocks, pd.DataFrame(fits, columns=[*cellkeys, *FITCOLUMNS])
+
+
+def summarize_genotypes(cells: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Average block metrics across cells and fit the averages"""
+    keys = [key for key in CELLKEYS + BLOCKKEYS if key in cells and key != "cellname"]
+    metrics = [metric for metric in METRICS if metric in cells]
+
+    grouped = cells.groupby(keys, sort=True, dropna=False)
+    genotypes = grouped.size().rename("ncells").to_frame()
+    for metric in metrics:
+        genotypes[metric] = grouped[metric].mean()
+        genotypes[f"{metric}_sem"] = grouped[metric].agg(
+            lambda vals: sem(vals, nan_policy="omit") if vals.count() > 1 else np.nan)
+    genotypes = genotypes.reset_index()
+
+    groupkeys = [key for key in CELLKEYS if key in genotypes and key != "cellname"]
+    fits = hill_fits(genotypes, groupkeys, genotypes.peakamplitude)
+    fits.extend(weber_fits(genotypes, groupkeys))
+    return genotypes, pd.DataFrame(fits, columns=[*groupkeys, *FITCOLUMNS])
+
+
+def summarize(params: pd.DataFrame, nprocesses: int = None) -> Dict[str, pd.DataFrame]:
+    """Summary tables of every cell in params, one cell per process
+
+    Args:
+            params (pd.DataFrame): Params table (see load_params). Needs cellname and exppath.
+            nprocesses (int): Worker processes. Defaults to cpu count, 1 runs in this process.
+
+    Returns:
+            Dict[str, pd.DataFrame]: cells, cellfits, genotypes and genotypefits tables
+    """
+    cells = [frame for _, frame in params.groupby("cellname", sort=True)]
+
+    if nprocesses == 1:
+        results = [summarize_cell(frame) for frame in cells]
+    else:
+        with mp.Pool(processes=nprocesses) as p:
+            results = p.map(summarize_cell, cells)
+
+    blocks = [result[0] for result in results if len(result[0])]
+    tables = dict(
+        cells=pd.concat(blocks, ignore_index=True) if blocks else pd.DataFrame(),
+        cellfits=pd.concat([result[1] for result in results], ignore_index=True) if results else pd.DataFrame())
+
+    tables["genotypes"], tables["genotypefits"] = (
+        summarize_genotypes(tables["cells"])
+        if len(tables["cells"]) else (pd.DataFrame(), pd.DataFrame()))
+    return tables
+
+
+def write_tables(tables: Dict[str, pd.DataFrame], outputdir: Path, name: str, fmt: str = "csv") -> List[Path]:
+    """Write each table to outputdir/{name}_{table}.{fmt}. Parquet needs pyarrow or fastparquet."""
+    outputdir = Path(outputdir)
+    outputdir.mkdir(parents=True, exist_ok=True)
+
+    paths = []
+    for table, frame in tables.items():
+        path = outputdir / f"{name}_{table}.{fmt}"
+        if fmt == "parquet":
+            frame.to_parquet(path, index=False)
+        else:
+            frame.to_csv(path, index=False)
+        paths.append(path)
+    return paths
@@ -1,34 +1,38 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple
+
+import numpy as np
 
 class Node:
 	def __init__(self, label, uid):
 		self._parent = None
-		self._path = None
+		# CACHED ON FIRST USE - PATH IS FIXED ONCE ADDED, LEAVES RESET ON ADD
+		self._pathtuple: Tuple[Tuple[str, object], ...] = None
+		self._leaves: List["Node"] = None
+		self._leafuids: np.ndarray = None
 		self.label = label
 		self.uid = uid
-		self.children = list()
+		# CHILDREN KEYED BY UID, IN INSERTION ORDER
+		self._children: Dict[object, "Node"] = dict()
 
 	def __str__(self):
-		return f"Node({self.label}={self.uid}, nchildren={len(self.children)})"
+		return f"Node({self.label}={self.uid}, nchildren={len(self._children)})"
 
 	
 
 	def __repr__(self):
-		return f"Node({self.label}={self.uid}, nchildren={len(self.children)})"
+		return f"Node({self.label}={self.uid}, nchildren={len(self._children)})"
 
 	def __getitem__(self, val):
-		#idx = [child.uid for child in self.children].index(val)
-		for child in self.children:
-			if child.isleaf:
-				if str(child.uid) == val:
-					return child
-			else: 
-				if child.uid == val:
-					return child
+		child = self._children.get(val)
+		if child is not None:
+			return child
+		# LEAVES CAN ALSO BE LOOKED UP BY THEIR STRING VALUE
+		for child in self._children.values():
+			if child.isleaf and str(child.uid) == val:
+				return child
 
 	def __iter__(self):
-		for x in self.children:
-			yield x
+		yield from self._children.values()
 
 	def __eq__(self, othernode):
 		return othernode.uid == self.uid
@@ -36,34 +40,55 @@ class Node:
 	def __neq__(self, othernode):
 		return othernode.uid != self.uid
 
-	def __contains__(self,val):
-		return val in self.children
+	def __contains__(self, val):
+		uid = val.uid if isinstance(val, Node) else val
+		return uid in self._children
+
+	@property
+	def children(self) -> List["Node"]:
+		return list(self._children.values())
+
+	@property
+	def pathtuple(self) -> Tuple[Tuple[str, object], ...]:
+		"""(label, uid) pairs from root to this node"""
+		if self._pathtuple is None:
+			parent = () if self.isroot else self._parent.pathtuple
+			self._pathtuple = (*parent, (self.label, self.uid))
+		return self._pathtuple
 
 	@property
 	def path(self) -> Dict[str, str]:
-		if self.isroot:
-			self._path = {self.label: self.uid}
-		else:
-			parpath = self._parent.path
-			parpath[self.label] = self.uid
-			self._path =  parpath
-		return self._path
+		# NEW DICT EACH TIME SO CALLERS CAN'T CHANGE THE CACHED PATH
+		return dict(self.pathtuple)
 
 	@property
 	def subpaths(self, rel=False) -> List[str]:
 		return (leaf.path for leaf in self.leaves)
 
 	@property
-	def leaves(self):
-		if self.isleaf: return self
-		def _leaves(node):
-			for child in node:
-				if child.isleaf:
-					yield child
-				else: 
-					yield from _leaves(child)
-		for child in self.children:
-			yield from _leaves(child)
+	def leaves(self) -> List["Node"]:
+		"""Leaves under node in tree order. A leaf is its own leaf."""
+		if self._leaves is None:
+			if self.isleaf:
+				self._leaves = [self]
+			else:
+				self._leaves = [
+					leaf
+					for child in self._children.values()
+					for leaf in child.leaves]
+		return self._leaves
+
+	@property
+	def nleaves(self) -> int:
+		return len(self.leaves)
+
+	@property
+	def leafuids(self) -> np.ndarray:
+		"""uids of leaves under node, i.e. their startdates in an analysis tree"""
+		if self._leafuids is None:
+			self._leafuids = np.empty(self.nleaves, dtype=object)
+			self._leafuids[:] = [leaf.uid for leaf in self.leaves]
+		return self._leafuids
 
 	@property
 	def visual(self):
@@ -95,7 +120,7 @@ class Node:
 
 	@property
 	def isleaf(self):
-		return len(self.children) == 0
+		return len(self._children) == 0
 
 	@property
 	def parent(self):
@@ -104,14 +129,24 @@ class Node:
 	@parent.setter
 	def parent(self, node):
 		self._parent = node
+		self._pathtuple = None
+
+	def _reset_leaves(self):
+		node = self
+		while node is not None and node._leaves is not None:
+			node._leaves, node._leafuids = None, None
+			node = node._parent
 
 	def add(self, node):
-		for child in self:
-			if child.uid == node.uid:
-				child.children.extend(node.children)
-				return
+		"""Add node as child. Merged into the existing child if one has the same uid."""
+		child = self._children.get(node.uid)
+		if child is not None:
+			for grandchild in node.children:
+				child.add(grandchild)
+			return
 		node.parent = self
-		self.children.append(node)
+		self._children[node.uid] = node
+		self._reset_leaves()
 
 	def traverse(self):
 		if not self.isleaf:
@@ -122,7 +157,7 @@ class Node:
 				yield from x.traverse()
 
 	def select_node(self, **kwargs):
-		if len(kwargs) < len(self.path):
+		if len(kwargs) < len(self.pathtuple):
 			raise Exception("Can't traverse upwards. Start a higher node")
 		#for node in self.traverse():
 		#	if node.path == kwargs:
@@ -1,4 +1,8 @@
 from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
 from .node import Node
 
 class Tree(Node):
@@ -17,19 +21,46 @@ class Tree(Node):
 		"""
 		super().__init__("Name", name)
 		self.keys = keys
-		for key in keys:
-			self.build_tree(key, self, labels)
-
-	def build_tree(self, branch, node, labels):
-		if len(branch) == 1:  # branch is a leaf
-			cnode = Node(labels[0], branch[0])
-			node.add(cnode)
-		else:
-			nodevalue, others = branch[0], branch[1:]
-			label, olabels = labels[0], labels[1:]
-			cnode = Node(label, nodevalue)
-			if cnode not in node:
-				node.add(cnode)
-			else:
-				cnode = node[nodevalue]
-			self.build_tree(others, cnode, olabels)
+		self.build_tree(keys, labels)
+
+	def build_tree(self, keys: List[Tuple], labels: List[str]):
+		"""Add keys to tree in a single pass.
+
+		Each key reuses the nodes of the prefix it shares with the key before it, so
+		sorted keys only create nodes where a value changes. Unsorted keys still
+		merge into existing nodes through the child lookup.
+		"""
+		keys = np.asarray(keys, dtype=object)
+		if keys.size == 0:
+			return
+		keys = keys.reshape(len(keys), -1).copy()
+		# ONE OBJECT FOR EVERY MISSING VALUE - THE CHILD LOOKUP MATCHES IT BY IDENTITY
+		keys[pd.isna(keys)] = np.nan
+
+		# NODES FROM ROOT TO THE LEAF OF THE PREVIOUS KEY
+		branch = [self]
+		for key, depth in zip(keys, self._shared_depth(keys)):
+			del branch[depth + 1:]
+			node, created = branch[-1], False
+			for label, uid in zip(labels[depth:], key[depth:]):
+				# NOTHING CAN BE BELOW A NODE THAT WAS JUST CREATED
+				child = None if created else node._children.get(uid)
+				if child is None:
+					created = True
+					# SAME AS node.add, WITHOUT THE MERGE CHECK OR LEAF RESET
+					child = Node(label, uid)
+					child._parent = node
+					node._children[uid] = child
+				branch.append(child)
+				node = child
+
+		# CACHE LEAVES OF EVERY NODE NOW, NOT ON FIRST SELECTION
+		self.leaves
+
+	@staticmethod
+	def _shared_depth(keys: np.ndarray) -> np.ndarray:
+		"""Number of leading values each key shares with the key before it. Missing values match."""
+		prev, curr = keys[:-1], keys[1:]
+		changed = (curr != prev) & ~(pd.isna(curr) & pd.isna(prev))
+		depth = np.where(changed.any(axis=1), changed.argmax(axis=1), keys.shape[1])
+		return np.concatenate([[0], depth])
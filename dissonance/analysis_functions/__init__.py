@@ -1,4 +1,4 @@
-from .spike_detection import detect_spikes
+from .spike_detection import detect_spikes, detect_spikes_batch
 from .hill import HillEquation
 from .weber import WeberEquation
 #from .filter_peaky_things import filter_peaky_things
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""Fit Hill or Weber equations to many (X, Y) datasets at once.
+
+Datasets are fit in order, each starting from the parameters of the previous
+successful fit (e.g. the same cell at the next light mean), and falling back to
+the equation's default start if that fails. With several processes the datasets
+are split into contiguous chunks so neighbours still share a start.
+
+Results come back as a table with one row per dataset: its labels, the fitted
+parameters, r2, ihalf and, if bootstrapped, percentile confidence intervals.
+"""
+import logging
+import multiprocessing as mp
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .hill import HillEquation
+from .weber import WeberEquation
+
+logger = logging.getLogger(__name__)
+
+MODELS = dict(hill=HillEquation, weber=WeberEquation)
+
+
+def fit_one(model: str, X: np.ndarray, Y: np.ndarray, p0: Sequence[float] = None):
+    """Fitted equation. Starts from p0 if given, then from the default start if that fails."""
+    starts = [None] if p0 is None else [p0, None]
+    for ii, start in enumerate(starts):
+        equation = MODELS[model]()
+        try:
+            if start is None:
+                equation.fit(X, Y)
+            else:
+                equation.fit(X, Y, p0=start)
+            return equation
+        except (RuntimeError, ValueError):
+            if ii == len(starts) - 1:
+                raise
+
+
+def equation_row(model: str, equation) -> Dict:
+    """Parameters, r2 and ihalf of a fitted equation"""
+    return dict(
+        zip(MODELS[model].PARAMS, equation.params),
+        r2=equation.r2, ihalf=equation.ihalf)
+
+
+def fitted(model: str, row) -> object:
+    """Equation with the parameters, r2 and ihalf of a fit_batch row"""
+    equation = MODELS[model](*[row[param] for param in MODELS[model].PARAMS])
+    equation.r2 = row["r2"]
+    if model == "hill":
+        equation.ihalf = row["ihalf"]
+    return equation
+
+
+def bootstrap(model: str, X: np.ndarray, Y: np.ndarray, p0: Sequence[float], nboot: int, ci: float, rng: np.random.Generator) -> Dict:
+    """Percentile confidence intervals of parameters and ihalf from resampled (X, Y) pairs"""
+    names = [*MODELS[model].PARAMS, "ihalf"]
+    samples = []
+    for _ in range(nboot):
+        idx = rng.integers(0, len(X), len(X))
+        try:
+            row = equation_row(model, fit_one(model, X[idx], Y[idx], p0))
+        except Exception:
+            continue
+        samples.append([row[name] for name in names])
+
+    row = dict(nboot=len(samples))
+    samples = np.array(samples, dtype=float).reshape(len(samples), len(names))
+    lo, hi = (1 - ci) / 2 * 100, (1 + ci) / 2 * 100
+    for name, values in zip(names, samples.T):
+        values = values[np.isfinite(values)]
+        row[f"{name}_lo"], row[f"{name}_hi"] = (
+            np.percentile(values, [lo, hi]) if len(values) else (np.nan, np.nan))
+    return row
+
+
+def _fit_chunk(args) -> List[Dict]:
+    model, datasets, warmstart, nboot, ci, seed = args
+    rng = np.random.default_rng(seed)
+    rows, p0 = [], None
+    for X, Y in datasets:
+        X, Y = np.asarray(X, dtype=float), np.asarray(Y, dtype=float)
+        row = dict(n=len(X))
+        try:
+            equation = fit_one(model, X, Y, p0 if warmstart else None)
+            row.update(equation_row(model, equation), success=True)
+            p0 = equation.params
+            if nboot > 0:
+                row.update(bootstrap(model, X, Y, equation.params, nboot, ci, rng))
+        except Exception as e:
+            logger.warning(f"{model} fit failed: {e}")
+            row.update(success=False)
+        rows.append(row)
+    return rows
+
+
+def fit_batch(datasets: Sequence[Tuple[np.ndarray, np.ndarray]], model: str = "hill", labels: Sequence[Dict] = None,
+              warmstart: bool = True, nprocesses: int = 1, nboot: int = 0, ci: float = 0.95, seed: int = 0) -> pd.DataFrame:
+    """Fit model to each (X, Y) dataset
+
+    Args:
+            datasets (Sequence[Tuple[np.ndarray, np.ndarray]]): (X, Y) per fit, neighbours first
+            model (str): "hill" or "weber"
+            labels (Sequence[Dict]): Columns identifying each dataset (e.g. cellname)
+            warmstart (bool): Start each fit from the previous fit's parameters
+            nprocesses (int): Processes fitting contiguous chunks of datasets. In this process if 1.
+            nboot (int): Bootstrap resamples per dataset, no confidence intervals if 0
+            ci (float): Confidence interval width
+            seed (int): Seed of the bootstrap resampling
+
+    Returns:
+            pd.DataFrame: Labels, n, model parameters, r2, ihalf and success per dataset.
+                    With nboot, also {param}_lo, {param}_hi and nboot (resamples that fit).
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown model {model}, expected one of {list(MODELS)}")
+    datasets = list(datasets)
+    labels = [dict() for _ in datasets] if labels is None else list(labels)
+
+    nprocesses = max(1, min(nprocesses or mp.cpu_count(), len(datasets)))
+    size = -(-len(datasets) // nprocesses) if datasets else 1
+    chunks = [
+        (model, datasets[start:start + size], warmstart, nboot, ci, (seed, start))
+        for start in range(0, len(datasets), size)]
+
+    if nprocesses == 1:
+        results = [_fit_chunk(chunk) for chunk in chunks]
+    else:
+        with mp.Pool(processes=nprocesses) as p:
+            results = p.map(_fit_chunk, chunks)
+
+    rows = [row for result in results for row in result]
+    table = pd.DataFrame(
+        [dict(label, model=model, **row) for label, row in zip(labels, rows)])
+
+    # LABELS, THEN FIT COLUMNS IN THE SAME ORDER FOR EVERY MODEL AND BATCH
+    columns = [
+        *dict.fromkeys(key for label in labels for key in label),
+        "model", "n", *MODELS[model].PARAMS, "r2", "ihalf", "success"]
+    return table.reindex(columns=columns + [col for col in table.columns if col not in columns])
@@ -1,8 +1,89 @@
-import numpy as np
-import pandas as pd
 """Filter peaky things from whole cell spike trains using FBEWMA
+
+Every step works on ndarrays along an axis, so 2-D batches of traces (one per
+row) are filtered in one call.
 """
+from typing import Iterable, Union
+
+import h5py
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+
+def clip_data(X: np.ndarray, high_clip: float, low_clip: float) -> np.ndarray:
+    """X with values above high_clip or below low_clip set to NaN"""
+    X = np.asarray(X, dtype=float)
+    return np.where((X > high_clip) | (X < low_clip), np.nan, X)
+
+
+def ewma(X: np.ndarray, span: int, axis: int = -1) -> np.ndarray:
+    """Exponentially weighted mean along axis, as pd.Series.ewm(span=span).mean()
+
+    NaNs are skipped but still age the weights of earlier values. NaN until the
+    first value that isn't.
+    """
+    decay = 1 - 2 / (span + 1)
+    valid = ~np.isnan(X)
+    # WEIGHTED SUM AND SUM OF WEIGHTS BOTH FOLLOW S[t] = decay * S[t - 1] + x[t]
+    weighted = lfilter([1.0], [1.0, -decay], np.where(valid, X, 0.0), axis=axis)
+    weights = lfilter([1.0], [1.0, -decay], valid.astype(float), axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(weights > 0, weighted / weights, np.nan)
+
+
+def ewma_fb(X: np.ndarray, span: int, axis: int = -1) -> np.ndarray:
+    """Mean of forwards and backwards EWMA of X along axis"""
+    fwd = ewma(X, span, axis)
+    bwd = np.flip(ewma(np.flip(X, axis), span, axis), axis)
+    return (fwd + bwd) / 2
+
+
+def remove_outliers(spikey: np.ndarray, fbewma: np.ndarray, delta: float) -> np.ndarray:
+    """spikey with values further than delta from fbewma set to NaN"""
+    with np.errstate(invalid="ignore"):
+        return np.where(np.abs(spikey - fbewma) > delta, np.nan, spikey)
+
+
+def interpolate_gaps(X: np.ndarray, axis: int = -1) -> np.ndarray:
+    """Linearly interpolate NaNs along axis, as pd.Series.interpolate()
+
+    Trailing NaNs take the last value, leading NaNs are left as NaN.
+    """
+    X = np.moveaxis(np.asarray(X, dtype=float), axis, -1)
+    L = X.shape[-1]
+    idx = np.arange(L)
+    valid = ~np.isnan(X)
 
+    # POSITION OF THE LAST VALUE AT OR BEFORE, AND FIRST VALUE AT OR AFTER, EACH SAMPLE
+    prev = np.maximum.accumulate(np.where(valid, idx, -1), axis=-1)
+    nxt = np.flip(np.minimum.accumulate(np.flip(np.where(valid, idx, L), -1), axis=-1), -1)
+
+    yprev = np.take_along_axis(X, np.maximum(prev, 0), axis=-1)
+    ynext = np.take_along_axis(X, np.minimum(nxt, L - 1), axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        frac = np.where(nxt > prev, (idx - prev) / (nxt - prev), 0.0)
+    out = np.where(nxt < L, yprev + (ynext - yprev) * frac, yprev)
+    out[prev < 0] = np.nan
+    return np.moveaxis(out, -1, axis)
+
+
+def filter_peaks(X: np.ndarray, delta: float = 0.10, clip_range: float = 3000, span: int = 10, axis: int = -1) -> np.ndarray:
+    """Traces with peaks removed and interpolated over. Leading gaps are zero.
+
+    Args:
+            X (np.ndarray): Trace, or 2-D batch of traces
+            delta (float): Distance from the FBEWMA past which samples are removed
+            clip_range (float): Samples further than this from zero are removed
+            span (int): Sample window of the FBEWMA
+            axis (int): Axis of X along time
+
+    Returns:
+            np.ndarray: Filtered traces, same shape as X
+    """
+    clipped = clip_data(X, clip_range, -1 * clip_range)
+    removed = remove_outliers(clipped, ewma_fb(clipped, span, axis), delta)
+    return np.nan_to_num(interpolate_gaps(removed, axis), nan=0.0)
 
 
 class PeakFilter:
@@ -11,19 +92,36 @@ class PeakFilter:
                 trace: np.ndarray,
                 delta: float = 0.10,
                 clip_range: float = 3000,
-                span: int = 10):
+                span: int = 10,
+                axis: int = -1):
 
-        self.trace = trace
+        self.trace = np.asarray(trace, dtype=float)
         self.delta = delta
         self.clip_range = clip_range
         self.span = span
+        self.axis = axis
 
-        self.trace_filtered = PeakFilter.filter_peaky_things(self.trace, self.delta, self.clip_range, self.span)
+        self.trace_filtered = filter_peaks(
+            self.trace, self.delta, self.clip_range, self.span, self.axis)
 
     @classmethod
-    def from_h5(cls, epochgroup):
-        """instantiate class from h5 group"""
-        ...
+    def from_h5(cls, epochs: Union[h5py.Group, Iterable], **kwargs) -> "PeakFilter":
+        """Filter the responses of one or many epochs in one call
+
+        Args:
+                epochs (Union[h5py.Group, Iterable]): Epoch h5 group, or a block of
+                        epochs (e.g. WholeEpochs), filtered as one row per epoch
+                kwargs: delta, clip_range and span
+        """
+        if isinstance(epochs, h5py.Group):
+            # SAME TRACE AS THE EPOCH TYPE GIVES (E.G. BASELINE SUBTRACTED)
+            from ..epochtypes import epoch_factory
+            trace = epoch_factory(epochs).trace
+        elif hasattr(epochs, "traces"):
+            trace = epochs.traces
+        else:
+            trace = np.vstack([epoch.trace for epoch in epochs])
+        return cls(trace, axis=-1, **kwargs)
 
     @property
     def params(self):
@@ -54,54 +152,15 @@ class PeakFilter:
 
         Returns
         -------
-        pd.DataFrame() : 
+        pd.DataFrame() :
             x, y_spikey, y_interpolated
         """
-
-        high_clip, low_clip = (clip_range, -1 * clip_range)
-
-        ef = pd.DataFrame()
-        ef["y_spikey"] = trace
-        ef["x"] = np.arange(len(trace)) + 1
-        ef['y_clipped'] = PeakFilter.clip_data(
-            ef['y_spikey'].tolist(), high_clip, low_clip)
-        ef['y_ewma_fb'] = PeakFilter.ewma_fb(ef['y_clipped'], span)
-        ef['y_remove_outliers'] = PeakFilter.remove_outliers(
-            ef['y_clipped'].tolist(), ef['y_ewma_fb'].tolist(), delta)
-        ef['y_interpolated'] = ef['y_remove_outliers'].interpolate()
-
-        return ef[["x", "y_spikey", "y_interpolated"]].fillna(0.0)
-
-    @staticmethod
-    def clip_data(unclipped, high_clip, low_clip):
-        ''' Clip unclipped between high_clip and low_clip. 
-        unclipped contains a single column of unclipped data.'''
-
-        # convert to np.array to access the np.where method
-        np_unclipped = np.array(unclipped)
-        # clip data above HIGH_CLIP or below LOW_CLIP
-        cond_high_clip = (np_unclipped > high_clip) | (np_unclipped < low_clip)
-        np_clipped = np.where(cond_high_clip, np.nan, np_unclipped)
-        return np_clipped.tolist()
-
-    @staticmethod
-    def ewma_fb(df_column, span):
-        ''' Apply forwards, backwards exponential weighted moving average (EWMA) to df_column. '''
-        # Forwards EWMA.
-        fwd = pd.Series.ewm(df_column, span=span).mean()
-        # Backwards EWMA.
-        # TODO should this span be ten?
-        bwd = pd.Series.ewm(df_column[::-1], span=span).mean()
-        # Add and take the mean of the forwards and backwards EWMA.
-        stacked_ewma = np.vstack((fwd, bwd[::-1]))
-        fb_ewma = np.mean(stacked_ewma, axis=0)
-        return fb_ewma
-
-    @staticmethod
-    def remove_outliers(spikey, fbewma, delta):
-        ''' Remove data from df_spikey that is > delta from fbewma. '''
-        np_spikey = np.array(spikey)
-        np_fbewma = np.array(fbewma)
-        cond_delta = (np.abs(np_spikey-np_fbewma) > delta)
-        np_remove_outliers = np.where(cond_delta, np.nan, np_spikey)
-        return np_remove_outliers
+        trace = np.asarray(trace, dtype=float)
+        return pd.DataFrame(dict(
+            x=np.arange(len(trace)) + 1,
+            y_spikey=np.nan_to_num(trace, nan=0.0),
+            y_interpolated=filter_peaks(trace, delta, clip_range, span)))
+
+    clip_data = staticmethod(clip_data)
+    ewma_fb = staticmethod(ewma_fb)
+    remove_outliers = staticmethod(remove_outliers)
@@ -5,6 +5,8 @@ from scipy.optimize import curve_fit
 
 class HillEquation:
 
+    PARAMS = ("expnt", "base", "rmax", "xhalf")
+
     def __init__(self,
                  expnt: float = None,
                  base: float = None,
@@ -25,11 +27,12 @@ class HillEquation:
         return self.equation(
             x, self.expnt, self.base, self.rmax, self.xhalf)
 
-    def fit(self, X, Y, bounds = (0.0, np.inf), maxfev=20000, **kwargs):
-        p0 = [2.0, np.mean(Y), max(Y), 0.5]
+    def fit(self, X, Y, bounds = (0.0, np.inf), maxfev=20000, p0=None, **kwargs):
+        if p0 is None:
+            p0 = [2.0, np.mean(Y), max(Y), 0.5]
         fit = curve_fit(self.equation,
                         xdata=X, ydata=Y, 
-						maxfev=maxfev, p0=p0, bounds=bounds, 
+						maxfev=maxfev, p0=p0, bounds=bounds, jac=self.jacobian,
 						**kwargs)
         self.expnt, self.base, self.rmax, self.xhalf = fit[0]
 
@@ -43,6 +46,10 @@ class HillEquation:
         self.ihalf = self.invequation(max(Y)/2, *fit[0])
         # return HillParams(*popt, ihalf, r_squared)
 
+    @property
+    def params(self):
+        return (self.expnt, self.base, self.rmax, self.xhalf)
+
     @property
     def hasparams(self):
         return not any(map(lambda x: x is None, [self.expnt, self.base, self.rmax, self.xhalf]))
@@ -51,6 +58,19 @@ class HillEquation:
     def equation(X, expnt, base, rmax, xhalf):
         return base + (rmax - base) / (1 + (xhalf/X)**expnt)
 
+    @staticmethod
+    def jacobian(X, expnt, base, rmax, xhalf):
+        """Derivatives of equation by (expnt, base, rmax, xhalf), one row per X"""
+        X = np.asarray(X, dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            ratio = xhalf / X
+            s = 1 / (1 + ratio ** expnt)
+            # ds/du * u, ZERO WHERE s SATURATES (INCLUDING X == 0)
+            su = s * (1 - s)
+            dexpnt = np.where(su > 0, -(rmax - base) * su * np.log(ratio), 0.0)
+            dxhalf = np.where(su > 0, -(rmax - base) * su * expnt / xhalf, 0.0)
+        return np.column_stack([dexpnt, 1 - s, s, dxhalf])
+
     @staticmethod
     def invequation(Y, expnt, base, rmax, xhalf):
-        return xhalf / ((rmax - base) / (Y-base) - 1) ** 1 / expnt
+        return xhalf / ((rmax - base) / (Y-base) - 1) ** (1 / expnt)
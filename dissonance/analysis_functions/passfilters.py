@@ -1,51 +1,101 @@
 """
 Band pass filters
+
+Filters are applied as masks on the real FFT of the signal. Masks are cached
+per (length, cutoffs, dt), and any number of filters can share one forward
+transform (see band_pass_filters).
 """
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
 import numpy as np
 from scipy import fft
 
-def low_pass_filter(X:np.array, F:np.array, dt:float) -> np.array:
+@lru_cache(maxsize=64)
+def _mask(L:int, low:Optional[float], high:Optional[float], dt:float) -> np.array:
 	"""
-	Filter to cut out high freqnecies about X for cutoff F.
+	Weights of the L // 2 + 1 real FFT bins passing frequencies between low and high.
 
-	X    := nd array of signal data
-	F    := cutoff frequency
+	L    := signal length
+	low  := high pass cutoff, None for no high pass
+	high := low pass cutoff, None for no low pass
 	dt   := sampling interval in seconds.
+
+	Cutoffs zero the same bins as slicing the full FFT at round(F * dt * L). Bins whose
+	mirror is zeroed by the slicing but which aren't themselves get half weight, as
+	taking the real part of the inverse of the full FFT did.
 	"""
-	L = X.shape[0]
-	if L == 1:
-		L = X.shape[1] 
-	
-	# dt * l := step size in seconds
-	# F := cutoff frequency
-	# df : index for cut off
-	df = round(F * dt * L)
+	full = np.ones(L)
+	if low is not None:
+		df = round(low * dt * L)
+		full[0:df] = 0
+		full[-df:] = 0
+	if high is not None:
+		df = round(high * dt * L)
+		full[df:-df] = 0
 
-	trans = fft.fft(X)
-	trans[df:-df] = 0
-	xfilt = fft.ifft(trans).real
+	k = np.arange(L // 2 + 1)
+	mask = (full[k] + full[-k % L]) / 2
+	mask.flags.writeable = False
+	return mask
 
-	return xfilt
+def _along(mask:np.array, ndim:int, axis:int) -> np.array:
+	"""mask shaped to broadcast along axis of an ndim array"""
+	shape = [1] * ndim
+	shape[axis] = len(mask)
+	return mask.reshape(shape)
 
-def high_pass_filter(X:np.array, F:np.array, dt:float) -> np.array:
+def band_pass_filters(X:np.array, bands:List[Tuple[Optional[float], Optional[float]]], dt:float, axis:int=-1) -> List[np.array]:
 	"""
-	Filter to cut out low freqnecies about X for cutoff F.
+	Filter X once per band, sharing a single forward transform.
+
+	X     := nd array of signal data
+	bands := (high pass cutoff, low pass cutoff) per output, None for no cutoff
+	dt    := sampling interval in seconds.
+	axis  := axis of X along time. 2-D batches of traces are filtered row by row.
+	"""
+	L = X.shape[axis]
+	trans = fft.rfft(X, axis=axis)
+
+	out = []
+	for ii, (low, high) in enumerate(bands):
+		mask = _along(_mask(L, low, high, dt), trans.ndim, axis)
+		# LAST BAND CAN FILTER THE SHARED TRANSFORM IN PLACE
+		filtered = np.multiply(trans, mask, out=trans if ii == len(bands) - 1 else None)
+		out.append(fft.irfft(filtered, n=L, axis=axis, overwrite_x=True))
+	return out
+
+def band_pass_filter(X:np.array, low:float, high:float, dt:float, axis:int=-1) -> np.array:
+	"""
+	Filter to keep frequencies of X between low and high. Same as high_pass_filter
+	followed by low_pass_filter, in one transform.
 
 	X    := nd array of signal data
-	F    := cutoff frequency
+	low  := high pass cutoff frequency
+	high := low pass cutoff frequency
 	dt   := sampling interval in seconds.
+	axis := axis of X along time. 2-D batches of traces are filtered row by row.
 	"""
-	L = X.shape[0]
-	if L == 1:
-		L = X.shape[1] 
+	return band_pass_filters(X, [(low, high)], dt, axis)[0]
 
-	df = round(F * dt * L)
-
-	fft_data = fft.fft(X)
+def low_pass_filter(X:np.array, F:np.array, dt:float, axis:int=-1) -> np.array:
+	"""
+	Filter to cut out high freqnecies about X for cutoff F.
 
-	fft_data[0:df] = 0
-	fft_data[-df:] = 0
+	X    := nd array of signal data
+	F    := cutoff frequency
+	dt   := sampling interval in seconds.
+	axis := axis of X along time. 2-D batches of traces are filtered row by row.
+	"""
+	return band_pass_filters(X, [(None, F)], dt, axis)[0]
 
-	xfilt = fft.ifft(fft_data, n=None, axis=-1).real
+def high_pass_filter(X:np.array, F:np.array, dt:float, axis:int=-1) -> np.array:
+	"""
+	Filter to cut out low freqnecies about X for cutoff F.
 
-	return xfilt
\ No newline at end of file
+	X    := nd array of signal data
+	F    := cutoff frequency
+	dt   := sampling interval in seconds.
+	axis := axis of X along time. 2-D batches of traces are filtered row by row.
+	"""
+	return band_pass_filters(X, [(F, None)], dt, axis)[0]
@@ -1,21 +1,67 @@
+from functools import reduce
+from math import gcd
+from typing import Dict, Iterable, List
+
 import numpy as np
-import matplotlib.pyplot as plt
-
-def calculate_psth(epoch, inc=100, outputfile=None) -> np.array:
-	"""Bin and count number of spikes. Subtract baseline firing rate from final psth."""
-	#inc = 100 # 10 ms
-	try:
-		x = np.zeros(epoch.traces.shape)
-	except:
-		x = np.zeros(epoch.trace.shape)
-
-	x[epoch.spikes] = 1
-	psth = np.fromiter(
-		[
-			np.sum(x[ii:ii+inc])
-			for ii in range(0, epoch.trace.shape[0], inc)
-		], dtype=float)
-
-	# adjust for baseline
-	psth = 100 * (psth - np.mean(psth[:int(epoch.stimtime//100)]))
-	return psth 
+
+DEFAULT_BINSIZE = 100 # 10 ms
+
+def calculate_psth(epoch, inc=None, outputfile=None) -> np.array:
+	"""Bin and count number of spikes. Subtract baseline firing rate from final psth.
+
+	Bin size defaults to epoch.binsize. Only reads spike times, never the trace.
+	"""
+	if inc is None:
+		inc = getattr(epoch, "binsize", DEFAULT_BINSIZE)
+	return calculate_psths([epoch.spikes], [len(epoch)], [epoch.stimtime], inc)[0]
+
+def calculate_psths(spikes:List[np.array], lengths:Iterable[int], stimtimes:Iterable[float], inc:int=DEFAULT_BINSIZE) -> np.array:
+	"""PSTH for each spike train as rows of a 2-D array.
+
+	spikes    := spike indices for each epoch
+	lengths   := number of samples in each epoch
+	stimtimes := stim time in samples for each epoch. Bins before it are the baseline.
+	inc       := samples per bin
+
+	Rows shorter than the longest epoch are padded with zeros.
+	"""
+	return calculate_psths_multi(spikes, lengths, stimtimes, [inc])[inc]
+
+def calculate_psths_multi(spikes:List[np.array], lengths:Iterable[int], stimtimes:Iterable[float], incs:Iterable[int]) -> Dict[int, np.array]:
+	"""calculate_psths for several bin sizes, counting spikes once at the finest common bin."""
+	incs = [int(inc) for inc in incs]
+	lengths = np.asarray(list(lengths), dtype=int)
+	stimtimes = np.asarray(list(stimtimes), dtype=float)
+	n = len(lengths)
+	maxlen = int(lengths.max()) if n > 0 else 0
+
+	# COUNT EACH SPIKE INDEX ONCE PER EPOCH AT BASE BIN
+	base = reduce(gcd, incs)
+	nbase = -(-maxlen // base)
+	rows = np.repeat(np.arange(n), [len(sp) for sp in spikes])
+	times = (
+		np.concatenate([np.asarray(sp, dtype=int) for sp in spikes])
+		if n > 0 else np.zeros(0, dtype=int))
+	inepoch = (times >= 0) & (times < lengths[rows])
+	keys = np.unique(rows[inepoch] * max(maxlen, 1) + times[inepoch])
+	rows, times = np.divmod(keys, max(maxlen, 1))
+	counts = np.bincount(
+		rows * nbase + times // base,
+		minlength=n * nbase).reshape(n, nbase).astype(float)
+
+	psths = dict()
+	for inc in incs:
+		binned = counts
+		if inc != base and nbase > 0:
+			binned = np.add.reduceat(counts, np.arange(0, nbase, inc // base), axis=1)
+		nbins = -(-lengths // inc)
+
+		# adjust for baseline
+		nbaseline = np.minimum((stimtimes // inc).astype(int), nbins)
+		csum = np.concatenate([np.zeros((n, 1)), np.cumsum(binned, axis=1)], axis=1)
+		with np.errstate(invalid="ignore", divide="ignore"):
+			baseline = csum[np.arange(n), nbaseline] / nbaseline
+
+		inrange = np.arange(binned.shape[1]) < nbins[:, None]
+		psths[inc] = np.where(inrange, 100 * (binned - baseline[:, None]), 0.0)
+	return psths
@@ -5,15 +5,15 @@ Spike detection algorithm
 3. Remove single sample
 4. Separate peaks with k means clustering
 5. Check for 4 sigma difference from noise
+
+detect_spikes_batch runs the same steps on a 2-D array of equal length traces.
 """
-from typing import Tuple
+from typing import List, Tuple
 import logging
 
 import numpy as np
-from sklearn.cluster import KMeans
 
-from .. import epochtypes as et
-from .passfilters import high_pass_filter, low_pass_filter
+from .passfilters import high_pass_filter
 
 logger = logging.getLogger(__name__)
 
@@ -27,135 +27,190 @@ SEARCH_INTERVAL_POINTS = round(SEARCH_INTERVAL / SAMPLE_INTERVAL)
 
 
 def detect_spikes(R: np.array):
-    # PASS FILTERS
-    R_no_spikes = low_pass_filter(
-        high_pass_filter(
-            R,
-            HIGHPASSCUT_DRIFT,
-            SAMPLE_INTERVAL),
-        HIGHPASSCUT_SPIKES,
-        SAMPLE_INTERVAL)
+    return detect_spikes_batch(R[np.newaxis, :])[0]
+
 
+def detect_spikes_batch(R: np.array) -> List[Tuple[np.array, np.array]]:
+    """Detect spikes in each row of R
+
+    Args:
+            R (np.array): 2-D array of traces, one per row
+
+    Returns:
+            List[Tuple[np.array, np.array]]: (spike times, violation index) per trace.
+                Both None if no spikes are detected.
+    """
+    R = np.atleast_2d(R)
+    n, L = R.shape
+
+    # PASS FILTERS
     R_high_pass = high_pass_filter(
         R,
         HIGHPASSCUT_SPIKES,
-        SAMPLE_INTERVAL)
+        SAMPLE_INTERVAL,
+        axis=1)
 
-    # GET TRACE AND NOISE_STD
-    trace = R_high_pass.copy()
-    trace[:20] = R[:20] - np.mean(R[:20])
+    # GET TRACE AND NOISE_STD - FILTER OUTPUT IS A NEW ARRAY, MODIFIED IN PLACE
+    trace = R_high_pass
+    trace[:, :20] = R[:, :20] - np.mean(R[:, :20], axis=1, keepdims=True)
 
     # FILP IF NEEDED
-    if abs(max(trace)) > abs(min(trace)):
-        trace = -trace
-
-    R_no_spikes.std()
-
-    # GET PEAKS
-    peaks, peak_times = get_peaks(trace, -1)
-    neg_def_idx = np.flatnonzero(peaks < 0)
-    peak_times = peak_times[neg_def_idx]
-    peaks = trace[peak_times]
-
-    # REMOVE SINGLE SAMPLE PEAKS
-    trace_res_even = trace[0::2]
-    trace_res_odd = trace[1::2]
-    _, peak_times_res_even = get_peaks(trace_res_even, -1)
-    _, peak_times_res_odd = get_peaks(trace_res_odd, -1)
-    peak_times_res_even = peak_times_res_even * 2
-    peak_times_res_odd = 2 * peak_times_res_odd + 1
-    peak_times = np.array(sorted(set(peak_times) & set(
-        [*peak_times_res_even, *peak_times_res_odd])))  # could be trouble
-    peaks = trace[peak_times]
-
-	# initialize to none - changed if detected
-    sp = None
-    violation_idx = None
-    if len(peaks):
-        # CHECK FOR REBOUNDS ON THE OTHER SIDE
-        rebounds = get_rebounds(peak_times, trace, SEARCH_INTERVAL_POINTS)
-        peaks = abs(peaks)
-        peak_amps = peaks + rebounds
-
-        if len(peaks) and np.max(R) > np.min(R):
-            max_iter = 10000
-            init = np.array(
-                [[np.percentile(peak_amps, q=0.5)], [peak_amps.max()]])
-
-            clusters = KMeans(
-                n_clusters=2, init=init, n_init=1,
-                max_iter=max_iter).fit(peak_amps.reshape(-1, 1))
-
-            idx, centroids = clusters.labels_, clusters.cluster_centers_
-
-            _, m_idx = max(centroids), np.where(centroids == max(centroids))[0]
-            spike_ind_log = np.where(idx == m_idx)[0]
-
-            # DISTRIBUTION SEPARATION CHECK
-            spike_peaks = peak_amps[np.flatnonzero(idx)]
-            nonspike_peaks = peak_amps[np.flatnonzero(idx == 0)]
-            nonspike_idx = np.where(idx == 0)[0]
-            sigma = np.sqrt(nonspike_peaks).std()
-
-            # NO SPIKES CHECK - MUST HAVE 4 SIGMA DIFFERENCE
-            no_four_sigma_difference = (
-                np.mean(np.sqrt(spike_peaks)) < (np.mean(np.sqrt(nonspike_peaks)) + 4 * sigma))
-            spike_ind_log_is_zero = len(spike_ind_log) == 0
-
-            if (not no_four_sigma_difference) and (not spike_ind_log_is_zero):
-                overlaps = len(np.where(spike_peaks < max(nonspike_peaks)))
-                if overlaps < 0:
-                    logger.warning(
-                        f"{overlaps} spikes amplitudes overlapping tail of noise distribution.")
-
-                sp = peak_times[spike_ind_log]
-                max_noise_peak_idx = np.flatnonzero(
-                    nonspike_peaks == max(nonspike_peaks))
-                violation_idx = peak_times[nonspike_idx[max_noise_peak_idx]]
-
-                if len(sp) == 1:  # HACK IF ONLY ONE SPIKE SET TO NO SPIKE
-                    sp = violation_idx = None
-
-    if sp is None:
-        logger.info("No spikes detected.")
-
-    return (sp, violation_idx)
+    flip = np.abs(trace.max(axis=1)) > np.abs(trace.min(axis=1))
+    trace[flip] = -trace[flip]
+
+    # GET PEAKS - LOCAL MINIMA BELOW ZERO
+    peak_mask = get_peak_mask(trace, -1) & (trace < 0)
+
+    # REMOVE SINGLE SAMPLE PEAKS - MUST ALSO BE PEAKS IN EVERY OTHER SAMPLE
+    resampled = np.zeros_like(peak_mask)
+    resampled[:, 0::2] = get_peak_mask(trace[:, 0::2], -1)
+    resampled[:, 1::2] = get_peak_mask(trace[:, 1::2], -1)
+    peak_mask &= resampled
+
+    # CHECK FOR REBOUNDS ON THE OTHER SIDE
+    rows, peak_times = np.nonzero(peak_mask)
+    rebounds = get_rebounds_batch(rows, peak_times, trace, SEARCH_INTERVAL_POINTS)
+    peak_amps = np.abs(trace[rows, peak_times]) + rebounds
+
+    bounds = np.searchsorted(rows, np.arange(n + 1))
+    separates = R.max(axis=1) > R.min(axis=1)
+
+    out = []
+    for ii in range(n):
+        times = peak_times[bounds[ii]:bounds[ii + 1]]
+        amps = peak_amps[bounds[ii]:bounds[ii + 1]]
+
+        sp, violation_idx = None, None
+        if len(amps) > 1 and separates[ii]:
+            sp, violation_idx = _separate_spikes(times, amps)
+
+        if sp is None:
+            logger.info("No spikes detected.")
+        out.append((sp, violation_idx))
+    return out
+
+
+def _separate_spikes(peak_times: np.array, peak_amps: np.array) -> Tuple[np.array, np.array]:
+    """Cluster peaks into noise and spikes. Spikes must be 4 sigma above the noise."""
+    init = (np.percentile(peak_amps, q=0.5), peak_amps.max())
+    idx = two_means(peak_amps, init)
+    if idx is None:
+        return None, None
+
+    spike_peaks = peak_amps[idx]
+    nonspike_peaks = peak_amps[~idx]
+    sigma = np.sqrt(nonspike_peaks).std()
+
+    # NO SPIKES CHECK - MUST HAVE 4 SIGMA DIFFERENCE
+    if np.mean(np.sqrt(spike_peaks)) < (np.mean(np.sqrt(nonspike_peaks)) + 4 * sigma):
+        return None, None
+
+    sp = peak_times[idx]
+    nonspike_idx = np.flatnonzero(~idx)
+    max_noise_peak_idx = np.flatnonzero(
+        nonspike_peaks == max(nonspike_peaks))
+    violation_idx = peak_times[nonspike_idx[max_noise_peak_idx]]
+
+    if len(sp) == 1:  # HACK IF ONLY ONE SPIKE SET TO NO SPIKE
+        return None, None
+    return sp, violation_idx
+
+
+def two_means(X: np.array, init: Tuple[float, float], max_iter: int = 10000) -> np.array:
+    """Lloyd's algorithm for 2 clusters on 1-D data
+
+    With sorted values the clusters are split by a threshold halfway between the
+    centroids, so each iteration is a binary search and two cumulative sums.
+
+    Args:
+            X (np.array): 1-D values
+            init (Tuple[float, float]): Initial (low, high) centroids
+
+    Returns:
+            np.array: True where value belongs to the high cluster. None if either cluster is empty.
+    """
+    order = np.argsort(X, kind="stable")
+    xs = X[order]
+    csum = np.concatenate([[0.0], np.cumsum(xs)])
+    n = len(xs)
+
+    low, high = init
+    split = None
+    for _ in range(max_iter):
+        # VALUES CLOSER TO LOW CENTROID. TIES GO TO LOW.
+        nsplit = np.searchsorted(xs, (low + high) / 2, side="right")
+        if nsplit == split or nsplit == 0 or nsplit == n:
+            break
+        split = nsplit
+        low = csum[split] / split
+        high = (csum[n] - csum[split]) / (n - split)
+
+    if split is None or nsplit == 0 or nsplit == n:
+        return None
+
+    idx = np.zeros(n, dtype=bool)
+    idx[order[split:]] = True
+    return idx
+
+
+def get_rebounds_batch(rows: np.array, peaks_idx: np.array, trace_in: np.array, search_interval: int) -> np.array:
+    """get_rebounds for peaks across a 2-D array of traces
+
+    Args:
+            rows (np.array): Row of trace_in for each peak
+            peaks_idx (np.array): Index of each peak in its row
+            trace_in (np.array): 2-D array of traces
+            search_interval (int): Points after peak to look for rebound in
+    """
+    trace = np.abs(trace_in)
+    n, L = trace.shape
+    peaks = trace[rows, peaks_idx]
+
+    # FIRST TURNING POINT IN WINDOW trace[peak:peak+search_interval+1] - MUST HAVE A POINT AFTER IT IN WINDOW
+    last = np.minimum(peaks_idx + search_interval - 1, L - 2)
+    start = rows * L + peaks_idx + 1
+    stop = rows * L + last
+
+    def first_in_window(mask):
+        found = np.flatnonzero(mask.ravel())
+        if len(found) == 0:
+            return np.zeros(len(start), dtype=bool), np.zeros(len(start), dtype=int)
+        at = found[np.minimum(np.searchsorted(found, start), len(found) - 1)]
+        return (at >= start) & (at <= stop), at
+
+    has_min, at_min = first_in_window(get_peak_mask(trace, -1))
+    next_min = np.where(has_min, trace.ravel()[at_min], peaks)
+
+    has_max, at_max = first_in_window(get_peak_mask(trace, 1))
+    next_max = np.where(has_max, trace.ravel()[at_max], 0)
+
+    return np.where(next_min < peaks, 0, next_max).astype(float)
 
 
 def get_rebounds(peaks_idx: np.array, trace_in: np.array, search_interval: float) -> np.array:
-    trace = abs(trace_in)
-    peaks = trace[peaks_idx]
-    r = np.zeros(peaks.shape)
-
-    for i, peak in enumerate(peaks):
-        end_point = min(peaks_idx[i] + search_interval, len(trace)) + 1
-        next_min, _ = get_peaks(trace[peaks_idx[i]:end_point], -1)
-
-        if len(next_min) == 0:
-            next_min = peak
-        else:
-            next_min = next_min[0]
-
-        next_max, _ = get_peaks(trace[peaks_idx[i]:end_point], 1)
-        if len(next_max) == 0:
-            next_max = 0
-        else:
-            next_max = next_max[0]
-
-        if next_min < peak:
-            r[i] = 0
-        else:
-            r[i] = next_max
-    return r
+    """Rebound after each peak. Finds the first turning points after every peak at
+    once with a binary search instead of re-slicing a window per peak."""
+    peaks_idx = np.asarray(peaks_idx, dtype=int)
+    return get_rebounds_batch(
+        np.zeros(len(peaks_idx), dtype=int),
+        peaks_idx,
+        np.asarray(trace_in)[np.newaxis, :],
+        int(search_interval))
+
+
+def get_peak_mask(R: np.array, direction: int) -> np.array:
+    """Boolean mask of get_peaks indices along last axis of R"""
+    mat = np.diff(np.diff(R, axis=-1) > 0, axis=-1)
+    mask = np.zeros(R.shape, dtype=bool)
+    if direction > 0:
+        mask[..., 1:-1] = mat < 0
+    else:
+        mask[..., 1:-1] = mat > 0
+    return mask
 
 
 def get_peaks(R: np.array, direction: int) -> Tuple[np.array, np.array]:
-    if direction > 0:
-        mat = np.diff(np.diff(R) > 0)
-        idx = np.flatnonzero(mat < 0)+1
-    else:
-        mat = np.diff(np.diff(R) > 0)
-        idx = np.flatnonzero(mat > 0)+1
+    idx = np.flatnonzero(get_peak_mask(R, direction))
 
     peaks = R[idx]
     peak_times = idx
@@ -4,6 +4,8 @@ from scipy.optimize import curve_fit
 
 class WeberEquation:
 
+	PARAMS = ("beta",)
+
 	def __init__(self, beta = None):
 		self.beta: float = beta
 		self.r2: float = None
@@ -20,11 +22,15 @@ class WeberEquation:
 	def ihalf(self):
 		return self.invequation(0.5)
 
+	@property
+	def params(self):
+		return (self.beta,)
+
 	def fit(self, X, Y, p0 = (-1,), **kwargs):
 		# NORMALIZE FIT DATA
 		X_, Y_ = self.normalize(X, Y)
 
-		fit = curve_fit(self.equation, X_, Y_, p0 = p0, **kwargs)
+		fit = curve_fit(self.equation, X_, Y_, p0 = p0, jac = self.jacobian, **kwargs)
 
 		self.beta = fit[0][0]
 
@@ -46,4 +52,10 @@ class WeberEquation:
 
 	@staticmethod
 	def equation(X, beta):
-		return 1 / (1 + (X / beta))
\ No newline at end of file
+		return 1 / (1 + (X / beta))
+
+	@staticmethod
+	def jacobian(X, beta):
+		"""Derivative of equation by beta, one row per X"""
+		X = np.asarray(X, dtype=float)
+		return (X / beta ** 2 / (1 + X / beta) ** 2)[:, np.newaxis]
\ No newline at end of file
@@ -4,4 +4,5 @@ from .sacaadeepoch import SaccadeEpoch, SaccadeEpochs
 from .chirpepoch import ChirpEpoch, ChirpEpochs
 from .baseepoch import IEpoch, EpochBlock 
 from .ns_epochtypes import groupby,  filter
-from .epochfactory import epoch_factory
+from .epochfactory import epoch_factory, epoch_class
+from .lazyepoch import LazyEpoch
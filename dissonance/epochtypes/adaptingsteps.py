@@ -67,11 +67,6 @@ class AdaptingStepsEpoch(IEpoch):
         firstpeak, secondpeak = self.peaks
         return firstpeak / secondpeak
 
-    @property
-    def trace(self):
-        vals = self._response_ds[:]
-        return vals
-
     @property
     def type(self) -> str:
         return "ApdatingStepTrace"
@@ -92,6 +87,3 @@ class AdpatingStepsEpochs(EpochBlock):
     def __init__(self, epochs: List[AdaptingStepsEpoch]):
         super().__init__(epochs)
 
-    @property
-    def trace(self) -> float:
-        return np.mean(self.traces, axis=0)
@@ -1,15 +1,23 @@
 from abc import ABC, abstractproperty
-from typing import Dict, Iterable, List, Tuple
+from functools import cached_property
+from typing import Any, Dict, Iterable, List, Tuple
 
 import h5py
 import numpy as np
+from scipy.stats import sem
+
+from .derived import read_derived
 
 
 class IEpoch(ABC):
 
+    # METRICS DissonanceUpdater.derive STORES FOR EACH EPOCH
+    DERIVED: Tuple[str, ...] = ()
+
     def __init__(self, epochgrp: h5py.Group):
 
         self._epochpath: str = epochgrp.name
+        self._epochgrp = epochgrp
         self._response_ds = epochgrp["Amp1"]
 
         self.protocolname = epochgrp.attrs.get("protocolname")
@@ -62,7 +70,8 @@ class IEpoch(ABC):
         return f"Epoch(cell_name={self.cellname}, start_date={self.startdate})"
 
     def __len__(self):
-        return len(self.trace)
+        # FROM DATASET SHAPE SO THE TRACE ISN'T READ
+        return self._response_ds.shape[0]
 
     def update(self, paramname, value):
         if paramname in set(["genotype", "celltype"]):
@@ -77,9 +86,55 @@ class IEpoch(ABC):
         else:
             print(f"Can't change {paramname} to {value}")
 
+    @property
+    def derived_inputs(self) -> Dict[str, Any]:
+        """Parameters stored metrics depend on. Stored metrics are ignored once any change."""
+        return dict(
+            protocolname=self.protocolname, tracetype=self.tracetype,
+            celltype=self.celltype, lightamplitude=self.lightamplitude,
+            pretime=self.pretime, stimtime=self.stimtime, samples=len(self),
+            fingerprint=self._epochgrp.attrs.get("fingerprint"))
+
+    @cached_property
+    def derived(self) -> Dict[str, Any]:
+        """Metrics stored in the epoch's derived group, if still valid"""
+        if not self.DERIVED:
+            return dict()
+        return read_derived(self._epochgrp, self.derived_inputs)
+
+    def compute_derived(self) -> Dict[str, Any]:
+        """Calculate DERIVED metrics from the response, ignoring stored values.
+
+        Call before any of the metrics are read, they are cached once read.
+        """
+        self.derived = dict()
+        return {name: getattr(self, name) for name in self.DERIVED}
+
     @property
     def trace(self):
-        return self._response_ds[:]
+        return self.read_trace()
+
+    def read_trace(self, out: np.ndarray = None) -> np.ndarray:
+        """Read response straight from the h5 dataset
+
+        Args:
+                out (np.ndarray): Buffer at least len(self) long to read into. Only
+                        the first len(self) values are written.
+
+        Returns:
+                np.ndarray: The len(self) long view of out holding the trace
+        """
+        n = len(self)
+        if out is None:
+            out = np.empty(n, dtype=float)
+        vals = out[:n]
+        if n > 0:
+            self._response_ds.read_direct(vals)
+        return self._adjust_trace(vals)
+
+    def _adjust_trace(self, vals: np.ndarray) -> np.ndarray:
+        """Modify freshly read response in place (e.g. baseline subtraction)"""
+        return vals
 
     @property
     @abstractproperty
@@ -109,6 +164,9 @@ class EpochBlock(ABC):
 
         # DUMMY PROPERTIES
         self._trace_len: int = None
+        self._traces: np.ndarray = None
+        self._trace: np.ndarray = None
+        self._trace_sem: np.ndarray = None
 
     def __str__(self):
         return "EpochBlock"
@@ -135,6 +193,9 @@ class EpochBlock(ABC):
 
     def append(self, epoch) -> None:
         self._trace_len = None
+        self._traces = None
+        self._trace = None
+        self._trace_sem = None
         self._epochs.append(epoch)
 
 
@@ -148,12 +209,42 @@ class EpochBlock(ABC):
 
     @property
     def traces(self) -> np.array:
-        # PAD ALL VALUES TO STRETCH INTO FULL ARRAY
-        return np.vstack(
-            [
-                np.pad(epoch.trace, (0, 0 if self.trace_len == len(epoch) else self.trace_len - len(epoch)))
-                for epoch in self._epochs
-            ])
+        """Epochs x trace_len matrix of traces, zero padded at the end. Read only."""
+        if self._traces is None:
+            # READ EACH DATASET STRAIGHT INTO ITS ROW, PADDING IS ALREADY ZERO
+            traces = np.zeros((len(self._epochs), self.trace_len if self._epochs else 0), dtype=float)
+            for row, epoch in zip(traces, self._epochs):
+                epoch.read_trace(out=row)
+            traces.flags.writeable = False
+            self._traces = traces
+        return self._traces
+
+    @property
+    def trace(self) -> np.array:
+        """Mean trace across epochs"""
+        if self._trace is None:
+            self._trace = np.mean(self.traces, axis=0)
+            self._trace.flags.writeable = False
+        return self._trace
+
+    @property
+    def trace_sem(self) -> np.array:
+        """Standard error of the mean trace across epochs"""
+        if self._trace_sem is None:
+            self._trace_sem = np.atleast_1d(sem(self.traces, axis=0))
+            self._trace_sem.flags.writeable = False
+        return self._trace_sem
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the arrays cached on the block and its epochs"""
+        # LAZY EPOCHS HOLD NOTHING, THE EPOCH THEY STAND IN FOR DOES
+        epochs = (getattr(epoch, "_epoch", epoch) for epoch in self._epochs)
+        return sum(
+            val.nbytes
+            for obj in (self, *epochs) if obj is not None
+            for val in vars(obj).values()
+            if isinstance(val, np.ndarray))
 
     def get(self, paramname) -> np.array:
         try:
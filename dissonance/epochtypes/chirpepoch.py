@@ -45,6 +45,3 @@ class ChirpEpochs(EpochBlock):
         self.holdingpotential = epochs[0].holdingpotential
         self.backgroundval = epochs[0].backgroundval
 
-    @property
-    def trace(self) -> float:
-        return np.mean(self.traces, axis=0)
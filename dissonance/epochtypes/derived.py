@@ -0,0 +1,51 @@
+"""Metrics computed from an epoch's response, stored next to it in the mapped file.
+
+Each epoch group can hold a ``derived`` subgroup, written in bulk by
+``DissonanceUpdater.derive``. Scalar metrics are attributes and arrays (PSTHs)
+are datasets. The group also records DERIVED_VERSION and the epoch parameters
+the metrics were computed from, and is only used while both still match.
+"""
+import json
+from typing import Any, Dict
+
+import h5py
+import numpy as np
+
+# BUMP WHEN ANY STORED METRIC IS CALCULATED DIFFERENTLY
+DERIVED_VERSION = 1
+DERIVED_GROUP = "derived"
+
+
+def inputs_key(inputs: Dict[str, Any]) -> str:
+    return json.dumps(inputs, sort_keys=True, default=str)
+
+
+def read_derived(epochgrp: h5py.Group, inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """Stored metrics of epochgrp. Empty if missing, from another version or other inputs."""
+    grp = epochgrp.get(DERIVED_GROUP)
+    if grp is None:
+        return dict()
+
+    values = dict(grp.attrs)
+    if (values.pop("version", None) != DERIVED_VERSION
+            or values.pop("inputs", None) != inputs_key(inputs)):
+        return dict()
+
+    for name, ds in grp.items():
+        values[name] = ds[()]
+    return values
+
+
+def write_derived(epochgrp: h5py.Group, inputs: Dict[str, Any], values: Dict[str, Any]) -> None:
+    """Replace stored metrics of epochgrp with values"""
+    if DERIVED_GROUP in epochgrp:
+        del epochgrp[DERIVED_GROUP]
+    grp = epochgrp.create_group(DERIVED_GROUP)
+    grp.attrs["version"] = DERIVED_VERSION
+    grp.attrs["inputs"] = inputs_key(inputs)
+
+    for name, val in values.items():
+        if isinstance(val, np.ndarray):
+            grp.create_dataset(name, data=val)
+        else:
+            grp.attrs[name] = val
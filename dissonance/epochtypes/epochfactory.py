@@ -1,3 +1,5 @@
+from typing import Type
+
 import h5py
 
 from dissonance.epochtypes.expandingspots import ExpandingSpotsEpoch
@@ -14,27 +16,38 @@ from .ledpairedsinewavepulse import LedPairedSineWavePulseEpoch
 EpochType = SpikeEpoch | WholeEpoch | NoiseEpoch | SaccadeEpoch | ChirpEpoch | LedPairedPulseFamilyEpoch | AdaptingStepsEpoch
 
 
-def epoch_factory(epochgrp: h5py.Group) -> EpochType:
-    protocolname = epochgrp.attrs["protocolname"]
+def epoch_class(protocolname: str, tracetype: str = None) -> Type[EpochType]:
+    """Epoch type for protocol. None if protocol is known but trace type isn't."""
     if protocolname == "LedNoiseFamily":
-        return NoiseEpoch(epochgrp)
+        return NoiseEpoch
     elif protocolname == "SaccadeTrajectory2":
-        return SaccadeEpoch(epochgrp)
+        return SaccadeEpoch
     elif protocolname == "AdaptingSteps":
-        return AdaptingStepsEpoch(epochgrp)
+        return AdaptingStepsEpoch
     elif protocolname in ["LedPairedPulseFamily", "LedPairedPulseFamilyOriginal"]:
-        return LedPairedPulseFamilyEpoch(epochgrp)
+        return LedPairedPulseFamilyEpoch
     elif protocolname == "ChirpStimulusLED":
-        return ChirpEpoch(epochgrp)
+        return ChirpEpoch
     elif protocolname == "ExpandingSpots":
-        return ExpandingSpotsEpoch(epochgrp)
+        return ExpandingSpotsEpoch
     elif protocolname in ["LedPulse", "LedPulseFamily"]:
-        tracetype = epochgrp.attrs["tracetype"]
         if tracetype == "spiketrace":
-            return SpikeEpoch(epochgrp)
+            return SpikeEpoch
         elif tracetype == "wholetrace":
-            return WholeEpoch(epochgrp)
+            return WholeEpoch
     elif protocolname in ("LedPairedSineWavePulse", ):
-        return LedPairedSineWavePulseEpoch(epochgrp)
+        return LedPairedSineWavePulseEpoch
     else:
+        raise NotImplementedError(f"Trace type not yet specified for {protocolname}")
+
+
+def epoch_factory(epochgrp: h5py.Group) -> EpochType:
+    try:
+        epochtype = epoch_class(
+            epochgrp.attrs["protocolname"],
+            epochgrp.attrs.get("tracetype"))
+    except NotImplementedError:
         raise NotImplementedError(f"Trace type not yet specified for {epochgrp}")
+
+    if epochtype is not None:
+        return epochtype(epochgrp)
@@ -0,0 +1,80 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Type
+
+import h5py
+
+from .baseepoch import IEpoch
+
+if TYPE_CHECKING:
+    from ..io.filepool import FilePool
+
+
+class LazyEpoch:
+    """Placeholder for an IEpoch that only reads its h5 group when first used.
+
+    Reports the class of the epoch it stands in for, so ``isinstance`` checks and
+    ``epoch.__class__`` behave as they would on the real epoch. Any other attribute
+    access builds the epoch and delegates to it.
+
+    Given the FilePool of its file, the epoch is rebuilt from a freshly opened
+    experiment group if the pool closed or reopened the file since it was built
+    (e.g. evicted it). Only the pool's generation of the file is checked on access.
+    """
+
+    __slots__ = ("_experiment", "_name", "_epochclass", "_epoch", "_files", "_path", "_generation", "number")
+
+    def __init__(self, experiment: h5py.Group, name: str, epochclass: Type[IEpoch],
+                 files: "FilePool" = None, path: Path = None, generation: int = None):
+        object.__setattr__(self, "_experiment", experiment)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_epochclass", epochclass)
+        object.__setattr__(self, "_epoch", None)
+        object.__setattr__(self, "_files", files)
+        object.__setattr__(self, "_path", path)
+        object.__setattr__(self, "_generation", generation)
+        # SAME AS IEpoch.number, KNOWN FROM GROUP NAME
+        object.__setattr__(self, "number", float(name[5:]))
+
+    @property
+    def __class__(self):
+        return self._epochclass
+
+    @property
+    def is_materialized(self) -> bool:
+        return self._epoch is not None
+
+    def materialize(self) -> IEpoch:
+        if self._files is not None and self._generation != self._files.generation(self._path):
+            # FILE CLOSED OR REOPENED SINCE THE EPOCH WAS BUILT
+            experiment, generation = self._files.get(self._path)
+            object.__setattr__(self, "_experiment", experiment)
+            object.__setattr__(self, "_generation", generation)
+            object.__setattr__(self, "_epoch", None)
+        if self._epoch is None:
+            object.__setattr__(
+                self, "_epoch", self._epochclass(self._experiment[self._name]))
+        return self._epoch
+
+    def __getattr__(self, name):
+        # DON'T READ FILE WHEN LIBRARIES PROBE FOR PROTOCOLS (__iter__, __array__, ...)
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.materialize(), name, value)
+
+    def __hash__(self):
+        return hash(self.materialize())
+
+    def __str__(self):
+        return str(self.materialize())
+
+    def __repr__(self):
+        if self._epoch is None:
+            filename = self._experiment.file.filename if self._experiment else "closed"
+            return f"LazyEpoch({self._epochclass.__name__}, {filename}:{self._name})"
+        return repr(self._epoch)
+
+    def __len__(self):
+        return len(self.materialize())
@@ -20,11 +20,9 @@ class LedPairedSineWavePulseEpoch(IEpoch):
         self.second_wave_frequency = epochgrp.attrs["second_wave_frequency"]
         self.second_wave_time = epochgrp.attrs["second_wave_time"]
 
-    @property
-    def trace(self):
-        vals = self._response_ds[:]
+    def _adjust_trace(self, vals: np.ndarray) -> np.ndarray:
         # baseline subtracted
-        vals = vals - np.mean(vals[:int(self.pretime)])
+        vals -= np.mean(vals[:int(self.pretime)])
         return vals
 
     @property
@@ -38,6 +36,3 @@ class LedPairedSineWavePulseEpochs(EpochBlock):
     def __init__(self, epochs: List[LedPairedSineWavePulseEpoch]):
         super().__init__(epochs)
 
-    @property
-    def trace(self) -> float:
-        return np.mean(self.traces, axis=0)
@@ -23,11 +23,6 @@ class LedPairedSquareWavePulseEpoch(IEpoch):
         self.second_wave_frequency = epochgrp.attrs["secondWaveFrequency"]
         self.second_wave_time = epochgrp.attrs["secondWaveTime"]
 
-    @property
-    def trace(self):
-        vals = self._response_ds[:]
-        return vals
-
     @property
     def type(self) -> str:
         return "LedPairedSquareWavePulseTrace"
@@ -42,6 +37,3 @@ class LedPairedSquareWavePulseEpochs(EpochBlock):
     def __init__(self, epochs: List[LedPairedSquareWavePulseEpoch]):
         super().__init__(epochs)
 
-    @property
-    def trace(self) -> float:
-        return np.mean(self.traces, axis=0)
@@ -18,7 +18,7 @@ def groupby(frame:pd.DataFrame, grpkeys) -> pd.DataFrame:
 	Convert Traces to table with Epochs grouped by grpkeys
 	"""
 	defaultdict(list)
-	epochtype =  type(frame.epoch.iloc[0])# ASSUME SINGLE TYPE PER LIST
+	epochtype =  frame.epoch.iloc[0].__class__# ASSUME SINGLE TYPE PER LIST
 
 	# TODO make this dynamic within epoch factory
 	if epochtype == wt.WholeEpoch: types = wt.WholeEpochs
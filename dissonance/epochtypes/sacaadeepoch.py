@@ -17,10 +17,10 @@ class SaccadeEpoch(IEpoch):
         self.holdingpotential = epochgrp.attrs.get("holdingpotential")
         self.backgroundval = epochgrp.attrs.get("backgroundval")
 
-    @property
-    def trace(self):
-        vals = self._response_ds[:] 
-        return vals - np.mean(vals[:int(self.pretime)])
+    def _adjust_trace(self, vals: np.ndarray) -> np.ndarray:
+        # baseline subtracted
+        vals -= np.mean(vals[:int(self.pretime)])
+        return vals
 
     @property
     def type(self) -> str:
@@ -35,6 +35,3 @@ class SaccadeEpochs(EpochBlock):
         self.holdingpotential = epochs[0].holdingpotential
         self.backgroundval = epochs[0].backgroundval
 
-    @property
-    def trace(self) -> float:
-        return np.mean(self.traces, axis=0)
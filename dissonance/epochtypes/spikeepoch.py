@@ -1,7 +1,7 @@
 from typing import List, Dict
 
 import numpy as np
-from ..analysis_functions.psth import calculate_psth
+from ..analysis_functions.psth import DEFAULT_BINSIZE, calculate_psth, calculate_psths
 import h5py
 
 from .baseepoch import EpochBlock, IEpoch
@@ -9,6 +9,8 @@ from .baseepoch import EpochBlock, IEpoch
 
 class SpikeEpoch(IEpoch):
 
+    DERIVED = ("psth", "binsize")
+
     def __init__(self, epochgrp: h5py.Group):
         super().__init__(epochgrp)
         if "Spikes" in epochgrp:
@@ -17,7 +19,7 @@ class SpikeEpoch(IEpoch):
             self._spikegrp = []
 
         self._psth = None
-        self._binsize = 100
+        self._binsize = DEFAULT_BINSIZE
 
     @property
     def binsize(self):
@@ -25,6 +27,8 @@ class SpikeEpoch(IEpoch):
 
     @binsize.setter
     def binsize(self, val):
+        if val != self._binsize:
+            self._psth = None
         self._binsize = val
 
     @property
@@ -35,8 +39,18 @@ class SpikeEpoch(IEpoch):
     def spikes(self) -> np.array:
         return np.array(self._spikegrp[:], dtype=int)
 
+    @property
+    def stored_psth(self) -> np.array:
+        """PSTH from the derived group if it was binned at binsize, else None"""
+        derived = self.derived
+        if "psth" in derived and derived["binsize"] == self.binsize:
+            return derived["psth"]
+        return None
+
     @property
     def psth(self) -> np.array:
+        if self._psth is None:
+            self._psth = self.stored_psth
         if self._psth is None:
             self._psth = calculate_psth(self)
         return self._psth
@@ -44,16 +58,16 @@ class SpikeEpoch(IEpoch):
     @property
     def timetopeak(self) -> float:
         rng = self.peak_window_range
-        return rng[0]//100 + np.argmax(self.psth[rng[0]//100:rng[1]//100])
+        return rng[0]//self.binsize + np.argmax(self.psth[rng[0]//self.binsize:rng[1]//self.binsize])
 
     @property
     def peakamplitude(self) -> float:
         rng = self.peak_window_range
-        return np.max(self.psth[rng[0]//100:rng[1]//100])
+        return np.max(self.psth[rng[0]//self.binsize:rng[1]//self.binsize])
 
     @property
     def timetopeaksec(self) -> float:
-        return (self.timetopeak * 100 - self.pretime) / 10000
+        return (self.timetopeak * self.binsize - self.pretime) / 10000
 
     @property
     def type(self) -> str:
@@ -100,28 +114,52 @@ class SpikeEpochs(EpochBlock):
             self._psth = np.mean(self.psths, axis=0)
         return self._psth
 
+    @property
+    def binsize(self) -> int:
+        return self._epochs[0].binsize if len(self._epochs) > 0 else DEFAULT_BINSIZE
+
+    @binsize.setter
+    def binsize(self, val):
+        for epoch in self._epochs:
+            epoch.binsize = val
+        self._psth = self._psths = None
+
+    def append(self, epoch) -> None:
+        super().append(epoch)
+        self._psth = self._psths = None
+
     @property
     def psths(self) -> np.array:
-        inc = 100
+        """PSTH of each epoch in one 2-D array, padded to the longest epoch"""
         if self._psths is None:
-            self._psths = []
-            for trace in self._epochs:
-                if len(trace.psth) > 0 and trace.psth is not None:
-                    cpsth = np.pad(
-                        trace.psth, (0, int(self.trace_len // inc - len(trace.psth))))
-                    self._psths.append(cpsth)
-        return np.array(self._psths, dtype=float)
+            epochs = [epoch for epoch in self._epochs if len(epoch) > 0]
+
+            # STORED PSTHS SKIP READING SPIKES
+            stored = [epoch.stored_psth for epoch in epochs]
+            if stored and all(psth is not None for psth in stored):
+                psths = np.zeros((len(stored), max(len(psth) for psth in stored)))
+                for row, psth in zip(psths, stored):
+                    row[:len(psth)] = psth
+                self._psths = psths
+                return self._psths
+
+            self._psths = calculate_psths(
+                [epoch.spikes for epoch in epochs],
+                [len(epoch) for epoch in epochs],
+                [epoch.stimtime for epoch in epochs],
+                self.binsize)
+        return self._psths
 
     @property
     def timetopeak(self) -> float:
-        return self.rng[0]//100 + np.argmax(self.psth[self.rng[0]//100:self.rng[1]//100])
+        return self.rng[0]//self.binsize + np.argmax(self.psth[self.rng[0]//self.binsize:self.rng[1]//self.binsize])
 
     @property
     def peakamplitude(self) -> float:
-        return np.max(self.psth[self.rng[0]//100:self.rng[1]//100])
+        return np.max(self.psth[self.rng[0]//self.binsize:self.rng[1]//self.binsize])
 
     @property
     def timetopeaksec(self) -> float:
         self.pretime = self.epochs[0].pretime
-        return (self.timetopeak * 100 - self.pretime) / 10000
+        return (self.timetopeak * self.binsize - self.pretime) / 10000
 
@@ -32,6 +32,8 @@ def calc_width_at_half_max(values, holdingpotential):
 
 class WholeEpoch(IEpoch):
 
+    DERIVED = ("timetopeak", "peakamplitude", "width_at_half_max", "widthrange", "crf_value")
+
     def __init__(self, epochgrp:h5py.Group):
 
         super().__init__(epochgrp)
@@ -43,14 +45,20 @@ class WholeEpoch(IEpoch):
         self._peakamplitude = None
         self._widthrange = None
 
+    def _adjust_trace(self, vals: np.ndarray) -> np.ndarray:
+        # baseline subtracted
+        vals -= np.mean(vals[:int(self.pretime)])
+        return vals
+
     @property
-    def trace(self):
-        vals = self._response_ds[:] 
-        return vals - np.mean(vals[:int(self.pretime)])
+    def derived_inputs(self):
+        return dict(super().derived_inputs, holdingpotential=self.holdingpotential)
 
     @cached_property
     def timetopeak(self) -> float:
         rng = self.peak_window_range
+        if self._timetopeak is None and "timetopeak" in self.derived:
+            self._timetopeak = self.derived["timetopeak"]
         if self._timetopeak is None:
             if (self.holdingpotential == "inhibition") or (self.lightamplitude < 0):
                 self._timetopeak  = rng[0] + np.argmax(self.trace[rng[0]:rng[1]])
@@ -60,6 +68,8 @@ class WholeEpoch(IEpoch):
 
     @cached_property
     def widthrange(self) -> float:
+        if self._widthrange is None and "widthrange" in self.derived:
+            self._widthrange = tuple(int(x) for x in self.derived["widthrange"])
         if self._widthrange is None:
             # set this property to set range as well
             self.width_at_half_max
@@ -68,6 +78,8 @@ class WholeEpoch(IEpoch):
     @cached_property
     def peakamplitude(self) -> float:
         rng = self.peak_window_range
+        if self._peakamplitude is None and "peakamplitude" in self.derived:
+            self._peakamplitude = self.derived["peakamplitude"]
         if self._peakamplitude is None:
             if (self.holdingpotential == "inhibition") or (self.lightamplitude < 0):
                 self._peakamplitude  = np.max(self.trace[rng[0]:rng[1]])
@@ -82,6 +94,8 @@ class WholeEpoch(IEpoch):
     @cached_property
     def width_at_half_max(self) -> float:
         rng = self.peak_window_range
+        if self._widthathalfmax is None and "width_at_half_max" in self.derived:
+            self._widthathalfmax = self.derived["width_at_half_max"]
         if self._widthathalfmax is None:
             self._widthathalfmax, self._widthrange = calc_width_at_half_max(self.trace[rng[0]:rng[1]], self.holdingpotential)
             self._widthrange = (rng[0] + self._widthrange[0], rng[0] + self._widthrange[1])
@@ -101,6 +115,8 @@ class WholeEpoch(IEpoch):
 
     @cached_property
     def crf_value(self) -> float:
+        if "crf_value" in self.derived:
+            return self.derived["crf_value"]
         rng = self.peak_window_range
         if "ON" in self.celltype and self.lightamplitude < 0:
             return np.max(self.trace[rng[0]:rng[1]])
@@ -138,10 +154,6 @@ class WholeEpochs(EpochBlock):
         self.peak_window_range = epochs[0].peak_window_range
         self.flashintensity = epochs[0].flashintensity
 
-    @property
-    def trace(self) -> float:
-        return np.mean(self.traces, axis=0)
-
     @property
     def width_at_half_max(self) -> float:
         rng = self.peak_window_range
@@ -1,3 +1,7 @@
 from .symphony.symphonyio import SymphonyIO
+from .symphony.converter import SymphonyConverter
 from .symphony.rstarr_converter import RStarrConverter
-from .dissonanceio import DissonanceReader, DissonanceUpdater, EpochIO, read_light_info_from_log
\ No newline at end of file
+from .dissonanceio import DissonanceReader, DissonanceUpdater, EpochIO, read_light_info_from_log
+from .filepool import FilePool
+from .paramsindex import ParamsIndex
+from .layout import LAYOUTS, StorageLayout, migrate
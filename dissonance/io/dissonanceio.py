@@ -1,15 +1,20 @@
 import multiprocessing as mp
-import operator
 import re
-from functools import partial, reduce
+import threading
+from bisect import insort
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 import h5py
+import numpy as np
 import pandas as pd
 
 from ..analysis.analysistree import AnalysisTree
-from ..epochtypes import epoch_factory
+from ..epochtypes import LazyEpoch, epoch_class, epoch_factory
+from ..epochtypes.derived import write_derived
+from .filepool import DEFAULT_MAXOPEN, FilePool
+from .paramsindex import ParamsIndex
 
 import logging
 
@@ -23,6 +28,19 @@ MAPPED_DIR = Path("/home/joe/Projects/datastore/dissonance")
 RAW_DIR = Path("/home/joe/Projects/datastore/sinhalab/experiments")
 
 
+def parse_startdates(startdates) -> np.ndarray:
+    """datetime64[ns] of startdate strings or timestamps. Missing values are NaT.
+
+    Parsed by numpy, which accepts startdates with and without microseconds mixed
+    on every pandas version.
+    """
+    values = np.asarray(startdates, dtype=object).ravel()
+    parsed = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[ns]")
+    present = ~pd.isna(values)
+    parsed[present] = np.array(values[present].tolist(), dtype="datetime64[ns]")
+    return parsed
+
+
 def get_files(folders, root: Path = MAPPED_DIR):
     paths = []
     for fldr in folders:
@@ -31,6 +49,52 @@ def get_files(folders, root: Path = MAPPED_DIR):
     return paths
 
 
+def frame_to_epochs(frame: pd.DataFrame, experiments: Dict[Path, h5py.Group], lazy=True) -> pd.Series:
+    """Epoch for each row of a params table, built in one pass per file.
+
+    Args:
+            frame (pd.DataFrame): Params table rows, with exppath and number columns
+            experiments (Dict[Path, h5py.Group]): experiment group of each exppath, or a FilePool
+            lazy (bool): Return LazyEpochs that read the h5 group on first use
+
+    Returns:
+            pd.Series: Epochs aligned with frame. None where no epoch type applies.
+    """
+    epochs = np.full(frame.shape[0], None, dtype=object)
+    # LAZY EPOCHS OF A POOL REOPEN THEIR FILE IF IT'S CLOSED
+    files = experiments if isinstance(experiments, FilePool) else None
+    for exppath, positions in frame.groupby("exppath", sort=False).indices.items():
+        if files is not None:
+            experiment, generation = files.get(exppath)
+        else:
+            experiment, generation = experiments[exppath], None
+        grp = frame.iloc[positions]
+        names = [f"epoch{number}" for number in grp.number.values]
+
+        # PROTOCOL AND TRACE TYPE USUALLY IN PARAMS TABLE, OTHERWISE READ FROM FILE
+        if "protocolname" in grp.columns:
+            protocolnames = grp.protocolname.values
+        else:
+            protocolnames = [experiment[name].attrs.get("protocolname") for name in names]
+        if "tracetype" in grp.columns:
+            tracetypes = grp.tracetype.values
+        else:
+            tracetypes = [experiment[name].attrs.get("tracetype") for name in names]
+
+        for ii, name, protocolname, tracetype in zip(positions, names, protocolnames, tracetypes):
+            try:
+                if lazy:
+                    epochclass = epoch_class(protocolname, tracetype)
+                    if epochclass is not None:
+                        epochs[ii] = LazyEpoch(
+                            experiment, name, epochclass, files, exppath, generation)
+                else:
+                    epochs[ii] = epoch_factory(experiment[name])
+            except Exception:
+                print(exppath)
+    return pd.Series(epochs, index=frame.index, dtype=object)
+
+
 class DissonanceReader:
 
     def __init__(self, paths: List[Path]):
@@ -53,28 +117,30 @@ class DissonanceReader:
             if "startdate" not in paramnames:
                 paramnames = [*paramnames, "startdate"]
 
-            data = []
-            h5file = h5py.File(str(filepath), "a")
-            experiment = h5file["experiment"]
-            for epochname in experiment:
-                epoch = experiment[epochname]
-
-                if filters is not None:
-                    condition = all(
-                        [epoch.attrs.get(key) == val for key, val in filters.items()])
-                else:
-                    condition = True
-                if condition:
-                    number = epochname[5:]
-
-                    params = {key: epoch.attrs.get(key) for key in paramnames}
-                    params["number"] = number
-                    params["tracetype"] = epoch.attrs["tracetype"]
-                    data.append(params)
-
-            if len(data) > 0:
-                df = pd.DataFrame.from_dict(data)
-                df["startdate"] = pd.to_datetime(df["startdate"])
+            # READ FROM SIDECAR INDEX - ONLY WALK EPOCH GROUPS IF ATTRIBUTES AREN'T INDEXED
+            index = ParamsIndex(filepath)
+            frame = index.load()
+            keys = [*paramnames, *(filters.keys() if filters is not None else [])]
+            if any(key in index.unindexed for key in keys):
+                with h5py.File(str(filepath), "r") as f:
+                    frame = index.build(f["experiment"])
+
+            if filters is not None:
+                condition = np.ones(frame.shape[0], dtype=bool)
+                for key, val in filters.items():
+                    if key in frame:
+                        condition &= frame[key].apply(lambda x: bool(np.all(x == val))).values
+                    else:
+                        condition &= (None == val)
+                frame = frame.loc[condition]
+
+            if frame.shape[0] > 0:
+                df = pd.DataFrame(index=frame.index)
+                for key in [*paramnames, "number", "tracetype"]:
+                    df[key] = frame[key] if key in frame else None
+                df = df.reset_index(drop=True).infer_objects()
+                # STARTDATES ON A WHOLE SECOND HAVE NO MICROSECONDS
+                df["startdate"] = parse_startdates(df["startdate"])
                 df["exppath"] = filepath
                 print(f"{filepath}: {df.shape[0]}")
                 return df
@@ -148,6 +214,9 @@ class DissonanceUpdater:
             epoch = f[f"experiment/{epochgrp}"]
             epoch.attrs["cellname"] = f'{prefix}_{epoch.attrs["cellname"].split("_")[-1]}'
 
+        f.close()
+        self.reindex()
+
     def undo_update_cell_labels(self):
         f = h5py.File(self.filepath, "r+")
 
@@ -157,6 +226,7 @@ class DissonanceUpdater:
             epoch.attrs["cellname"] = cellname.split("_")[0]
 
         f.close()
+        self.reindex()
 
     def add_attribute(self, paramname: str, paramval: object, filters: Dict) -> None:
         """Adding attribute to epochs in h5 file
@@ -175,6 +245,7 @@ class DissonanceUpdater:
                 epoch.attrs[paramname] = paramval
 
         f.close()
+        self.reindex()
 
     def add_genotype(self, genotype):
         f = h5py.File(self.filepath, "r+")
@@ -186,19 +257,55 @@ class DissonanceUpdater:
             epoch.attrs["genotype"] = genotype
 
         f.close()
+        self.reindex()
+
+    def derive(self, restart: bool = False) -> int:
+        """Store each epoch's derived metrics (peak amplitude, PSTH, ...) in its derived group
+
+        Args:
+                restart (bool): Recompute epochs whose stored metrics are still valid
+
+        Returns:
+                int: Number of epochs written
+        """
+        f = h5py.File(self.filepath, "r+")
+
+        written = 0
+        for name in f["experiment"]:
+            epochgrp = f[f"experiment/{name}"]
+            try:
+                epoch = epoch_factory(epochgrp)
+                if epoch is None or not epoch.DERIVED:
+                    continue
+                if not restart and all(key in epoch.derived for key in epoch.DERIVED):
+                    continue
+                write_derived(epochgrp, epoch.derived_inputs, epoch.compute_derived())
+                written += 1
+            except Exception as e:
+                logger.error(f"Couldn't derive metrics for {self.filepath}:{name}")
+                logger.error(e)
+
+        f.close()
+        self.reindex()
+        return written
+
+    def reindex(self) -> None:
+        """Rewrite params index so it matches the updated file"""
+        ParamsIndex(self.filepath).write()
 
 
 class EpochIO:
+    """Params table of every epoch, queried by node path.
 
-    def __init__(self, params: pd.DataFrame, experimentpaths: List[Path], unchecked: set = None):
-        self.files = dict()
-        try:
-            for path in experimentpaths:
-                self.files[path] = h5py.File(str(path), "a")["experiment"]
-        except BlockingIOError as e:
-            logger.error(f"Can't open {path}")
-            logger.error(e)
-            raise e
+    The frame, its include flags and the filter indexes are guarded by lock, so
+    a worker thread can query while the GUI thread toggles flags or edits
+    parameters. Hold lock to read several of them as one snapshot.
+    """
+
+    def __init__(self, params: pd.DataFrame, experimentpaths: List[Path], unchecked: set = None, maxopen: int = DEFAULT_MAXOPEN):
+        self.lock = threading.RLock()
+        # OPENED READ ONLY WHEN FIRST QUERIED, WRITABLE ONLY DURING update
+        self.files = FilePool(experimentpaths, maxopen)
 
         # GROUP EPOCHS INTO FLAT LIST
         self.unchecked = set() if unchecked is None else unchecked
@@ -210,98 +317,196 @@ class EpochIO:
     def set_frame(self, params: pd.DataFrame):
         params["include"] = True
         params.loc[params.startdate.isin(self.unchecked), "include"] = False
-        self.frame = params
+        with self.lock:
+            self.frame = params
+            # BUMPED WHENEVER PARAMETERS CHANGE, INCLUDE FLAGS ASIDE
+            self.version = getattr(self, "version", -1) + 1
+            # FILTER KEYS -> {VALUES: ROW POSITIONS}, BUILT ON FIRST QUERY
+            self._indexes: Dict[Tuple[str, ...], Dict[Tuple, List[int]]] = dict()
+            # ROW POSITIONS SORTED BY STARTDATE, BUILT ON FIRST LOOKUP
+            self._startdateorder: np.ndarray = None
+            self._startdatesorted: np.ndarray = None
 
     def update(self, filters: List[Dict], paramname: str, value: Any):
         # FILTER DATATABLE TO APPLICABLE EPOCHS
-        eframe = self.query(filters=filters)
-
-        for _, row in eframe.iterrows():
-            # UPDATE H5 GROUP ATTRIBUTES
-            row["epoch"].update(paramname, value)
-            # updatedfiles.add(row["epoch"].)
-            # UPDATE EPOCHIO DATATABLE PARAMETERS
-            if paramname in self.frame.columns:
-                self.frame.loc[self.frame.startdate ==
-                               row["startdate"], paramname] = value
+        with self.lock:
+            positions = self._positions(filters, useincludeflag=True)
+            eframe = self.frame.iloc[positions]
+
+        # UPDATE H5 GROUP ATTRIBUTES, ONE FILE OPEN FOR WRITING AT A TIME
+        for path, fileframe in eframe.groupby("exppath", sort=False):
+            with self.files.writable(path) as experiment:
+                for epoch in frame_to_epochs(fileframe, {path: experiment}, lazy=False):
+                    if epoch is not None:
+                        epoch.update(paramname, value)
+
+        # UPDATE EPOCHIO DATATABLE PARAMETERS
+        with self.lock:
+            self._update_frame(positions, paramname, value)
+
+    def _update_frame(self, positions: List[int], paramname: str, value: Any):
+        self.version += 1
+        if paramname in self.frame.columns and len(positions) > 0:
+            indexes = [
+                (keys, index) for keys, index in self._indexes.items()
+                if paramname in keys]
+
+            # TAKE ROWS OUT OF THEIR OLD BUCKETS
+            for keys, index in indexes:
+                for pos, key in zip(positions, self._index_keys(keys, positions)):
+                    bucket = index[key]
+                    bucket.remove(pos)
+                    if len(bucket) == 0:
+                        del index[key]
+
+            self.frame.iloc[positions, self.frame.columns.get_loc(paramname)] = value
+            if paramname == "startdate":
+                self._startdateorder = None
+
+            # AND INTO THEIR NEW ONES
+            for keys, index in indexes:
+                for pos, key in zip(positions, self._index_keys(keys, positions)):
+                    insort(index.setdefault(key, []), pos)
+
+    def close(self):
+        self.files.close()
+
+    def startdate_positions(self, startdates) -> np.ndarray:
+        """Row positions in frame of startdates. Unknown startdates are skipped."""
+        values = parse_startdates(startdates)
+        values = values[~np.isnat(values)]
+
+        with self.lock:
+            if self._startdateorder is None:
+                dates = self.frame["startdate"].values.astype("datetime64[ns]")
+                self._startdateorder = np.argsort(dates, kind="stable")
+                self._startdatesorted = dates[self._startdateorder]
+            order, dates = self._startdateorder, self._startdatesorted
+
+        lo = np.searchsorted(dates, values, side="left")
+        hi = np.searchsorted(dates, values, side="right")
+
+        # EXPAND [lo, hi) RANGES - A STARTDATE CAN BE IN MORE THAN ONE FILE
+        counts = hi - lo
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return order[np.repeat(lo, counts) + offsets]
+
+    def is_included(self, startdates) -> np.ndarray:
+        """Include flag for each of startdates"""
+        with self.lock:
+            return self.frame["include"].values[self.startdate_positions(startdates)]
+
+    def set_include(self, startdates=None, include: bool = True, filters: List[Dict] = None) -> np.ndarray:
+        """Check or uncheck epochs in a single update of the include column
 
-        updatedfiles = eframe.exppath.unique()
+        Args:
+                startdates (Iterable): Startdates of epochs to update
+                include (bool): New include flag
+                filters (List[Dict]): Node paths. Every epoch below each path is updated.
 
-        # FLUSH CHANGES MADE TO ANY H5 FILES
-        for path, experimentgrp in self.files.items():
-            if path in updatedfiles:
-                experimentgrp.file.flush()
+        Returns:
+                np.ndarray: Row positions in frame that were updated
+        """
+        with self.lock:
+            positions = []
+            if startdates is not None:
+                positions.append(self.startdate_positions(startdates))
+            if filters is not None:
+                positions.append(np.array(self._positions(filters, useincludeflag=False), dtype=int))
+            positions = np.unique(np.concatenate(positions)) if positions else np.array([], dtype=int)
+
+            self.frame.iloc[positions, self.frame.columns.get_loc("include")] = include
+        return positions
+
+    def positions(self, filters: List[Dict], useincludeflag=True) -> np.ndarray:
+        """Row positions in frame query would return for filters"""
+        with self.lock:
+            return np.array(self._positions(filters, useincludeflag), dtype=int)
 
-    def query(self, filters=List[Dict], useincludeflag=True) -> pd.DataFrame:
+    @staticmethod
+    def _normalize(value) -> Any:
+        """Hashable form of a frame or filter value. Missing values are None."""
+        if value is None or value is pd.NaT:
+            return None
+        if isinstance(value, float) and np.isnan(value):
+            return None
+        if isinstance(value, np.datetime64):
+            return pd.Timestamp(value)
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    def _index_keys(self, keys: Tuple[str, ...], positions=None) -> List[Tuple]:
+        """Normalized values of keys for each row (or only rows at positions)"""
+        columns = []
+        for key in keys:
+            column = self.frame[key]
+            if positions is not None:
+                column = column.iloc[positions]
+            columns.append([self._normalize(val) for val in column.tolist()])
+        return list(zip(*columns))
+
+    def _index(self, keys: Tuple[str, ...]) -> Dict[Tuple, List[int]]:
+        """Positions of rows in frame for each combination of values of keys. Call holding lock."""
+        if keys not in self._indexes:
+            index = dict()
+            for pos, key in enumerate(self._index_keys(keys)):
+                index.setdefault(key, []).append(pos)
+            self._indexes[keys] = index
+        return self._indexes[keys]
+
+    def _positions(self, filters, useincludeflag=True) -> List[int]:
+        """Row positions in frame matching any filter, in filter order without duplicates. Call holding lock."""
+        if filters is None:
+            positions = np.arange(self.frame.shape[0])
+            if useincludeflag:
+                positions = positions[self.frame["include"].values]
+            return positions.tolist()
+
+        if not isinstance(filters, list):
+            filters = [filters]
+
+        include = self.frame["include"].values
+        positions = dict()
+        for filter in filters:
+            filter = {key: val for key, val in filter.items() if key != "Name"}
+            keys = tuple(filter.keys())
+            values = []
+            for key, val in filter.items():
+                # FILTER VALUES FOR DATE COLUMNS CAN BE STRINGS
+                if val is not None and pd.api.types.is_datetime64_any_dtype(self.frame[key]):
+                    val = pd.Timestamp(val)
+                values.append(self._normalize(val))
+
+            matched = self._index(keys).get(tuple(values), [])
+
+            # FILTER FOR CHECKED VALUES. SINGLE EPOCHS ARE ALWAYS RETURNED
+            if useincludeflag and keys != ("startdate",):
+                matched = [pos for pos in matched if include[pos]]
+            positions.update(dict.fromkeys(matched))
+        return list(positions)
+
+    def to_epochs(self, frame: pd.DataFrame, lazy=True) -> pd.Series:
+        """Epoch for each row in frame. See frame_to_epochs."""
+        return frame_to_epochs(frame, self.files, lazy)
+
+    def query(self, filters=List[Dict], useincludeflag=True, lazy=True) -> pd.DataFrame:
         """Relate nodes from tree to underlying dataframe. Only passes inclued nodes
 
         Args:
                 node (Node): Node's path used for lookup
+                lazy (bool): Epochs only read from h5 file when first used
 
         Returns:
                 Union[Traces, ITrace]: Traces or individual Trace for leaf node
         """
-        if filters is None:
-            if useincludeflag:
-                dfs = [self.frame.loc[self.frame["include"]]]
-            else:
-                dfs = [self.frame]
-        else:
-            if not isinstance(filters, list):
-                filters = [filters]
-
-            dfs = []
-            for filter in filters:
-                if "Name" in filter.keys():
-                    del filter["Name"]
-                if len(filter) == 1 and list(filter.keys())[0] == "startdate":
-                    dfs.append(self.frame.query(
-                        f"startdate == '{filter['startdate']}'"))
-                else:
-                    # DICTIONARY OF ALL VALUES
-                    # BUILD FILTER CONDITION
-                    # FILTERED ON INDEX SO ONLY NEED VALUES IN LABEL ORDER
-                    condition = []
-                    for key, value in filter.items():
-                        if value is None:
-                            condition.append(
-                                self.frame[key].apply(lambda x: x is None)
-                            )
-                        else:
-                            condition.append(
-                                self.frame[key] == value
-                            )
-                    dff = self.frame.loc[reduce(operator.and_, condition), :]
-
-                    # FILTER FOR CHECKED VALUES
-                    if useincludeflag:
-                        df = dff.loc[dff.include == True]
-                        dfs.append(df)
-                    else:
-                        dfs.append(dff)
+        with self.lock:
+            positions = self._positions(filters, useincludeflag)
+            df = self.frame.iloc[positions].reset_index(drop=True)
 
         # CONVERT TO EPOCHS IN DATAFRAME
-        if len(dfs) == 0:
-            #raise Exception("No epochs returns")
-            print("No epochs returns")
-        else:
-            df = (pd.concat(dfs))
-            df = df.reset_index(drop=True)
-            df = df.drop_duplicates(keep="first")
-            # HACK why are there NAs here?
-            df = df[~df.isna()]
-
         if df.shape[0] != 0:
-            def func(row):
-                try:
-                    return epoch_factory(self.files[row.exppath][f"epoch{row.number}"])
-                except Exception:
-                    print(row.exppath)
-                    return None
-
-            df["epoch"] = df.apply(lambda x:
-                                   func(x),
-                                   axis=1)
+            df["epoch"] = self.to_epochs(df, lazy=lazy)
             df = df[~df["epoch"].isnull()]
         else:
             #raise Exception("No epochs returns")
@@ -0,0 +1,148 @@
+import itertools
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import h5py
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAXOPEN = 64
+
+
+class FilePool:
+    """Experiment groups of mapped h5 files, opened read only on demand.
+
+    Read only handles only take a shared lock, so several viewers or batch jobs
+    can read the same datastore. At most maxopen files are kept open; the least
+    recently used is closed past that. Writes go through writable, which holds a
+    write handle to a single file only while updating it.
+
+    Objects read through a closed handle are invalid. Each handle has a generation,
+    so LazyEpochs can tell their file was closed and reopen it. Threads reading
+    through groups they hold wrap the reads in reading, which keeps the files open.
+
+    Args:
+            paths (List[Path]): Files of the pool
+            maxopen (int): Open handles kept
+    """
+
+    def __init__(self, paths: List[Path], maxopen: int = DEFAULT_MAXOPEN):
+        self.paths = list(paths)
+        self.maxopen = maxopen
+        self._open: OrderedDict = OrderedDict()
+        # GENERATION OF EACH OPEN HANDLE AND NUMBER OF ACTIVE READERS OF EACH FILE
+        self._generations: Dict[Path, int] = dict()
+        self._readers: Dict[Path, int] = dict()
+        self._opened = itertools.count()
+        # QUERIED FROM THE GUI AND WORKER THREADS
+        self._lock = threading.RLock()
+        self._released = threading.Condition(self._lock)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __iter__(self) -> Iterator[Path]:
+        return iter(self.paths)
+
+    def __contains__(self, path: Path) -> bool:
+        return path in self.paths
+
+    def __getitem__(self, path: Path) -> h5py.Group:
+        """Experiment group of path, opening the file if needed"""
+        return self.get(path)[0]
+
+    def get(self, path: Path) -> Tuple[h5py.Group, int]:
+        """Experiment group of path and the generation of the handle it belongs to"""
+        with self._lock:
+            f = self._open.get(path)
+            if f is None or not f:
+                f = self._open_file(path, "r")
+                self._open[path] = f
+                self._generations[path] = next(self._opened)
+            self._open.move_to_end(path)
+            self._evict()
+            return f["experiment"], self._generations[path]
+
+    def generation(self, path: Path) -> Optional[int]:
+        """Generation of path's open handle, new each time the file is opened. None if closed."""
+        return self._generations.get(path)
+
+    @property
+    def nopen(self) -> int:
+        return len(self._open)
+
+    def is_open(self, path: Path) -> bool:
+        return path in self._open
+
+    @contextmanager
+    def reading(self, paths: Iterable[Path]) -> Iterator[None]:
+        """Keep paths open while reading through their groups.
+
+        Files being read aren't evicted, even past maxopen, and close and
+        writable wait until their readers are done. Don't close or write a file
+        from inside its own reading block.
+        """
+        paths = list(dict.fromkeys(paths))
+        with self._lock:
+            for path in paths:
+                self._readers[path] = self._readers.get(path, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                for path in paths:
+                    self._readers[path] -= 1
+                    if self._readers[path] == 0:
+                        del self._readers[path]
+                self._evict()
+                self._released.notify_all()
+
+    def close(self, path: Path = None) -> None:
+        """Close path, or every open file if None, once nothing is reading them"""
+        with self._lock:
+            paths = list(self._open) if path is None else [path]
+            for path in paths:
+                self._close(path)
+
+    @contextmanager
+    def writable(self, path: Path) -> Iterator[h5py.Group]:
+        """Experiment group of path opened for writing, closed on exit.
+
+        Closes the pool's read handle first, once nothing is reading through it: a
+        file can't be open for reading and writing at once. Fails while other
+        processes are reading the file.
+        """
+        with self._lock:
+            self._close(path)
+            f = self._open_file(path, "r+")
+            try:
+                yield f["experiment"]
+            finally:
+                f.close()
+
+    def _close(self, path: Path) -> None:
+        self._released.wait_for(lambda: path not in self._readers)
+        f = self._open.pop(path, None)
+        self._generations.pop(path, None)
+        if f is not None:
+            f.close()
+
+    def _evict(self) -> None:
+        # LEAST RECENTLY USED FIRST, SKIPPING FILES BEING READ
+        for path in [path for path in self._open if path not in self._readers]:
+            if len(self._open) <= self.maxopen:
+                break
+            self._close(path)
+
+    @staticmethod
+    def _open_file(path: Path, mode: str) -> h5py.File:
+        try:
+            return h5py.File(str(path), mode)
+        except BlockingIOError as e:
+            logger.error(f"Can't open {path}, locked by another process")
+            logger.error(e)
+            raise e
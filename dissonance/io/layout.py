@@ -0,0 +1,136 @@
+"""How response and spike datasets are stored in mapped h5 files.
+
+Traces are written in chunks of at most ``chunksamples`` samples, optionally
+compressed (gzip or lzf, with the byte shuffle filter) and optionally as
+float32. Spikes are sample indices and stored as integers. Readers don't need
+to know the layout: h5py decompresses and converts to the requested dtype on
+read, so files of any layout can be mixed in one datastore.
+
+``migrate`` rewrites an existing mapped file to another layout.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+import h5py
+import numpy as np
+
+from .paramsindex import ParamsIndex
+
+SPIKES = "Spikes"
+MIGRATING_SUFFIX = ".migrating"
+
+
+@dataclass(frozen=True)
+class StorageLayout:
+    """
+    Args:
+            chunksamples (int): Samples per chunk. Contiguous datasets if None (not compressible).
+            compression (str): None, "gzip" or "lzf". lzf is faster but only readable through h5py.
+            level (int): gzip compression level 0-9
+            shuffle (bool): Byte shuffle before compressing, usually compresses floats much better
+            tracedtype (str): dtype responses are stored as. float32 halves the size, lossy.
+            spikedtype (str): dtype spike indices are stored as
+    """
+    chunksamples: Optional[int] = 2 ** 15
+    compression: Optional[str] = None
+    level: Optional[int] = None
+    shuffle: bool = False
+    tracedtype: str = "float64"
+    spikedtype: str = "int32"
+
+    def dataset_kwargs(self, n: int, dtype: str) -> Dict:
+        """create_dataset keyword arguments for a 1-D dataset of n values"""
+        kwargs = dict(dtype=dtype)
+        # EMPTY DATASETS CAN'T BE CHUNKED
+        if self.chunksamples is None or n == 0:
+            return kwargs
+
+        # EQUAL CHUNKS, SO THE LAST ISN'T MOSTLY PADDING
+        nchunks = -(-n // self.chunksamples)
+        kwargs["chunks"] = (-(-n // nchunks),)
+        if self.compression is not None:
+            kwargs["compression"] = self.compression
+            if self.compression == "gzip" and self.level is not None:
+                kwargs["compression_opts"] = self.level
+            kwargs["shuffle"] = self.shuffle
+        return kwargs
+
+    def write_response(self, epochgrp: h5py.Group, name: str, values: np.ndarray) -> h5py.Dataset:
+        values = np.asarray(values)
+        return epochgrp.create_dataset(
+            name=name, data=values, **self.dataset_kwargs(len(values), self.tracedtype))
+
+    def write_spikes(self, epochgrp: h5py.Group, spikes: np.ndarray) -> h5py.Dataset:
+        # INDICES MAY COME IN AS FLOATS FROM OLDER FILES
+        spikes = np.rint(np.asarray(spikes, dtype=float)).astype(self.spikedtype)
+        return epochgrp.create_dataset(
+            name=SPIKES, data=spikes, **self.dataset_kwargs(len(spikes), self.spikedtype))
+
+
+LAYOUTS = dict(
+    # AS FILES WERE WRITTEN BEFORE LAYOUTS EXISTED
+    contiguous=StorageLayout(chunksamples=None, spikedtype="float64"),
+    chunked=StorageLayout(),
+    lzf=StorageLayout(compression="lzf", shuffle=True),
+    gzip=StorageLayout(compression="gzip", level=4, shuffle=True),
+    float32=StorageLayout(compression="gzip", level=4, shuffle=True, tracedtype="float32"),
+)
+# LOSSLESS AND READABLE OUTSIDE OF H5PY (E.G. MATLAB)
+DEFAULT_LAYOUT = LAYOUTS["gzip"]
+
+
+def copy_epoch(epochgrp: h5py.Group, outgrp: h5py.Group, layout: StorageLayout) -> None:
+    """Copy epochgrp into outgrp, rewriting its responses and spikes with layout"""
+    outgrp.attrs.update(epochgrp.attrs)
+    for name, obj in epochgrp.items():
+        if isinstance(obj, h5py.Dataset):
+            values = obj[()]
+            if name == SPIKES:
+                ds = layout.write_spikes(outgrp, values)
+            else:
+                ds = layout.write_response(outgrp, name, values)
+            ds.attrs.update(obj.attrs)
+        else:
+            # STIMULI AND DERIVED GROUPS ARE COPIED AS IS
+            epochgrp.copy(obj, outgrp, name=name)
+
+
+def migrate(filepath: Path, layout: StorageLayout = DEFAULT_LAYOUT, outputpath: Path = None) -> int:
+    """Rewrite a mapped file's responses and spikes with layout
+
+    The file is written next to outputpath first and only replaces it once
+    complete, so an interrupted migration leaves the original intact.
+
+    Args:
+            filepath (Path): Mapped file
+            layout (StorageLayout): Layout to rewrite with
+            outputpath (Path): Where to write. Replaces filepath if None.
+
+    Returns:
+            int: Number of epochs rewritten
+    """
+    filepath = Path(filepath)
+    outputpath = filepath if outputpath is None else Path(outputpath)
+    tmppath = outputpath.with_name(outputpath.name + MIGRATING_SUFFIX)
+
+    try:
+        with h5py.File(filepath, "r") as fin, h5py.File(tmppath, "w") as fout:
+            fout.attrs.update(fin.attrs)
+            for name, obj in fin.items():
+                if name != "experiment":
+                    fin.copy(obj, fout, name=name)
+
+            experiment = fin["experiment"]
+            outexperiment = fout.create_group("experiment")
+            outexperiment.attrs.update(experiment.attrs)
+            for name, epochgrp in experiment.items():
+                copy_epoch(epochgrp, outexperiment.create_group(name), layout)
+            nepochs = len(experiment)
+    except Exception:
+        tmppath.unlink(missing_ok=True)
+        raise
+
+    tmppath.replace(outputpath)
+    ParamsIndex(outputpath).write()
+    return nepochs
@@ -0,0 +1,185 @@
+"""Columnar sidecar index of epoch parameters for mapped h5 files.
+
+Each mapped file ``2022-09-19B.h5`` gets a ``2022-09-19B.paramsidx`` file next to it
+holding one dataset per epoch attribute. Reading the params table then costs a
+handful of dataset reads instead of walking every ``experiment/epochN`` group.
+"""
+import io
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import h5py
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".paramsidx"
+INDEX_VERSION = 1
+
+STR = h5py.string_dtype()
+
+
+class ParamsIndex:
+    """Sidecar index of every scalar epoch attribute in a mapped h5 file.
+
+    The index records the mtime and size of the file it was built from and is
+    considered stale as soon as either changes.
+    """
+
+    def __init__(self, filepath: Path):
+        self.filepath = Path(filepath)
+        self.path = self.filepath.with_suffix(INDEX_SUFFIX)
+        # ATTRIBUTES THAT COULDN'T BE STORED AS A SINGLE TYPED COLUMN
+        self.unindexed: List[str] = []
+
+    def __str__(self):
+        return f"ParamsIndex({self.filepath.name})"
+
+    @property
+    def signature(self) -> Dict[str, int]:
+        stat = self.filepath.stat()
+        return dict(source_mtime=stat.st_mtime_ns, source_size=stat.st_size)
+
+    @property
+    def is_stale(self) -> bool:
+        if not self.path.exists():
+            return True
+        try:
+            with h5py.File(self.path, "r") as f:
+                if f.attrs.get("version") != INDEX_VERSION:
+                    return True
+                return any(
+                    f.attrs.get(key) != val
+                    for key, val in self.signature.items())
+        except OSError:
+            return True
+
+    @staticmethod
+    def build(experiment: h5py.Group) -> pd.DataFrame:
+        """Walk every epoch group and collect its attributes. Missing attributes are None."""
+        names = list(experiment)
+        columns = {"number": [name[5:] for name in names]}
+        for ii, name in enumerate(names):
+            for key, val in experiment[name].attrs.items():
+                if key not in columns:
+                    columns[key] = [None] * len(names)
+                columns[key][ii] = val
+
+        return pd.DataFrame({
+            key: pd.Series(values, dtype=object)
+            for key, values in columns.items()})
+
+    def write(self, frame: pd.DataFrame = None) -> None:
+        """Write index for file. Builds the frame from the file if not provided."""
+        if frame is None:
+            frame = self._build_file()
+
+        # UNIQUE TEMPORARY FILE SO CONCURRENT WRITERS DON'T SHARE ONE
+        fd, tmpname = tempfile.mkstemp(
+            prefix=self.path.name, suffix=".tmp", dir=self.path.parent)
+        os.close(fd)
+        tmppath = Path(tmpname)
+        try:
+            with h5py.File(tmppath, "w") as f:
+                self._write_to(f, frame)
+                f.attrs.update(self.signature)
+            tmppath.replace(self.path)
+        except BaseException:
+            tmppath.unlink(missing_ok=True)
+            raise
+
+    def read(self) -> Optional[pd.DataFrame]:
+        """Read index. None if missing or out of date with the h5 file."""
+        if self.is_stale:
+            return None
+
+        with h5py.File(self.path, "r") as f:
+            return self._read_from(f)
+
+    def load(self) -> pd.DataFrame:
+        """Read index, rebuilding it first if stale. Indexes in memory if it can't be written."""
+        try:
+            frame = self.read()
+            if frame is None:
+                logger.info(f"Rebuilding {self}")
+                self.write()
+                frame = self.read()
+        except OSError as e:
+            # E.G. READ ONLY DATASTORE
+            logger.warning(f"Couldn't write {self}, indexing in memory: {e}")
+            frame = None
+
+        if frame is None:
+            with h5py.File(io.BytesIO(), "w") as f:
+                self._write_to(f, self._build_file())
+                frame = self._read_from(f)
+        return frame
+
+    def _build_file(self) -> pd.DataFrame:
+        with h5py.File(self.filepath, "r") as f:
+            return self.build(f["experiment"])
+
+    def _write_to(self, f: h5py.File, frame: pd.DataFrame) -> None:
+        self.unindexed = []
+        columns = f.create_group("columns")
+        for name in frame.columns:
+            if not self._write_column(columns, name, frame[name].values):
+                self.unindexed.append(name)
+
+        f.attrs["nrows"] = frame.shape[0]
+        f.attrs["unindexed"] = np.array(self.unindexed, dtype=STR)
+        f.attrs["version"] = INDEX_VERSION
+
+    def _read_from(self, f: h5py.File) -> pd.DataFrame:
+        self.unindexed = [
+            str(name) for name in f.attrs["unindexed"]]
+        data = {
+            name: self._read_column(f, name)
+            for name in f["columns"]}
+        return pd.DataFrame(data, index=pd.RangeIndex(f.attrs["nrows"]))
+
+    @staticmethod
+    def _write_column(columns: h5py.Group, name: str, values: np.ndarray) -> bool:
+        missing = np.array(
+            [val is None or (isinstance(val, float) and np.isnan(val)) for val in values],
+            dtype=bool)
+        present = values[~missing]
+
+        if all(isinstance(val, (str, bytes)) for val in present):
+            dtype = STR
+            fill = ""
+            present = [val.decode() if isinstance(val, bytes) else val for val in present]
+        elif all(isinstance(val, (int, float, np.number, np.bool_)) for val in present):
+            dtype = np.array(list(present)).dtype if len(present) > 0 else float
+            fill = 0
+        else:
+            # ARRAYS OR MIXED TYPES ACROSS EPOCHS
+            return False
+
+        data = np.full(len(values), fill, dtype=object if dtype is STR else dtype)
+        data[~missing] = present
+
+        columns.create_dataset(name, data=data, dtype=dtype)
+        if missing.any():
+            columns.parent.require_group("missing").create_dataset(name, data=missing)
+        return True
+
+    @staticmethod
+    def _read_column(f: h5py.File, name: str) -> np.ndarray:
+        ds = f[f"columns/{name}"]
+        missing = f[f"missing/{name}"][...] if f"missing/{name}" in f else None
+
+        if ds.dtype.kind == "O":
+            values = ds.asstr()[...].astype(object)
+            if missing is not None:
+                values[missing] = None
+        elif missing is not None:
+            values = ds[...].astype(float)
+            values[missing] = np.nan
+        else:
+            values = ds[...]
+        return values
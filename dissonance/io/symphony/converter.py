@@ -0,0 +1,181 @@
+"""Convert symphony files to dissonance files, detecting spikes in a process pool.
+
+The main process owns both h5 files. It reads responses a chunk of epochs at a time,
+hands spike traces to the pool and writes the previous chunk while the workers run.
+Each epoch is written under a temporary name and only renamed once complete. Complete
+epochs record the fingerprint of their source epoch, so rerunning a conversion (after an
+interruption or after adding a cell to the experiment) only rewrites epochs that changed.
+"""
+import logging
+import multiprocessing as mp
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import h5py
+import numpy as np
+
+from dissonance.analysis_functions import detect_spikes_batch
+from dissonance.io.layout import DEFAULT_LAYOUT, StorageLayout
+from dissonance.io.paramsindex import ParamsIndex
+from dissonance.io.symphony.symphonyio import SymphonyIO
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_SUFFIX = ".partial"
+
+
+class SymphonyConverter:
+
+    def __init__(self, path: Path, nprocesses: int = None, chunksize: int = 32,
+                 progress: Callable[[int, int], None] = None, layout: StorageLayout = DEFAULT_LAYOUT):
+        """
+        Args:
+                path (Path): Symphony file to convert
+                nprocesses (int): Spike detection workers. Detects in this process if 1.
+                chunksize (int): Epochs read ahead of the writer
+                progress (Callable): Called with (epochs written, epochs to write) after each chunk
+                layout (StorageLayout): How responses and spikes are stored
+        """
+        self.finpath = path
+        self.symphonyio: SymphonyIO = None
+        self.nprocesses = mp.cpu_count() if nprocesses is None else nprocesses
+        self.chunksize = chunksize
+        self.progress = self.log_progress if progress is None else progress
+        self.layout = layout
+
+    def log_progress(self, done: int, total: int) -> None:
+        logger.info(f"{self.finpath.name}: {done} / {total} epochs")
+
+    def convert(self, outputpath: Path, protocolname: str = None, incremental: bool = True) -> int:
+        """Write symphony file to dissonance file
+
+        Args:
+                outputpath (Path): Dissonance file
+                protocolname (str): Only convert epochs of this protocol
+                incremental (bool): Skip epochs in outputpath whose fingerprint hasn't changed.
+                        Otherwise every epoch is rewritten.
+
+        Returns:
+                int: Number of epochs written
+        """
+        outputpath.parent.mkdir(parents=True, exist_ok=True)
+        mode = "a" if (incremental or protocolname is not None) else "w"
+
+        self.symphonyio = SymphonyIO(self.finpath, layout=self.layout)
+        pool = mp.Pool(processes=self.nprocesses) if self.nprocesses > 1 else None
+        try:
+            with h5py.File(outputpath, mode=mode) as fout:
+                expgrp = fout.require_group("experiment")
+
+                # REMOVE EPOCHS LEFT HALF WRITTEN BY AN INTERRUPTED CONVERSION
+                for name in list(expgrp):
+                    if name.endswith(PARTIAL_SUFFIX):
+                        del expgrp[name]
+
+                epochs = self.pending(expgrp, protocolname, incremental)
+                total, done = len(epochs), 0
+                self.progress(done, total)
+
+                # READ AND DETECT NEXT CHUNK WHILE WRITING CURRENT
+                current = None
+                for start in range(0, total, self.chunksize):
+                    chunk = self._read(epochs[start:start + self.chunksize], pool)
+                    if current is not None:
+                        done += self._write(expgrp, *current)
+                        self.progress(done, total)
+                    current = chunk
+
+                if current is not None:
+                    done += self._write(expgrp, *current)
+                    self.progress(done, total)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            self.symphonyio.close()
+
+        ParamsIndex(outputpath).write()
+        return done
+
+    def pending(self, expgrp: h5py.Group, protocolname: str = None, incremental: bool = True) -> List[Tuple]:
+        """Epochs that need to be (re)written as (cell, protocol, epoch, group name)
+
+        Removes out of date epochs from expgrp, including those no longer in the
+        symphony file when converting every protocol.
+        """
+        epochs, names = [], set()
+        for cell, protocol, epoch in self.symphonyio.reader():
+            if protocolname is not None and protocol.name != protocolname:
+                continue
+
+            name = self.symphonyio.group_name(epoch)
+            names.add(name)
+            if name in expgrp:
+                if incremental and self.symphonyio.is_current(cell, protocol, epoch, expgrp[name]):
+                    continue
+                del expgrp[name]
+            epochs.append((cell, protocol, epoch, name))
+
+        if protocolname is None:
+            for name in set(expgrp) - names:
+                logger.info(f"{self.finpath.name}: removing {name}, no longer in symphony file")
+                del expgrp[name]
+        return epochs
+
+    def _read(self, epochs: List[Tuple], pool: mp.Pool):
+        responses = [
+            self.symphonyio._read_responses(epoch)
+            for _, _, epoch, _ in epochs]
+
+        # ONLY SPIKE TRACES ARE SENT TO WORKERS, BATCHED BY TRACE LENGTH
+        traces = {
+            ii: self.symphonyio._spike_trace(epoch, response)
+            for ii, ((_, _, epoch, _), response) in enumerate(zip(epochs, responses))}
+        bylength = dict()
+        for ii, trace in traces.items():
+            if trace is not None:
+                bylength.setdefault(len(trace), []).append(ii)
+
+        spikeidxs, batches = [], []
+        for idxs in bylength.values():
+            size = -(-len(idxs) // max(self.nprocesses, 1))
+            for start in range(0, len(idxs), size):
+                spikeidxs.append(idxs[start:start + size])
+                batches.append(np.vstack([traces[ii] for ii in spikeidxs[-1]]))
+
+        if pool is None:
+            spikes = [detect_spikes_batch(batch) for batch in batches]
+        else:
+            spikes = pool.map_async(detect_spikes_batch, batches, chunksize=1)
+        return epochs, responses, spikeidxs, spikes
+
+    def _write(self, expgrp: h5py.Group, epochs, responses, spikeidxs, spikes) -> int:
+        if not isinstance(spikes, list):
+            spikes = spikes.get()
+        spikes = {
+            ii: result
+            for idxs, results in zip(spikeidxs, spikes)
+            for ii, result in zip(idxs, results)}
+
+        for ii, (cell, protocol, epoch, name) in enumerate(epochs):
+            tmpname = name + PARTIAL_SUFFIX
+            epochgrp = expgrp.create_group(tmpname)
+
+            # ADD EPOCH ATTRIBUTES
+            self.symphonyio._update_attrs(protocol, cell, epoch, epochgrp)
+
+            # ADD RESPONSE DATA - CACHE SPIKES
+            self.symphonyio._write_responses(responses[ii], epochgrp)
+            if ii in spikes:
+                self.symphonyio._write_spikes(*spikes[ii], epochgrp)
+
+            # ADD GROUP FOR EACH STIMULUS
+            self.symphonyio._update_stimuli(epoch, epochgrp)
+
+            # FROM THE VALUES ALREADY READ, RESPONSES AREN'T READ AGAIN
+            self.symphonyio._write_fingerprints(
+                cell, protocol, epoch, epochgrp, [values for _, values in responses[ii]])
+            expgrp.move(tmpname, name)
+
+        expgrp.file.flush()
+        return len(epochs)
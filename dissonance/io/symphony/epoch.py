@@ -3,10 +3,14 @@ from dissonance.io.symphony.response import Response
 from dissonance.io.symphony.stimulus import Stimulus
 
 import h5py
+import numpy as np
 
 
 import datetime
+import hashlib
 import re
+import zlib
+from typing import Iterable
 
 
 class Epoch:
@@ -82,3 +86,57 @@ class Epoch:
 
     def protocol_parameters(self, key):
         return self.group["protocolParameters"].attrs.get(key, "None")
+
+    @property
+    def metadata_fingerprint(self) -> str:
+        """Hash of everything read from the epoch's groups when mapping it, except response values.
+
+        Covers start and end ticks, response shapes and attributes, backgrounds,
+        stimuli and the epoch and protocol parameters. No response data is read.
+        """
+        h = hashlib.sha1()
+        for key in ("startTimeDotNetDateTimeOffsetTicks", "endTimeDotNetDateTimeOffsetTicks"):
+            h.update(str(self.group.attrs.get(key)).encode())
+
+        for name in self.group["responses"]:
+            data = self.group[f"responses/{name}/data"]
+            h.update(f"{name}{data.shape}{data.dtype}".encode())
+            _hash_attrs(h, self.group[f"responses/{name}"].attrs)
+
+        for path in ("backgrounds", "stimuli"):
+            if path in self.group:
+                self.group[path].visititems(
+                    lambda name, obj: _hash_attrs(h, obj.attrs, name))
+
+        # BLOCK LEVEL PROTOCOL PARAMETERS
+        protocol = self.group.parent.parent
+        h.update(protocol.name.encode())
+        if "protocolParameters" in protocol:
+            _hash_attrs(h, protocol["protocolParameters"].attrs)
+        if "protocolParameters" in self.group:
+            _hash_attrs(h, self.group["protocolParameters"].attrs)
+        return h.hexdigest()
+
+    def fingerprint(self, values: Iterable[np.ndarray] = None) -> str:
+        """metadata_fingerprint plus a checksum of the numeric values of each response.
+
+        Args:
+                values (Iterable[np.ndarray]): Values of self.responses, in order, if
+                        already read. Otherwise only the numeric field of each response is read.
+        """
+        h = hashlib.sha1(self.metadata_fingerprint.encode())
+        if values is None:
+            values = (response.read() for response in self.responses)
+        for vals in values:
+            h.update(zlib.crc32(np.ascontiguousarray(vals)).to_bytes(4, "little"))
+        return h.hexdigest()
+
+
+def _hash_attrs(h, attrs: h5py.AttributeManager, name: str = "") -> None:
+    h.update(name.encode())
+    for key in sorted(attrs.keys()):
+        val = np.asarray(attrs[key])
+        h.update(key.encode())
+        h.update(str(val.dtype).encode())
+        # VARIABLE LENGTH STRINGS COME BACK AS OBJECT ARRAYS
+        h.update(repr(val.tolist()).encode() if val.dtype.kind == "O" else val.tobytes())
@@ -6,6 +6,7 @@ import numpy as np
 
 
 import re
+from functools import cached_property
 from typing import Dict, Iterator
 
 
@@ -30,11 +31,48 @@ class Response:
     def __repr__(self):
         return f"Response({self.name})"
 
+    def __len__(self):
+        return self.group["data"].shape[0]
+
     @property
-    def data(self):
-        vals = np.array(self.group["data"][:], dtype=[
-                        ('v', '<f8'), ('units', '<U16')])
-        return vals['v']
+    def data(self) -> np.ndarray:
+        return self.read()
+
+    @cached_property
+    def fields(self) -> tuple:
+        """Field names of data: numeric value, then units"""
+        return self.group["data"].dtype.names
+
+    @cached_property
+    def units(self) -> str:
+        """Units of the response, read from the first sample only"""
+        if len(self) == 0:
+            return ""
+        return convert_if_bytes(self.group["data"].fields(self.fields[1])[0])
+
+    def read(self, out: np.ndarray = None) -> np.ndarray:
+        """Numeric field of data as float64, read straight from the h5 file.
+
+        Only the value field is transferred, the units of every sample aren't.
+
+        Args:
+                out (np.ndarray): Float buffer at least as long as the response to read
+                        into. Only the first len(response) values are written.
+
+        Returns:
+                np.ndarray: The response long view of out holding the values
+        """
+        ds = self.group["data"]
+        n = len(self)
+        if out is None:
+            out = np.empty(n, dtype=float)
+        vals = out[:n]
+        if n > 0:
+            # SINGLE FIELD MEMORY TYPE, HDF5 CONVERTS TO FLOAT64
+            mtype = h5py.h5t.create(h5py.h5t.COMPOUND, vals.itemsize)
+            mtype.insert(self.fields[0].encode(), 0, h5py.h5t.NATIVE_DOUBLE)
+            ds.id.read(h5py.h5s.ALL, h5py.h5s.ALL, vals, mtype)
+        return vals
 
     @property
     def parameters(self) -> Dict:
@@ -1,27 +1,39 @@
 from dissonance.analysis_functions import detect_spikes
+from dissonance.io.layout import DEFAULT_LAYOUT, StorageLayout
+from dissonance.io.paramsindex import ParamsIndex
 from dissonance.io.symphony import symphonymapping as sm
 from dissonance.io.symphony.cell import Cell
 from dissonance.io.symphony.epoch import Epoch
 from dissonance.io.symphony.experiment import Experiment
 from dissonance.io.symphony.protocol import Protocol
+from dissonance.io.symphony.response import Response
 from dissonance.io.symphony.rstarr_converter import RStarrConverter
 
 
 import h5py
+import numpy as np
 import pandas as pd
 
 
+import hashlib
 import logging
 import re
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# BUMP WHEN MAPPING CHANGES SO EXISTING FILES ARE REWRITTEN
+MAPPING_VERSION = 1
+
 
 class SymphonyIO:
 
-    def __init__(self, path: Path):
+    def __init__(self, path: Path, layout: StorageLayout = DEFAULT_LAYOUT):
         self.finpath = path
+        self.layout = layout
+        # RESPONSE NAME -> READ BUFFER, REUSED ACROSS EPOCHS
+        self._buffers: Dict[str, np.ndarray] = dict()
         self.fin = h5py.File(path)
         self.exp = Experiment(self.fin)
         self.fout = None
@@ -34,6 +46,9 @@ class SymphonyIO:
         self.expdate = f"{matches[1]}-{matches[2]}-{matches[3]}"
         self.rstarr = RStarrConverter(self.expdate)
 
+    def close(self):
+        self.fin.close()
+
     def reader(self):
         for cell in self.exp.children:
             for protocol in cell.children:
@@ -44,7 +59,40 @@ class SymphonyIO:
         for error in self.rstarr.errors:
             logger.warning(error)
 
+    @staticmethod
+    def group_name(epoch: Epoch) -> str:
+        # LABEL EACH EPOCH WITH IT'S TIMESTAMP
+        return f"epoch{epoch.startdate.timestamp()}"
+
+    def _mapping_fingerprint(self, cell: Cell, digest: str) -> str:
+        h = hashlib.sha1(digest.encode())
+        h.update(f"{MAPPING_VERSION}{cell.cellkey}{cell.celltype}{self.genotype}".encode())
+        return h.hexdigest()
+
+    def metadata_fingerprint(self, cell: Cell, protocol: Protocol, epoch: Epoch) -> str:
+        """Fingerprint of source epoch without its response values. Cheap, no data is read."""
+        return self._mapping_fingerprint(cell, epoch.metadata_fingerprint)
+
+    def fingerprint(self, cell: Cell, protocol: Protocol, epoch: Epoch, values: List[np.ndarray] = None) -> str:
+        """Fingerprint of source epoch. Mapped epochs are rewritten when it changes.
+
+        Args:
+                values (List[np.ndarray]): Values of epoch.responses if already read
+        """
+        return self._mapping_fingerprint(cell, epoch.fingerprint(values))
+
+    def is_current(self, cell: Cell, protocol: Protocol, epoch: Epoch, epochgrp: h5py.Group) -> bool:
+        # METADATA FIRST - RESPONSE VALUES ARE ONLY CHECKSUMMED WHERE IT MATCHES
+        if epochgrp.attrs.get("metafingerprint") != self.metadata_fingerprint(cell, protocol, epoch):
+            return False
+        return epochgrp.attrs.get("fingerprint") == self.fingerprint(cell, protocol, epoch)
+
+    def _write_fingerprints(self, cell: Cell, protocol: Protocol, epoch: Epoch, epochgrp: h5py.Group, values: List[np.ndarray] = None):
+        epochgrp.attrs["metafingerprint"] = self.metadata_fingerprint(cell, protocol, epoch)
+        epochgrp.attrs["fingerprint"] = self.fingerprint(cell, protocol, epoch, values)
+
     def map_protocol(self, protocolname, outputpath):
+        """Map epochs of protocol, only rewriting those that changed since the last mapping"""
         try:
             outputpath.parent.mkdir(parents=True, exist_ok=True)
             self.fout = h5py.File(outputpath, mode="a")
@@ -56,21 +104,14 @@ class SymphonyIO:
 
             for ii, (cell, protocol, epoch) in enumerate(self.reader()):
                 if protocol.name == protocolname:
-					# label each epoch with it's timestamp
-                    # delete the epoch if it currently exists
-                    group_name = f"epoch{epoch.startdate.timestamp()}" 
+                    group_name = self.group_name(epoch)
                     if group_name in expgrp:
+                        if self.is_current(cell, protocol, epoch, expgrp[group_name]):
+                            continue
+                        # delete the epoch if it's out of date
                         del expgrp[group_name]
-                    epochgrp = expgrp.create_group(f"epoch{epoch.startdate.timestamp()}" )
-
-                    # ADD EPOCH ATTRIBUTES
-                    self._update_attrs(protocol, cell, epoch, epochgrp)
-
-                    # ADD RESPONSE DATA - CACHE SPIKES
-                    self._update_response(epoch, epochgrp)
 
-                    # ADD GROUP FOR EACH STIMULUS
-                    self._update_stimuli(epoch, epochgrp)
+                    self._write_epoch(cell, protocol, epoch, expgrp.create_group(group_name))
 
         except Exception as e:
             if self.fout is not None:
@@ -79,6 +120,8 @@ class SymphonyIO:
         finally:
             self.fout.close()
 
+        ParamsIndex(outputpath).write()
+
 
     def to_h5(self, outputpath: Path):
         try:
@@ -86,17 +129,8 @@ class SymphonyIO:
             self.fout = h5py.File(outputpath, mode="w")
             expgrp = self.fout.create_group("experiment")
             for ii, (cell, protocol, epoch) in enumerate(self.reader()):
-                group_name = f"epoch{epoch.startdate.timestamp()}" 
-                epochgrp = expgrp.create_group(group_name)
-
-                # ADD EPOCH ATTRIBUTES
-                self._update_attrs(protocol, cell, epoch, epochgrp)
-
-                # ADD RESPONSE DATA - CACHE SPIKES
-                self._update_response(epoch, epochgrp)
-
-                # ADD GROUP FOR EACH STIMULUS
-                self._update_stimuli(epoch, epochgrp)
+                epochgrp = expgrp.create_group(self.group_name(epoch))
+                self._write_epoch(cell, protocol, epoch, epochgrp)
 
         except Exception as e:
             if self.fout is not None:
@@ -105,6 +139,8 @@ class SymphonyIO:
         finally:
             self.fout.close()
 
+        ParamsIndex(outputpath).write()
+
     def update(self, outputpath, attrs=False, responses=False, stimuli=False):
         try:
             self.fout = h5py.File(outputpath, mode="r+")
@@ -112,7 +148,7 @@ class SymphonyIO:
             for ii, (cell, protocol, epoch) in enumerate(self.reader()):
 
                 try:
-                    epochgrp = expgrp[f"epoch{ii}"]
+                    epochgrp = expgrp[self.group_name(epoch)]
 
                     # ADD EPOCH ATTRIBUTES
                     if attrs:
@@ -127,10 +163,8 @@ class SymphonyIO:
                         self._update_stimuli(epoch, epochgrp)
 
                 except KeyError:
-                    epochgrp = expgrp.create_group(f"epoch{ii}")
-                    self._update_attrs(protocol, cell, epoch, epochgrp)
-                    self._update_response(epoch, epochgrp)
-                    self._update_stimuli(epoch, epochgrp)
+                    epochgrp = expgrp.create_group(self.group_name(epoch))
+                    self._write_epoch(cell, protocol, epoch, epochgrp)
 
         except Exception as e:
             if self.fout is not None:
@@ -138,6 +172,7 @@ class SymphonyIO:
             raise e
 
         self.fout.close()
+        ParamsIndex(outputpath).write()
 
     def update_rstarr(self, outputpath):
         try:
@@ -145,7 +180,11 @@ class SymphonyIO:
             expgrp = self.fout["experiment"]
             for ii, (cell, protocol, epoch) in enumerate(self.reader()):
 
-                epochgrp = expgrp[f"epoch{ii}"]
+                group_name = self.group_name(epoch)
+                if group_name not in expgrp:
+                    logger.warning(f"{group_name} not in {outputpath}")
+                    continue
+                epochgrp = expgrp[group_name]
                 try:
                     del epochgrp.attrs["lightamplitude"]
                 except KeyError:
@@ -171,6 +210,20 @@ class SymphonyIO:
             raise e
 
         self.fout.close()
+        ParamsIndex(outputpath).write()
+
+    def _write_epoch(self, cell: Cell, protocol: Protocol, epoch: Epoch, epochgrp: h5py.Group):
+        # ADD EPOCH ATTRIBUTES
+        self._update_attrs(protocol, cell, epoch, epochgrp)
+
+        # ADD RESPONSE DATA - CACHE SPIKES
+        responses = self._update_response(epoch, epochgrp)
+
+        # ADD GROUP FOR EACH STIMULUS
+        self._update_stimuli(epoch, epochgrp)
+
+        # WRITTEN LAST - ONLY COMPLETE EPOCHS HAVE A FINGERPRINT
+        self._write_fingerprints(cell, protocol, epoch, epochgrp, [values for _, values in responses])
 
     def _update_stimuli(self, epoch: Epoch, epochgrp: h5py.Group):
         # map to stimulus group
@@ -181,24 +234,52 @@ class SymphonyIO:
                 stimds.attrs[key.lower()] = val
 
     def _update_response(self, epoch: h5py.Group, epochgrp: h5py.Group):
+        # WRITTEN BEFORE THE NEXT EPOCH IS READ, SO BUFFERS CAN BE SHARED
+        responses = self._read_responses(epoch, self._buffers)
+        self._write_responses(responses, epochgrp)
+
+        spiketrace = self._spike_trace(epoch, responses)
+        if spiketrace is not None:
+            self._write_spikes(*detect_spikes(spiketrace), epochgrp)
+        return responses
+
+    @staticmethod
+    def _read_responses(epoch: Epoch, buffers: Dict[str, np.ndarray] = None) -> List[Tuple[Response, np.ndarray]]:
+        """Values of each response. Read into buffers[response name] if given,
+        replaced by a larger buffer where too short. Values are then only valid
+        until the buffers are read into again."""
+        if buffers is None:
+            return [(response, response.read()) for response in epoch.responses]
+
+        responses = []
         for response in epoch.responses:
-            values = response.data
-            ds = epochgrp.create_dataset(
-                name=response.name, data=values, dtype=float)
+            if len(buffers.get(response.name, ())) < len(response):
+                buffers[response.name] = np.empty(len(response), dtype=float)
+            responses.append((response, response.read(buffers[response.name])))
+        return responses
+
+    @staticmethod
+    def _spike_trace(epoch: Epoch, responses: List[Tuple[Response, np.ndarray]]) -> Optional[np.ndarray]:
+        """Response spikes are detected from. None if not a spike trace."""
+        if epoch.tracetype == "spiketrace":
+            for response, values in responses:
+                if response.name == "Amp1":
+                    return values
+        return None
+
+    def _write_responses(self, responses: List[Tuple[Response, np.ndarray]], epochgrp: h5py.Group):
+        for response, values in responses:
+            ds = self.layout.write_response(epochgrp, response.name, values)
 
             ds.attrs["path"] = response.h5name
+            ds.attrs["units"] = response.units
 
-            if (epoch.tracetype == "spiketrace") and (response.name == "Amp1"):
-                spikes, violationidx = detect_spikes(values)
-
-                if spikes is not None:
-                    spds = epochgrp.create_dataset(
-                        name="Spikes",
-                        data=spikes,
-                        dtype=float)
+    def _write_spikes(self, spikes, violationidx, epochgrp: h5py.Group):
+        if spikes is not None:
+            spds = self.layout.write_spikes(epochgrp, spikes)
 
-                if violationidx is not None:
-                    spds.attrs["violation_idx"] = violationidx
+            if violationidx is not None:
+                spds.attrs["violation_idx"] = violationidx
 
     def _update_attrs(self, protocol: Protocol, cell: Cell, epoch: Epoch, epochgrp: h5py.Group):
         params = dict(
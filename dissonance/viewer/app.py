@@ -11,11 +11,13 @@ from PyQt5.QtWidgets import (QAbstractItemView, QApplication, QDialog,
                              QVBoxLayout, QWidget)
 
 from ..analysis import IAnalysis
+from ..analysis.cache import DEFAULT_MAXBYTES
 from ..io import EpochIO
 from .epochtree import EpochTreeWidget
 from .exportwindow import ExportDataWindow
 from .graphwidget import GraphWidget
 from .paramstable import ParamsTable
+from .worker import AnalysisWorker
 
 STYLE = """
     QTreeView::branch:has-siblings:!adjoins-item {
@@ -46,9 +48,11 @@ QTreeView::branch:open:has-children:has-siblings  {
 
 class DissonanceUI(QWidget):
 
-    def __init__(self, epochio: EpochIO, analysis: IAnalysis, unchecked: set = None, uncheckedpath: Path = None, export_dir: Path = None):
+    def __init__(self, epochio: EpochIO, analysis: IAnalysis, unchecked: set = None, uncheckedpath: Path = None, export_dir: Path = None, cachebytes: int = DEFAULT_MAXBYTES):
         super().__init__()
 
+        self.cachebytes = cachebytes
+
         self.unchecked = unchecked
         self.uncheckedpath = "unchecked.csv" if uncheckedpath is None else uncheckedpath
         self.export_dir = export_dir
@@ -115,8 +119,13 @@ class DissonanceUI(QWidget):
         self.dialog = ExportDataWindow(
             parent=self, charts=None, outputdir=self.export_dir)
 
-        self.initConnections()
+        # QUERY AND ANALYZE ON A SEPARATE THREAD
+        self.worker = AnalysisWorker(epochio, analysis, self.cachebytes)
+        self.workerThread = QThread(self)
+        self.worker.moveToThread(self.workerThread)
+        self.workerThread.start()
 
+        self.initConnections()
 
         # SHOW LOGGING WINDOW
         #self.logger = LoggerDialog(self)
@@ -131,17 +140,14 @@ class DissonanceUI(QWidget):
         header.setStretchLastSection(True)
 
     def initConnections(self):
-        self.treeWidget.newSelection.connect(self.updateTableOnTreeSelect)
+        self.treeWidget.newRequest.connect(self.requestSelection)
         self.paramstable.rowEdited.connect(self.treeWidget.updateTree)
         self.exportdata_bttn.clicked.connect(self.on_export_bttn_click)
 
-        # PLOT ON A SEPARATE THREAD
-        #thread = QThread(self)
-        # self.graphWidget.moveToThread(thread)
-        # thread.start()
-
         # ADD THREAD CONNECTIONS
-        self.treeWidget.newSelectionForPlot.connect(self.graphWidget.plot)
+        self.worker.queried.connect(self.updateTableOnTreeSelect)
+        self.worker.prepared.connect(self.plotPrepared)
+        self.worker.failed.connect(self.onWorkerFailed)
         self.graphWidget.redrawCanvas.connect(self.redrawCanvas)
         self.graphWidget.currentPlots.connect(self.dialog.fillList)
 # endregion
@@ -151,12 +157,33 @@ class DissonanceUI(QWidget):
     def redrawCanvas(self):
         self.graphWidget.draw()
 
-    @pyqtSlot(object)
-    def updateTableOnTreeSelect(self, eframe):
+    @pyqtSlot(str, object, bool)
+    def requestSelection(self, level, filters, useincludeflag):
+        # SUPERSEDES ANY REQUEST STILL RUNNING
+        self.worker.request(level, filters, useincludeflag)
+
+    @pyqtSlot(int, str, object, object)
+    def plotPrepared(self, requestid, level, eframe, grps):
+        # SELECTION CHANGED WHILE RESULT WAS IN FLIGHT
+        if requestid != self.worker.latest:
+            return
+        # THE WORKER CAN'T CLOSE FILES WHILE THEY'RE DRAWN
+        with self.worker.epochio.files.reading(eframe.exppath.unique()):
+            self.graphWidget.plot(level, eframe, grps)
+
+    @pyqtSlot(int, str)
+    def onWorkerFailed(self, requestid, message):
+        print(message)
+
+    @pyqtSlot(int, object)
+    def updateTableOnTreeSelect(self, requestid, eframe):
+        if requestid != self.worker.latest:
+            return
         try:
             if eframe is not None:
                 epochs = eframe.epoch.values
-                self.paramstable.onNewEpochs(epochs)
+                with self.worker.epochio.files.reading(eframe.exppath.unique()):
+                    self.paramstable.onNewEpochs(epochs)
         except Exception as e:
             print(e)
 
@@ -174,6 +201,12 @@ class DissonanceUI(QWidget):
             (frame.loc[~frame.include, "startdate"].to_csv(
                 fileName, index=False))
 
+    def closeEvent(self, event):
+        self.workerThread.quit()
+        self.workerThread.wait()
+        self.worker.epochio.close()
+        super().closeEvent(event)
+
     @pyqtSlot()
     def on_export_bttn_click(self):
         self.exportdata_bttn.setEnabled(False)
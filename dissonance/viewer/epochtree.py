@@ -1,94 +1,203 @@
+from typing import Dict, List
+
+import numpy as np
 from dissonance.io import EpochIO
-from PyQt5.Qt import QAbstractItemView, QStandardItem, QStandardItemModel, Qt
-from PyQt5.QtCore import pyqtSignal, pyqtSlot
-from PyQt5.QtGui import QColor, QFont
+from PyQt5.Qt import QAbstractItemView, Qt
+from PyQt5.QtCore import QAbstractItemModel, QModelIndex, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QBrush, QColor, QFont
 from PyQt5.QtWidgets import QTreeView
 
 from ..analysis.trees.base import Node
 
 
-class RootItem(QStandardItem):
-    def __init__(self, node: Node, color=QColor(0, 0, 0)):
-        super(QStandardItem, self).__init__()
-        self.node = node
-        fnt = QFont()
-        fnt.setBold(True)
-        fnt.setPixelSize(12)
-
-        self.label = f"{node.label}={node.uid}"
-
-        self.setEditable(False)
-        self.setForeground(color)
-        self.setFont(fnt)
-        self.setText(self.label)
-        self.setFlags(self.flags() & ~Qt.ItemIsSelectable)
-
-
-class GroupItem(QStandardItem):
-    def __init__(self, node: Node, color=QColor(0, 0, 0)):
-        super(QStandardItem, self).__init__()
-        self.node = node
-        fnt = QFont()
-        fnt.setBold(True)
-        fnt.setPixelSize(12)
-
-        #self.label = ", ".join(map(str, self.node.path.values()))
-        #self.label = list(self.node.path.values())[-1]
-        self.label = f"{node.label}={node.uid}"
-
-        self.setEditable(False)
-        self.setForeground(color)
-        self.setFont(fnt)
-        self.setText(self.label)
-
-        self.setFlags(self.flags() 
-            | Qt.ItemIsSelectable | Qt.ItemIsAutoTristate | Qt.ItemIsUserCheckable)
-        self.setCheckState(Qt.Checked)
-
-    @property
-    def isLeaf(self):
-        return False
-
-    def toggleCheck(self):
-        if self.checkState() == Qt.Checked:
-            self.setBackground(QColor(187, 177, 189))
-        else:
-            self.setBackground(QColor(255, 255, 255, 0))
-
-
-class EpochItem(QStandardItem):
-    def __init__(self, node: Node, color=QColor(0, 0, 0)):
-        super().__init__()
+class EpochTreeModel(QAbstractItemModel):
+    """Item model read straight from an AnalysisTree.
 
-        self.node = node
-        fnt = QFont()
-        fnt.setPixelSize(12)
-        self.label = node.uid
+    Rows are created as branches are expanded, a batch at a time, and check
+    states are read from the include column of the EpochIO frame. The tree's
+    root is the single top level row.
+    """
 
-        self.setEditable(False)
-        self.setForeground(color)
-        self.setBackground(QColor(187, 177, 189))
-        self.setFont(fnt)
-        self.setText(f"startdate={self.label}")
+    # ROWS ADDED PER fetchMore
+    BATCHSIZE = 500
 
-        self.setFlags(self.flags() | Qt.ItemIsUserCheckable |
-                      Qt.ItemIsSelectable)
-        self.setCheckState(Qt.Checked)
+    def __init__(self, epochio: EpochIO, tree: Node, parent=None):
+        super().__init__(parent)
+        self.epochio = epochio
 
-    @property
-    def isLeaf(self):
+        # SHARED BY EVERY ROW
+        self.groupfont = QFont()
+        self.groupfont.setBold(True)
+        self.groupfont.setPixelSize(12)
+        self.leaffont = QFont()
+        self.leaffont.setPixelSize(12)
+        self.foreground = QBrush(QColor(0, 0, 0))
+        self.checkedbackground = QBrush(QColor(187, 177, 189))
+
+        self.setTree(tree)
+
+    def setTree(self, tree: Node):
+        self.beginResetModel()
+        self.tree = tree
+        # CHILDREN SHOWN SO FAR, ROW OF EACH NODE AND FRAME POSITIONS OF EACH NODE'S LEAVES
+        self._rows: Dict[int, List[Node]] = dict()
+        self._rowof: Dict[int, int] = {id(tree): 0}
+        self._positions: Dict[int, np.ndarray] = dict()
+        self.endResetModel()
+
+    def node(self, index: QModelIndex) -> Node:
+        return index.internalPointer() if index.isValid() else None
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not parent.isValid():
+            return self.createIndex(row, column, self.tree) if row == 0 else QModelIndex()
+        rows = self._rows.get(id(self.node(parent)), [])
+        if row >= len(rows):
+            return QModelIndex()
+        return self.createIndex(row, column, rows[row])
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        node = self.node(index)
+        if node is None or node is self.tree:
+            return QModelIndex()
+        return self.createIndex(self._rowof[id(node.parent)], 0, node.parent)
+
+    def indexOf(self, node: Node) -> QModelIndex:
+        return self.createIndex(self._rowof[id(node)], 0, node)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if not parent.isValid():
+            return 1
+        return len(self._rows.get(id(self.node(parent)), []))
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() or not self.node(parent).isleaf
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        node = self.node(parent)
+        if node is None:
+            return False
+        return len(self._rows.get(id(node), [])) < len(node._children)
+
+    def fetchMore(self, parent: QModelIndex):
+        node = self.node(parent)
+        rows = self._rows.setdefault(id(node), [])
+        children = node.children[len(rows):len(rows) + self.BATCHSIZE]
+
+        self.beginInsertRows(parent, len(rows), len(rows) + len(children) - 1)
+        for child in children:
+            self._rowof[id(child)] = len(rows)
+            rows.append(child)
+        self.endInsertRows()
+
+    def flags(self, index: QModelIndex):
+        node = self.node(index)
+        if node is None:
+            return Qt.NoItemFlags
+        if node is self.tree:
+            return Qt.ItemIsEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        node = self.node(index)
+        if node is None:
+            return None
+
+        if role == Qt.DisplayRole:
+            return f"{node.label}={node.uid}"
+        elif role == Qt.FontRole:
+            return self.leaffont if node.isleaf else self.groupfont
+        elif role == Qt.ForegroundRole:
+            return self.foreground
+        elif node is self.tree:
+            return None
+        elif role == Qt.CheckStateRole:
+            return self.checkState(node)
+        elif role == Qt.BackgroundRole:
+            if self.checkState(node) == Qt.Checked:
+                return self.checkedbackground
+        return None
+
+    def setData(self, index: QModelIndex, value, role: int = Qt.EditRole) -> bool:
+        node = self.node(index)
+        if role != Qt.CheckStateRole or node is None or node is self.tree:
+            return False
+
+        self.setIncluded([node], value == Qt.Checked)
         return True
 
-    def toggleCheck(self):
-        if self.checkState() == Qt.Checked:
-            self.setBackground(QColor(187, 177, 189))
+    def setIncluded(self, nodes: List[Node], include: bool):
+        """Check or uncheck every epoch below nodes with one update and one repaint"""
+        nodes = [node for node in nodes if node is not None]
+        if len(nodes) == 0:
+            return
+        if any(node is self.tree for node in nodes):
+            self.epochio.set_include(self.tree.leafuids, include)
         else:
-            self.setBackground(QColor(255, 255, 255, 0))
+            self.epochio.set_include(filters=[node.path for node in nodes], include=include)
+        self.checkStatesChanged(nodes)
+
+    def checkStatesChanged(self, nodes: List[Node]):
+        """dataChanged for every shown row whose check state follows nodes: the nodes,
+        their ancestors and every row fetched below them. One signal per run of sibling rows."""
+        # ROWS CHANGED UNDER EACH PARENT
+        changed: Dict[int, set] = dict()
+        parents: Dict[int, Node] = dict()
+
+        def mark(parent: Node, rows):
+            parents[id(parent)] = parent
+            changed.setdefault(id(parent), set()).update(rows)
+
+        stack = []
+        for node in nodes:
+            # ANCESTORS ARE PARTIALLY CHECKED OR NOT - THE ROOT HAS NO CHECK STATE
+            child = node
+            while child is not self.tree:
+                mark(child.parent, [self._rowof[id(child)]])
+                child = child.parent
+            stack.append(node)
+
+        visited = set()
+        while stack:
+            node = stack.pop()
+            if id(node) in visited or id(node) not in self._rows:
+                continue
+            visited.add(id(node))
+            rows = self._rows[id(node)]
+            mark(node, range(len(rows)))
+            stack.extend(rows)
+
+        roles = [Qt.CheckStateRole, Qt.BackgroundRole]
+        for key, rows in changed.items():
+            parent, rows = parents[key], sorted(rows)
+            siblings = self._rows[key]
+            # SPLIT INTO CONTIGUOUS RUNS
+            breaks = [ii for ii in range(1, len(rows)) if rows[ii] != rows[ii - 1] + 1]
+            for first, last in zip([0, *breaks], [*breaks, len(rows)]):
+                self.dataChanged.emit(
+                    self.createIndex(rows[first], 0, siblings[rows[first]]),
+                    self.createIndex(rows[last - 1], 0, siblings[rows[last - 1]]),
+                    roles)
+
+    def checkState(self, node: Node):
+        """Checked if every leaf under node is included, unchecked if none are"""
+        if id(node) not in self._positions:
+            self._positions[id(node)] = self.epochio.startdate_positions(node.leafuids)
+        include = self.epochio.frame["include"].values[self._positions[id(node)]]
+        if include.all():
+            return Qt.Checked
+        elif include.any():
+            return Qt.PartiallyChecked
+        return Qt.Unchecked
+
 
 class EpochTreeWidget(QTreeView):
 
-    newSelection = pyqtSignal(object)
-    newSelectionForPlot = pyqtSignal(str, object)
+    # LEVEL TO PLOT ("" IF SEVERAL NODES), FILTERS AND WHETHER TO USE INCLUDE FLAG
+    newRequest = pyqtSignal(str, object, bool)
 
     def __init__(self, name, splits, epochio: EpochIO):
         super().__init__()
@@ -100,26 +209,38 @@ class EpochTreeWidget(QTreeView):
         self.initConnections()
 
     def initConnections(self):
-        self.model().itemChanged.connect(self.onCheckToggle)
         self.selectionModel().selectionChanged.connect(self.onTreeSelect)
 
+    def keyPressEvent(self, event):
+        # SPACE TOGGLES EVERY SELECTED NODE, NOT ONLY THE CURRENT ONE
+        if event.key() == Qt.Key_Space and len(self.selectedIndexes()) > 1:
+            self.toggleSelected()
+        else:
+            super().keyPressEvent(event)
+
+    @pyqtSlot()
+    def toggleSelected(self):
+        """Uncheck selected nodes if all are checked, otherwise check them all"""
+        nodes = self.selectedNodes
+        include = any(
+            self.treeModel.checkState(node) != Qt.Checked
+            for node in nodes)
+        self.treeModel.setIncluded(nodes, include)
+
     def createModel(self, epochio: EpochIO):
-        self.treeModel = QStandardItemModel()
+        self.epochio = epochio
+        self.tree = epochio.to_tree(self.name, self.splits)
+        self.treeModel = EpochTreeModel(epochio, self.tree, self)
         self.setModel(self.treeModel)
         self.setSelectionMode(QAbstractItemView.ExtendedSelection)
-        self.plantTree(epochio)
+        # ALL ROWS HAVE THE SAME HEIGHT, SO THE VIEW DOESN'T MEASURE EACH ONE
+        self.setUniformRowHeights(True)
 
     def plantTree(self, epochio: EpochIO):
         self.epochio = epochio
         self.tree = epochio.to_tree(self.name, self.splits)
-        # REMOVE DATA CURRENTLY IN TREE MODEL
-        self.treeModel.removeRows(0, self.treeModel.rowCount())
-        # TRANSLATE TREE TO Qt Items ITEMS
-        rootNode = self.treeModel.invisibleRootItem()
-        root = RootItem(self.tree)
-        self._exclude = self.epochio.frame.loc[~self.epochio.frame.include, "startdate"].values
-        self.addItems(self.tree, root)
-        rootNode.appendRow(root)
+        self.treeModel.epochio = epochio
+        self.treeModel.setTree(self.tree)
 
     @pyqtSlot(str, object)
     def updateTree(self, paramname, value):
@@ -130,84 +251,23 @@ class EpochTreeWidget(QTreeView):
         # REFRESH AND REATTATCH TREE
         self.plantTree(self.epochio)
 
-    # @pyqtSlot()
-    def onCheckToggle(self, item: QStandardItem):
-        """Update unchecked list on toggle
-
-        Args:
-                item (QStandardItem): Selected tree node
-        """
-        item.toggleCheck()
-        include = item.checkState() == Qt.Checked
-
-        if item.isLeaf:
-            self.epochio.frame.loc[
-                self.epochio.frame.startdate == item.label,
-                "include"] = include
-        else: 
-            self.recursiveCheckToggle(item)
-            print("figure this out")
-
-    def recursiveCheckToggle(self, item: QStandardItem):
-
-        checkState = item.checkState()
-        nrows = item.rowCount()
-        ncols = item.columnCount()
-        
-        for cc in range(ncols):
-            for rr in range(nrows):
-                child = item.child(rr, cc)
-                child.setCheckState(checkState)
-                self.onCheckToggle(child)
-
-    def addItems(self, parentnode: Node, parentitem: QStandardItem):
-        """Translate nodes of tree to QT items for treeview
-
-        Args:
-                parentnode (Node): Node in tree
-                parentitem (QStandardItem): Node in QtTreeView
-        """
-        for ii, node in enumerate(parentnode):
-            if node.isleaf:
-                item = EpochItem(node)
-                if node.uid in self._exclude:
-                    item.setCheckState(Qt.Unchecked)
-                parentitem.appendRow(item)
-            else:
-                item = GroupItem(node)
-                parentitem.appendRow(item)
-                self.addItems(node, item)
-
     @property
     def selectedNodes(self):
         # SELECT V MULTI SELECT
-        idxs = self.selectedIndexes()
-        nodes = []
-        if len(idxs) == 1:
-            treeitem = self.model().itemFromIndex(idxs[0])
-            nodes.append(treeitem.node)
-        else:
-            nodes = [self.model().itemFromIndex(
-                idx).node for idx in idxs]
-        return nodes
+        return [
+            self.treeModel.node(idx)
+            for idx in self.selectedIndexes()]
 
     @pyqtSlot()
     def onTreeSelect(self):
-        # SELECT V MULTI SELECT
-        # self.newselection.emit(self.selected_nodes)
+        """Request the selected epochs. Querying is left to the receiver, off the GUI thread."""
         nodes = self.selectedNodes
+        filters = [node.path for node in nodes]
         if len(nodes) == 0:
-            eframe = None
+            return
         elif len(nodes) == 1:
-            if "startdate" in nodes[0].path.keys():
-                eframe = self.epochio.query(
-                    filters=[node.path for node in nodes], useincludeflag=False)
-            else:
-                eframe = self.epochio.query(
-                    filters=[node.path for node in nodes])
+            # SINGLE EPOCHS ARE SHOWN EVEN WHEN UNCHECKED
+            self.newRequest.emit(
+                nodes[0].label, filters, "startdate" not in filters[0])
         else:
-            eframe = self.epochio.query(filters=[node.path for node in nodes])
-
-        self.newSelection.emit(eframe)
-        if len(nodes) == 1:
-            self.newSelectionForPlot.emit(nodes[0].label, eframe)
+            self.newRequest.emit("", filters, True)
@@ -17,10 +17,11 @@ class GraphWidget(MplCanvas):
         self.analysis = analysis
         self.currentplots = []
 
-    @pyqtSlot(str, object)
-    def plot(self, level: str, eframe: pd.DataFrame):
+    @pyqtSlot(str, object, object)
+    def plot(self, level: str, eframe: pd.DataFrame, grps=None):
+        """Draw level's plots. grps is the analysis' prepare result, if already computed."""
         try:
-            self.analysis.plot(level, eframe, self)
+            self.analysis.plot(level, eframe, self, grps)
             self.currentplots = self.analysis.currentplots
 
             self.draw()
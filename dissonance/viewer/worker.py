@@ -0,0 +1,116 @@
+import threading
+from typing import Dict, List, Tuple
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+from ..analysis import IAnalysis
+from ..analysis.cache import (DEFAULT_MAXBYTES, ResultCache, result_nbytes,
+                              selection_key)
+from ..io import EpochIO
+
+
+class AnalysisWorker(QObject):
+    """Query and prepare tree selections away from the GUI thread.
+
+    Move to a QThread and call request from the GUI thread. Each request gets an
+    increasing id; a request superseded before or while it runs is dropped, so
+    only the latest selection's results are emitted.
+
+    Results are kept in an LRU cache keyed by selection, so reselecting a node
+    skips the query and analysis. Entries are dropped once parameters are edited
+    or check toggles change which epochs the selection covers.
+
+    Args:
+            maxbytes (int): Memory budget of the result cache
+    """
+    queried = pyqtSignal(int, object)
+    prepared = pyqtSignal(int, str, object, object)
+    failed = pyqtSignal(int, str)
+
+    _requested = pyqtSignal(int, str, object, bool)
+
+    def __init__(self, epochio: EpochIO, analysis: IAnalysis, maxbytes: int = DEFAULT_MAXBYTES, parent=None):
+        super().__init__(parent)
+        self.epochio = epochio
+        self.analysis = analysis
+        self.cache = ResultCache(maxbytes)
+
+        self._latest = 0
+        self._lock = threading.Lock()
+        # QUEUED ONCE MOVED TO ANOTHER THREAD
+        self._requested.connect(self._run)
+
+    @property
+    def latest(self) -> int:
+        with self._lock:
+            return self._latest
+
+    def is_stale(self, requestid: int) -> bool:
+        return requestid != self.latest
+
+    def request(self, level: str, filters: List[Dict], useincludeflag: bool = True) -> int:
+        """Queue a query of filters, and prepare level's plots if level is given.
+
+        Returns:
+                int: Id the results are emitted with
+        """
+        with self._lock:
+            self._latest += 1
+            requestid = self._latest
+        self._requested.emit(requestid, level, filters, useincludeflag)
+        return requestid
+
+    @pyqtSlot(int, str, object, bool)
+    def _run(self, requestid: int, level: str, filters: List[Dict], useincludeflag: bool):
+        if self.is_stale(requestid):
+            return
+        try:
+            key = selection_key(level, filters, useincludeflag)
+            with self.epochio.lock:
+                token = self._token(filters, useincludeflag)
+            cached = self.cache.get(key, token)
+            if cached is None:
+                computed = self._compute(requestid, level, filters, useincludeflag)
+                if computed is None:
+                    return
+                # CACHED UNDER THE TOKEN OF THE FRAME IT WAS QUERIED FROM
+                token, cached = computed
+                self.cache.put(key, cached, result_nbytes(*cached), token)
+
+            # KEPT FOR LATER EVEN IF ALREADY SUPERSEDED
+            if self.is_stale(requestid):
+                return
+            eframe, grps = cached
+            self.queried.emit(requestid, eframe)
+            if level and len(eframe) > 0:
+                self.prepared.emit(requestid, level, eframe, grps)
+        except Exception as e:
+            self.failed.emit(requestid, str(e))
+
+    def _token(self, filters: List[Dict], useincludeflag: bool) -> Tuple:
+        """Valid while parameters, selected epochs and their flags are unchanged. Call holding epochio.lock."""
+        positions = self.epochio.positions(filters, useincludeflag)
+        return (
+            self.epochio.version, positions.tobytes(),
+            self.epochio.frame["include"].values[positions].tobytes())
+
+    def _compute(self, requestid: int, level: str, filters: List[Dict], useincludeflag: bool):
+        """Query and prepare a selection. (token, (eframe, grps)), None if superseded after the query."""
+        # TOKEN AND QUERY FROM ONE SNAPSHOT OF THE FRAME
+        with self.epochio.lock:
+            token = self._token(filters, useincludeflag)
+            # READ EPOCHS HERE SO THE GUI THREAD ONLY DRAWS. KEPT LAZY SO CACHED
+            # EPOCHS REOPEN THEIR FILE IF THE POOL CLOSED IT
+            eframe = self.epochio.query(
+                filters=filters, useincludeflag=useincludeflag)
+        # FILES OF THE SELECTION STAY OPEN UNTIL IT'S PREPARED
+        with self.epochio.files.reading(eframe.exppath.unique()):
+            for epoch in eframe.epoch:
+                epoch.materialize()
+            if self.is_stale(requestid):
+                return None
+
+            grps = None
+            if level and len(eframe) > 0:
+                grps = self.analysis.prepare(level, eframe)
+        return token, (eframe, grps)
@@ -0,0 +1,90 @@
+import datetime
+
+import h5py
+import numpy as np
+import pytest
+
+
+def write_mapped_file(filepath, n=20, seed=0, samples=2000):
+    """Small mapped h5 file with alternating spike and whole cell LedPulse epochs."""
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime(2022, 1, 15, 10)
+    with h5py.File(filepath, "w") as f:
+        experiment = f.create_group("experiment")
+        for ii in range(n):
+            startdate = start + datetime.timedelta(seconds=3 * ii, microseconds=seed)
+            grp = experiment.create_group(f"epoch{startdate.timestamp()}")
+            tracetype = "spiketrace" if ii % 2 else "wholetrace"
+            grp.attrs.update(dict(
+                path=f"/protocol/{ii}", cellname=f"20220115A_c{ii % 3}",
+                celltype="RGC\\OFF-transient", genotype="GG2 KO",
+                tracetype=tracetype, protocolname="LedPulse",
+                startdate=str(startdate), enddate=str(startdate),
+                interpulseinterval=0.0, led="Green LED", numberofaverages=5,
+                pretime=50.0, stimtime=10.0, samplerate=10000.0, tailtime=140.0,
+                holdingpotential="excitation" if tracetype == "wholetrace" else "nan",
+                lightamplitude=float(ii % 4), lightmean=float(ii % 2),
+                backgroundval=0.0))
+            grp.create_dataset("Amp1", data=rng.normal(size=samples))
+            if tracetype == "spiketrace":
+                grp.create_dataset(
+                    "Spikes", data=np.sort(rng.choice(samples, 20, replace=False)))
+    return filepath
+
+
+@pytest.fixture
+def mapped_dir(tmp_path):
+    for ii, letter in enumerate("AB"):
+        write_mapped_file(tmp_path / f"2022-01-15{letter}.h5", seed=ii)
+    return tmp_path
+
+
+@pytest.fixture
+def epochio(mapped_dir):
+    from dissonance.io import DissonanceReader
+    paramnames = [
+        "led", "protocolname", "celltype", "genotype", "cellname",
+        "lightmean", "lightamplitude", "tracetype", "startdate"]
+    return DissonanceReader([mapped_dir]).to_epoch_io(paramnames, nprocesses=1)
+
+
+def write_symphony_file(filepath, ncells=2, nepochs=6, samples=2000, seed=0):
+    """Small symphony file with one LedPulse block per cell, alternating spike and whole cell epochs."""
+    rng = np.random.default_rng(seed)
+    ticks = lambda date: (date - datetime.datetime(1, 1, 1)) // datetime.timedelta(microseconds=1) * 10
+    start = datetime.datetime(2022, 1, 15, 10)
+    with h5py.File(filepath, "w") as f:
+        experiment = f.create_group("experiment-0000")
+        for cc in range(ncells):
+            cell = experiment.create_group(f"epochGroups/epochGroup-{cc:04d}")
+            cell.create_group("source").attrs["label"] = f"c{cc}"
+            cell.create_group("source/properties").attrs["type"] = "RGC\\OFF-transient"
+
+            protocol = cell.create_group(f"epochBlocks/edu.wisc.sinhalab.protocols.LedPulse-{cc:04d}")
+            protocol.create_group("protocolParameters").attrs.update(dict(
+                led="Green LED", lightAmplitude=0.007, lightMean=0.0, preTime=50.0,
+                stimTime=10.0, tailTime=140.0, sampleRate=10000.0, numberOfAverages=5.0))
+
+            for ee in range(nepochs):
+                startdate = start + datetime.timedelta(hours=cc, seconds=3 * ee)
+                epoch = protocol.create_group(f"epochs/epoch-{ee:04d}")
+                epoch.attrs["startTimeDotNetDateTimeOffsetTicks"] = ticks(startdate)
+                epoch.attrs["endTimeDotNetDateTimeOffsetTicks"] = ticks(startdate + datetime.timedelta(seconds=2))
+                epoch.create_group("protocolParameters").attrs["ndf"] = 1.0
+
+                spiketrace = ee % 2 == 0
+                epoch.create_group("backgrounds/Amp1-0000").attrs["value"] = 0.0 if spiketrace else -60.0
+
+                trace = rng.normal(scale=0.5, size=samples)
+                if spiketrace:
+                    trace[rng.choice(samples - 10, 15, replace=False) + 5] -= 20.0
+                data = np.array(
+                    [(val, b"pA") for val in trace],
+                    dtype=[("quantity", "<f8"), ("units", "S2")])
+                response = epoch.create_group("responses/Amp1-0000")
+                response.attrs.update(dict(sampleRate=10000.0, sampleRateUnits="Hz"))
+                response.create_dataset("data", data=data)
+
+                stimulus = epoch.create_group("stimuli/Green LED-0000/parameters")
+                stimulus.attrs.update(dict(amplitude=0.007, mean=0.0))
+    return filepath
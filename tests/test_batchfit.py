@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from dissonance.analysis_functions import HillEquation, WeberEquation
+from dissonance.analysis_functions import batchfit
+
+X = np.array([0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0])
+
+
+def hill_datasets(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        (X, HillEquation.equation(X, 1.5, 0.0, 1.0 + 0.1 * ii, 10.0 + ii) + rng.normal(scale=0.01, size=len(X)))
+        for ii in range(n)]
+
+
+@pytest.mark.parametrize("equation,params", [
+    (HillEquation, (1.5, 0.2, 3.0, 7.0)),
+    (WeberEquation, (50.0,))])
+def test_jacobian_matches_finite_differences(equation, params):
+    params = np.array(params)
+    jac = equation.jacobian(X, *params)
+    for ii in range(len(params)):
+        step = np.zeros_like(params)
+        step[ii] = 1e-6 * params[ii]
+        numeric = (equation.equation(X, *(params + step)) - equation.equation(X, *(params - step))) / (2 * step[ii])
+        assert np.allclose(jac[:, ii], numeric, rtol=1e-5, atol=1e-8)
+
+
+def test_invequation_inverts_hill():
+    hill = HillEquation(1.5, 0.2, 3.0, 7.0)
+    assert np.isclose(hill.invequation(hill(12.0), *hill.params), 12.0)
+
+
+def test_warm_start_and_pool_match_cold_start():
+    datasets = hill_datasets(12)
+    labels = [dict(cellname=f"cell{ii}") for ii in range(12)]
+
+    cold = batchfit.fit_batch(datasets, "hill", labels, warmstart=False)
+    warm = batchfit.fit_batch(datasets, "hill", labels)
+    pooled = batchfit.fit_batch(datasets, "hill", labels, nprocesses=3)
+
+    assert list(warm.columns) == ["cellname", "model", "n", *HillEquation.PARAMS, "r2", "ihalf", "success"]
+    assert warm.success.all()
+    for table in (warm, pooled):
+        assert (table.cellname == cold.cellname).all()
+        assert np.allclose(table[list(HillEquation.PARAMS)], cold[list(HillEquation.PARAMS)], rtol=1e-4, atol=1e-6)
+
+    hill = batchfit.fitted("hill", warm.iloc[0])
+    assert np.isclose(hill.ihalf, warm.ihalf.iloc[0])
+    assert np.allclose(hill(X), datasets[0][1], atol=0.05)
+
+
+def test_bootstrap_confidence_intervals():
+    table = batchfit.fit_batch(hill_datasets(2), "hill", nboot=30)
+    assert (table.nboot > 0).all()
+    for name in [*HillEquation.PARAMS, "ihalf"]:
+        assert (table[f"{name}_lo"] <= table[f"{name}_hi"]).all()
+    assert ((table.rmax_lo <= table.rmax) & (table.rmax <= table.rmax_hi)).all()
+
+    again = batchfit.fit_batch(hill_datasets(2), "hill", nboot=30)
+    assert np.allclose(table.rmax_hi, again.rmax_hi)
+
+
+def test_weber_and_empty_batches():
+    lightmeans = np.array([0.0, 10.0, 100.0, 1000.0])
+    table = batchfit.fit_batch([(lightmeans, WeberEquation.equation(lightmeans, 50.0) * 4)], "weber")
+    assert np.isclose(table.beta.iloc[0], 50.0, rtol=1e-3)
+
+    empty = batchfit.fit_batch([], "weber")
+    assert empty.empty and list(empty.columns) == ["model", "n", "beta", "r2", "ihalf", "success"]
+    with pytest.raises(ValueError):
+        batchfit.fit_batch([], "line")
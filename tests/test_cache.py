@@ -0,0 +1,33 @@
+from dissonance.analysis.cache import ResultCache, selection_key
+
+
+def test_lru_eviction_within_budget():
+    cache = ResultCache(maxbytes=100)
+    cache.put("a", 1, 40)
+    cache.put("b", 2, 40)
+    assert cache.get("a") == 1
+
+    # B IS LEAST RECENTLY USED
+    cache.put("c", 3, 40)
+    assert "b" not in cache and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.nbytes == 80
+
+    assert not cache.put("d", 4, 101)
+    assert len(cache) == 2
+
+    cache.put("a", 5, 10)
+    assert cache.get("a") == 5 and cache.nbytes == 50
+
+
+def test_token_mismatch_drops_entry():
+    cache = ResultCache()
+    cache.put("a", 1, 10, token=(0, b"\x01"))
+    assert cache.get("a", (0, b"\x01")) == 1
+    assert cache.get("a", (1, b"\x01")) is None
+    assert "a" not in cache and cache.nbytes == 0
+
+
+def test_selection_key_ignores_node_order():
+    paths = [dict(Name="Tree", cellname="c0"), dict(Name="Tree", cellname="c1")]
+    assert selection_key("cellname", paths) == selection_key("cellname", paths[::-1])
+    assert selection_key("cellname", paths) != selection_key("cellname", paths, False)
@@ -0,0 +1,134 @@
+import h5py
+import numpy as np
+import pytest
+
+from dissonance.io import SymphonyConverter, SymphonyIO
+from dissonance.io.symphony.response import Response
+from .conftest import write_symphony_file
+
+
+@pytest.fixture
+def symphony_file(tmp_path):
+    folder = tmp_path / "GG2 KO"
+    folder.mkdir()
+    return write_symphony_file(folder / "2022-01-15A.h5")
+
+
+def assert_same_file(path, other):
+    with h5py.File(path, "r") as f, h5py.File(other, "r") as g:
+        assert sorted(f["experiment"]) == sorted(g["experiment"])
+        for name in f["experiment"]:
+            grp, ogrp = f[f"experiment/{name}"], g[f"experiment/{name}"]
+            assert dict(grp.attrs) == dict(ogrp.attrs)
+            assert sorted(grp) == sorted(ogrp)
+            for key in ("Amp1", "Spikes"):
+                if key in grp:
+                    assert np.array_equal(grp[key][:], ogrp[key][:])
+
+
+@pytest.mark.parametrize("nprocesses", [1, 2])
+def test_convert_matches_to_h5(tmp_path, symphony_file, nprocesses):
+    expected = tmp_path / "serial.h5"
+    SymphonyIO(symphony_file).to_h5(expected)
+
+    outputpath = tmp_path / "converted.h5"
+    progress = []
+    nepochs = SymphonyConverter(
+        symphony_file, nprocesses=nprocesses, chunksize=4,
+        progress=lambda done, total: progress.append((done, total))
+    ).convert(outputpath)
+
+    assert nepochs == 12
+    assert progress[-1] == (12, 12)
+    assert_same_file(outputpath, expected)
+    with h5py.File(outputpath, "r") as f:
+        assert all(grp["Amp1"].attrs["units"] == "pA" for grp in f["experiment"].values())
+
+
+def test_convert_resumes(tmp_path, symphony_file):
+    outputpath = tmp_path / "converted.h5"
+    SymphonyConverter(symphony_file, nprocesses=1).convert(outputpath)
+
+    # SIMULATE AN INTERRUPTED CONVERSION
+    with h5py.File(outputpath, "r+") as f:
+        experiment = f["experiment"]
+        name = sorted(experiment)[0]
+        experiment.move(name, name + ".partial")
+
+    nepochs = SymphonyConverter(symphony_file, nprocesses=1).convert(outputpath)
+    assert nepochs == 1
+
+    with h5py.File(outputpath, "r") as f:
+        assert name in f["experiment"]
+        assert len(f["experiment"]) == 12
+
+
+def test_convert_only_changed_epochs(tmp_path, symphony_file):
+    outputpath = tmp_path / "converted.h5"
+    SymphonyConverter(symphony_file, nprocesses=1).convert(outputpath)
+    assert SymphonyConverter(symphony_file, nprocesses=1).convert(outputpath) == 0
+
+    with h5py.File(symphony_file, "r+") as f:
+        epochs = f["experiment-0000/epochGroups/epochGroup-0000/epochBlocks"]
+        epochs = epochs["edu.wisc.sinhalab.protocols.LedPulse-0000/epochs"]
+        epochs["epoch-0000/protocolParameters"].attrs["ndf"] = 2.0
+
+    assert SymphonyConverter(symphony_file, nprocesses=1).convert(outputpath) == 1
+    with h5py.File(outputpath, "r") as f:
+        assert sum(grp.attrs["ndf"] == 2.0 for grp in f["experiment"].values()) == 1
+
+
+def test_values_only_checksummed_when_metadata_matches(tmp_path, symphony_file, monkeypatch):
+    outputpath = tmp_path / "converted.h5"
+    SymphonyConverter(symphony_file, nprocesses=1).convert(outputpath)
+
+    with h5py.File(symphony_file, "r+") as f:
+        epochs = f["experiment-0000/epochGroups/epochGroup-0000/epochBlocks"]
+        epochs = epochs["edu.wisc.sinhalab.protocols.LedPulse-0000/epochs"]
+        epochs["epoch-0000/protocolParameters"].attrs["ndf"] = 2.0
+        # SAME SHAPE AND ATTRIBUTES, DIFFERENT VALUES
+        data = next(iter(epochs["epoch-0001/responses"].values()))["data"]
+        values = data[:]
+        values["quantity"] += 1.0
+        data[...] = values
+
+    reads = []
+    read = Response.read
+    monkeypatch.setattr(Response, "read", lambda self, *args: reads.append(self.h5name) or read(self, *args))
+
+    assert SymphonyConverter(symphony_file, nprocesses=1).convert(outputpath) == 2
+    # THE EPOCH WITH CHANGED METADATA IS READ ONCE, TO BE WRITTEN
+    changed = [name for name in reads if "epoch-0000/" in name]
+    assert len(changed) == len(set(changed))
+    assert SymphonyConverter(symphony_file, nprocesses=1).convert(outputpath) == 0
+
+
+def test_map_protocol_only_changed_epochs(tmp_path, symphony_file):
+    outputpath = tmp_path / "mapped.h5"
+    SymphonyIO(symphony_file).map_protocol("LedPulse", outputpath)
+
+    with h5py.File(outputpath, "r+") as f:
+        assert all("fingerprint" in grp.attrs for grp in f["experiment"].values())
+        for grp in f["experiment"].values():
+            grp.attrs["marker"] = True
+
+    SymphonyIO(symphony_file).map_protocol("LedPulse", outputpath)
+    with h5py.File(outputpath, "r") as f:
+        assert len(f["experiment"]) == 12
+        assert all(grp.attrs.get("marker", False) for grp in f["experiment"].values())
+
+
+def test_response_reads_numeric_field(symphony_file):
+    sio = SymphonyIO(symphony_file)
+    try:
+        buffers = dict()
+        for _, _, epoch in sio.reader():
+            for response, values in sio._read_responses(epoch, buffers):
+                data = response.group["data"][:]
+                assert response.units == "pA"
+                assert values.dtype == float
+                assert np.array_equal(values, data["quantity"])
+                assert np.shares_memory(values, buffers[response.name])
+                assert np.array_equal(response.data, values)
+    finally:
+        sio.close()
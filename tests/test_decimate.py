@@ -0,0 +1,48 @@
+import numpy as np
+from matplotlib.figure import Figure
+
+from dissonance.analysis.charting.decimate import (MINBINS, DecimatedLine,
+                                                   minmax_decimate,
+                                                   minmax_indices)
+
+
+def test_envelope_keeps_extremes_in_order():
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=100_003)
+    y[5_000], y[70_000] = 50.0, -50.0
+    x = np.arange(len(y)) - 500.0
+
+    xs, ys = minmax_decimate(x, y, 400)
+    assert len(xs) <= 2 * 400 + 2
+    assert ys.max() == 50.0 and ys.min() == -50.0
+    assert xs[0] == x[0] and xs[-1] == x[-1]
+    assert (np.diff(xs) >= 0).all()
+
+    # EVERY BIN'S MIN AND MAX ARE KEPT
+    binsize = -(-len(y) // 400)
+    for ii in (0, 123, len(y) // binsize):
+        bin = y[ii * binsize:(ii + 1) * binsize]
+        assert bin.min() in ys and bin.max() in ys
+
+
+def test_short_traces_unchanged():
+    y = np.arange(10.0)
+    assert (minmax_indices(y, 5) == np.arange(10)).all()
+
+
+def test_redecimates_on_zoom():
+    ax = Figure(figsize=(4, 3), dpi=100).add_subplot()
+    x = np.arange(200_000.0)
+    y = np.sin(x / 50.0)
+    decimated = DecimatedLine(ax, x, y)
+    full = len(decimated.line.get_xdata())
+    assert full <= 2 * max(ax.get_window_extent().width, MINBINS) + 2
+
+    # ZOOMED IN FAR ENOUGH SHOWS EVERY SAMPLE IN VIEW
+    ax.set_xlim(1_000, 1_100)
+    xs = decimated.line.get_xdata()
+    assert xs[0] == 999 and xs[-1] == 1_101
+    assert len(xs) == 103
+
+    ax.set_xlim(0, 199_999)
+    assert len(decimated.line.get_xdata()) == full
@@ -0,0 +1,60 @@
+import h5py
+import numpy as np
+import pytest
+
+from dissonance.epochtypes import SpikeEpoch, SpikeEpochs, WholeEpoch, epoch_factory
+from dissonance.io import DissonanceUpdater
+from tests.conftest import write_mapped_file
+
+
+@pytest.fixture
+def filepath(tmp_path):
+    return write_mapped_file(tmp_path / "2022-01-15A.h5", n=8, samples=4000)
+
+
+def epochs(f):
+    return [epoch_factory(f[f"experiment/{name}"]) for name in f["experiment"]]
+
+
+def test_metrics_read_back_without_traces(filepath, monkeypatch):
+    with h5py.File(filepath, "r") as f:
+        expected = [epoch.compute_derived() for epoch in epochs(f)]
+
+    assert DissonanceUpdater(filepath).derive() == 8
+    assert DissonanceUpdater(filepath).derive() == 0
+
+    def fail(*args, **kwargs):
+        raise AssertionError("response read")
+    monkeypatch.setattr(WholeEpoch, "read_trace", fail)
+    monkeypatch.setattr(SpikeEpoch, "spikes", property(fail))
+
+    with h5py.File(filepath, "r") as f:
+        loaded = epochs(f)
+        for epoch, values in zip(loaded, expected):
+            for name, val in values.items():
+                assert np.allclose(getattr(epoch, name), val)
+
+        spikes = SpikeEpochs([epoch for epoch in loaded if isinstance(epoch, SpikeEpoch)])
+        assert np.allclose(spikes.psth, np.mean([values["psth"] for values in expected if "psth" in values], axis=0))
+
+
+def test_stale_metrics_ignored(filepath):
+    DissonanceUpdater(filepath).derive()
+
+    with h5py.File(filepath, "r+") as f:
+        whole, spike = epochs(f)[:2]
+        assert whole.derived and spike.stored_psth is not None
+
+        # OTHER BIN SIZES ARE CALCULATED
+        spike.binsize = 50
+        assert spike.stored_psth is None
+        assert len(spike.psth) == 4000 // 50
+
+        # EDITED PARAMETERS CHANGE THE PEAK WINDOW
+        whole.update("celltype", "RGC\\ON-alpha")
+        assert epoch_factory(f[whole._epochpath]).derived == dict()
+        f[f"{spike._epochpath}/derived"].attrs["version"] = 0
+        assert epoch_factory(f[spike._epochpath]).derived == dict()
+
+    assert DissonanceUpdater(filepath).derive() == 2
+    assert DissonanceUpdater(filepath).derive(restart=True) == 8
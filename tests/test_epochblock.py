@@ -0,0 +1,73 @@
+import h5py
+import numpy as np
+import pytest
+from scipy.stats import sem
+
+from dissonance.epochtypes import WholeEpoch, WholeEpochs
+
+
+@pytest.fixture
+def experiment(tmp_path):
+    rng = np.random.default_rng(0)
+    with h5py.File(tmp_path / "block.h5", "w") as f:
+        experiment = f.create_group("experiment")
+        for ii, samples in enumerate([1200, 1500, 1000]):
+            grp = experiment.create_group(f"epoch{ii}.5")
+            grp.attrs.update(dict(
+                protocolname="LedPulse", tracetype="wholetrace", celltype="RGC\\OFF-transient",
+                holdingpotential="excitation", cellname="c0", lightamplitude=1.0, lightmean=0.0,
+                pretime=10.0, stimtime=10.0, tailtime=100.0, startdate=str(ii)))
+            grp.create_dataset("Amp1", data=rng.normal(loc=ii, size=samples))
+    f = h5py.File(tmp_path / "block.h5", "r")
+    yield f["experiment"]
+    f.close()
+
+
+def reference(epochs):
+    n = max(len(epoch) for epoch in epochs)
+    return np.vstack([np.pad(epoch.trace, (0, n - len(epoch))) for epoch in epochs])
+
+
+def test_read_trace_baseline_subtracted(experiment):
+    epoch = WholeEpoch(experiment["epoch0.5"])
+    vals = experiment["epoch0.5/Amp1"][:]
+    assert np.allclose(epoch.trace, vals - np.mean(vals[:100]))
+
+    buffer = np.full(2000, np.nan)
+    out = epoch.read_trace(out=buffer)
+    assert np.shares_memory(out, buffer)
+    assert np.allclose(out, epoch.trace)
+    assert np.isnan(buffer[len(epoch):]).all()
+
+
+def test_traces_match_padded_stack(experiment):
+    epochs = [WholeEpoch(experiment[name]) for name in experiment]
+    block = WholeEpochs(epochs)
+    expected = reference(block.epochs)
+
+    assert block.traces.shape == (3, 1500)
+    assert np.allclose(block.traces, expected)
+    assert np.allclose(block.trace, expected.mean(axis=0))
+    assert np.allclose(block.trace_sem, sem(expected, axis=0))
+
+
+def test_traces_cached_until_append(experiment):
+    names = list(experiment)
+    block = WholeEpochs([WholeEpoch(experiment[name]) for name in names[:2]])
+
+    traces, trace = block.traces, block.trace
+    assert block.traces is traces and block.trace is trace
+    assert not traces.flags.writeable
+
+    block.append(WholeEpoch(experiment[names[2]]))
+    assert block.traces is not traces
+    assert block.traces.shape[0] == 3
+    assert np.allclose(block.trace, reference(block.epochs).mean(axis=0))
+
+
+def test_nbytes_counts_cached_arrays(experiment):
+    block = WholeEpochs([WholeEpoch(experiment[name]) for name in experiment])
+    empty = block.nbytes
+
+    block.trace
+    assert block.nbytes == empty + block.traces.nbytes + block.trace.nbytes
@@ -0,0 +1,128 @@
+import operator
+from functools import reduce
+
+import pandas as pd
+import pytest
+
+splits = ["genotype", "lightmean", "celltype", "cellname", "lightamplitude"]
+
+
+def mask_query(frame, filters, useincludeflag):
+    """Reference query comparing full columns"""
+    dfs = []
+    for filter in filters:
+        condition = [frame[key] == val for key, val in filter.items() if key != "Name"]
+        df = frame.loc[reduce(operator.and_, condition)]
+        dfs.append(df.loc[df.include] if useincludeflag else df)
+    return pd.concat(dfs).reset_index(drop=True).drop_duplicates(keep="first")
+
+
+def nodes(node):
+    for child in node:
+        yield child
+        yield from nodes(child)
+
+
+@pytest.mark.parametrize("useincludeflag", [True, False])
+def test_query_matches_masks(epochio, useincludeflag):
+    frame = epochio.frame
+    frame.iloc[::3, frame.columns.get_loc("include")] = False
+    tree = epochio.to_tree("Test", splits)
+    groups = [node for node in nodes(tree) if node.label != "startdate"]
+
+    for ii in range(len(groups) - 1):
+        filters = [dict(node.path) for node in groups[ii:ii + 2]]
+        expected = mask_query(frame, filters, useincludeflag)
+        result = epochio.query(filters, useincludeflag=useincludeflag)
+        assert result.startdate.tolist() == expected.startdate.tolist()
+
+
+def test_query_startdate(epochio):
+    startdate = epochio.frame.startdate.iloc[0]
+    epochio.frame.iloc[0, epochio.frame.columns.get_loc("include")] = False
+
+    assert epochio.query({"startdate": startdate}).shape[0] == 1
+    assert epochio.query({"startdate": str(startdate)}).shape[0] == 1
+
+
+def test_update_moves_rows(epochio):
+    filter = {"genotype": "GG2 KO", "cellname": "20220115A_c0"}
+    nrows = epochio.query([filter]).shape[0]
+
+    epochio.update([filter], "genotype", "GG2 control")
+
+    assert epochio.query([{**filter, "genotype": "GG2 control"}]).shape[0] == nrows
+    assert epochio.query([filter]).shape[0] == 0
+
+
+def test_include_by_startdate(epochio):
+    startdates = epochio.frame.startdate.iloc[[5, 2, 7]]
+    positions = epochio.startdate_positions(
+        [str(startdates.iloc[0]), *startdates.iloc[1:], "1999-01-01 00:00:00", None])
+    assert positions.tolist() == [5, 2, 7]
+
+    epochio.set_include(startdates, False)
+    assert epochio.frame.include.sum() == len(epochio.frame) - 3
+    assert not epochio.is_included(startdates).any()
+    assert epochio.is_included(epochio.frame.startdate.iloc[[0]]).all()
+
+
+def test_set_include_by_path(epochio):
+    filters = [{"Name": "Tree", "cellname": "20220115A_c0"}, {"cellname": "20220115A_c1"}]
+    expected = epochio.frame.cellname.isin(["20220115A_c0", "20220115A_c1"]).values
+    startdate = epochio.frame.startdate[~expected].iloc[0]
+
+    positions = epochio.set_include(startdates=[startdate], filters=filters, include=False)
+    assert len(positions) == expected.sum() + 1
+    assert (~epochio.frame.include.values).sum() == expected.sum() + 1
+    assert len(epochio.query(filters)) == 0
+
+    epochio.set_include(filters=filters, include=True)
+    assert epochio.query(filters).shape[0] == expected.sum()
+
+
+def test_parse_startdates_mixed_precision():
+    from dissonance.io.dissonanceio import parse_startdates
+
+    parsed = parse_startdates(["2022-01-15 10:00:00", "2022-01-15 10:00:00.250000", None])
+    assert list(pd.to_datetime(parsed[:2])) == [
+        pd.Timestamp("2022-01-15 10:00:00"), pd.Timestamp("2022-01-15 10:00:00.25")]
+    assert pd.isna(parsed[2])
+
+
+def test_positions_while_flags_and_params_change(epochio):
+    import itertools
+    import sys
+    import threading
+
+    keys = ["genotype", "cellname", "lightamplitude", "tracetype", "celltype", "lightmean"]
+    combos = [combo for n in (1, 2, 3) for combo in itertools.combinations(keys, n)]
+    row = epochio.frame.iloc[0]
+    errors, done = [], threading.Event()
+
+    def read():
+        try:
+            while not done.is_set():
+                for combo in combos:
+                    # NEW KEY COMBINATIONS ADD INDEXES WHILE THE OTHER THREAD WALKS THEM
+                    epochio._indexes.pop(combo, None)
+                    epochio.positions([{key: row[key] for key in combo}])
+        except Exception as e:
+            errors.append(e)
+
+    # SWITCH THREADS OFTEN SO THEY INTERLEAVE INSIDE EACH CALL
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread = threading.Thread(target=read)
+    thread.start()
+    try:
+        for ii in range(20):
+            epochio.set_include(filters=[dict(cellname=row.cellname)], include=False)
+            epochio.set_include(filters=[dict(cellname=row.cellname)], include=True)
+            epochio.update([dict(cellname=row.cellname)], "genotype", ["GG2 control", "GG2 KO"][ii % 2])
+    finally:
+        done.set()
+        thread.join()
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert len(epochio.query([dict(genotype="GG2 KO", cellname=row.cellname)])) > 0
@@ -0,0 +1,120 @@
+import pytest
+from PyQt5.QtCore import QModelIndex, Qt
+from PyQt5.QtWidgets import QApplication
+
+from dissonance.viewer.epochtree import EpochTreeModel, EpochTreeWidget
+
+SPLITS = ["genotype", "cellname", "lightamplitude"]
+
+
+@pytest.fixture
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def model(app, epochio):
+    return EpochTreeModel(epochio, epochio.to_tree("Tree", SPLITS))
+
+
+def fetch(model, index):
+    while model.canFetchMore(index):
+        model.fetchMore(index)
+
+
+def test_rows_fetched_on_demand(model):
+    root = model.index(0, 0)
+    assert model.rowCount() == 1
+    assert model.hasChildren(root)
+    assert model.rowCount(root) == 0
+
+    model.BATCHSIZE = 2
+    model.fetchMore(root)
+    assert model.rowCount(root) == 1
+    genotype = model.index(0, 0, root)
+    assert model.data(genotype) == "genotype=GG2 KO"
+    assert model.parent(genotype) == root
+
+    model.fetchMore(genotype)
+    assert model.rowCount(genotype) == 2 and model.canFetchMore(genotype)
+    fetch(model, genotype)
+    assert model.rowCount(genotype) == 3
+    assert model.parent(model.index(2, 0, genotype)) == genotype
+    assert model.index(3, 0, genotype) == QModelIndex()
+
+
+def test_check_state_from_frame(model, epochio):
+    root = model.index(0, 0)
+    fetch(model, root)
+    genotype = model.index(0, 0, root)
+    fetch(model, genotype)
+    cell = model.index(0, 0, genotype)
+    node = model.node(cell)
+
+    assert model.data(cell, Qt.CheckStateRole) == Qt.Checked
+    assert model.flags(root) & Qt.ItemIsUserCheckable == 0
+
+    # UNCHECKING A GROUP EXCLUDES ITS EPOCHS AND PARTIALLY CHECKS ITS PARENT
+    assert model.setData(cell, Qt.Unchecked, Qt.CheckStateRole)
+    assert not epochio.is_included(node.leafuids).any()
+    assert epochio.frame.include.sum() == len(epochio.frame) - node.nleaves
+    assert model.data(cell, Qt.CheckStateRole) == Qt.Unchecked
+    assert model.data(genotype, Qt.CheckStateRole) == Qt.PartiallyChecked
+    assert len(epochio.query([node.path])) == 0
+
+    assert model.setData(cell, Qt.Checked, Qt.CheckStateRole)
+    assert model.data(genotype, Qt.CheckStateRole) == Qt.Checked
+    assert epochio.frame.include.all()
+
+
+def test_widget_selection(app, epochio):
+    widget = EpochTreeWidget("Tree", SPLITS, epochio)
+    model = widget.treeModel
+    root = model.index(0, 0)
+    fetch(model, root)
+
+    requests = []
+    widget.newRequest.connect(lambda *args: requests.append(args))
+    widget.setCurrentIndex(model.index(0, 0, root))
+
+    assert [node.uid for node in widget.selectedNodes] == ["GG2 KO"]
+    level, filters, useincludeflag = requests[-1]
+    assert level == "genotype" and useincludeflag
+    assert len(epochio.query(filters)) == len(epochio.frame)
+
+
+def test_bulk_toggle_signals_changed_rows(app, epochio):
+    widget = EpochTreeWidget("Tree", SPLITS, epochio)
+    model = widget.treeModel
+    root = model.index(0, 0)
+    fetch(model, root)
+    genotype = model.index(0, 0, root)
+    fetch(model, genotype)
+
+    cells = [model.index(row, 0, genotype) for row in range(2)]
+    fetch(model, cells[0])
+
+    changes = []
+    model.dataChanged.connect(lambda first, last, roles: changes.append((first, last, list(roles))))
+    for index in cells:
+        widget.selectionModel().select(index, widget.selectionModel().Select)
+
+    widget.toggleSelected()
+    nodes = [model.node(index) for index in cells]
+    assert epochio.frame.include.sum() == len(epochio.frame) - sum(node.nleaves for node in nodes)
+    assert model.data(genotype, Qt.CheckStateRole) == Qt.PartiallyChecked
+
+    # ONE SIGNAL PER RUN OF SIBLINGS - THE GENOTYPE, BOTH CELLS AND THE FIRST CELL'S CHILDREN
+    spans = {(first.row(), last.row(), model.node(first.parent()).uid) for first, last, _ in changes}
+    assert spans == {
+        (0, 0, "Tree"), (0, 1, "GG2 KO"),
+        (0, model.rowCount(cells[0]) - 1, nodes[0].uid)}
+    assert all(Qt.CheckStateRole in roles for _, _, roles in changes)
+
+    widget.toggleSelected()
+    assert len(changes) == 6
+    assert epochio.frame.include.all()
+
+    # UNCHECKING THE ROOT'S ONLY CHILD EXCLUDES EVERYTHING
+    model.setData(genotype, Qt.Unchecked, Qt.CheckStateRole)
+    assert not epochio.frame.include.any()
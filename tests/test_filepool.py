@@ -0,0 +1,117 @@
+import multiprocessing as mp
+import threading
+
+import h5py
+import numpy as np
+
+from dissonance.io import DissonanceReader, FilePool
+
+PARAMNAMES = [
+    "protocolname", "celltype", "genotype", "cellname", "tracetype", "startdate"]
+
+
+def count_epochs(path) -> int:
+    with h5py.File(path, "r") as f:
+        return len(f["experiment"])
+
+
+def test_pool_caps_open_files(mapped_dir):
+    paths = sorted(mapped_dir.glob("*.h5"))
+    pool = FilePool(paths, maxopen=1)
+
+    experiment = pool[paths[0]]
+    name = next(iter(experiment))
+    pool[paths[1]]
+    assert pool.nopen == 1
+    assert not pool.is_open(paths[0]) and not experiment
+
+    assert name in pool[paths[0]]
+    pool.close()
+    assert pool.nopen == 0
+
+
+def test_lazy_epochs_reopen_evicted_files(mapped_dir):
+    epochio = DissonanceReader([mapped_dir]).to_epoch_io(PARAMNAMES, nprocesses=1)
+    epochio.files.maxopen = 1
+    frame = epochio.query([dict(protocolname="LedPulse")])
+    traces = [epoch.trace.copy() for epoch in frame.epoch]
+
+    # EVERY FILE WAS CLOSED SINCE THE EPOCHS WERE READ
+    epochio.files.close()
+    for epoch, trace in zip(frame.epoch, traces):
+        assert np.array_equal(epoch.trace, trace)
+    assert epochio.files.nopen == 1
+
+
+def test_other_processes_read_while_open(epochio, mapped_dir):
+    path = sorted(mapped_dir.glob("*.h5"))[0]
+    epochio.query([dict(protocolname="LedPulse")])
+    assert epochio.files.is_open(path)
+
+    with mp.get_context("spawn").Pool(1) as p:
+        assert p.apply(count_epochs, (path,)) == 20
+
+
+def test_update_writes_through_short_lived_handle(epochio):
+    filters = [dict(cellname="20220115A_c0")]
+    frame = epochio.query(filters)
+    epochio.update(filters, "genotype", "GA1 KO")
+
+    assert not any(epochio.files.is_open(path) for path in epochio.files)
+    for exppath, number in frame[["exppath", "number"]].values:
+        with h5py.File(exppath, "r") as f:
+            assert f[f"experiment/epoch{number}"].attrs["genotype"] == "GA1 KO"
+
+    # EPOCHS QUERIED BEFORE THE UPDATE READ THE NEW VALUE FROM THE REOPENED FILE
+    assert all(epoch.genotype == "GA1 KO" for epoch in frame.epoch)
+    assert set(epochio.query(filters).genotype) == {"GA1 KO"}
+
+
+def test_files_being_read_stay_open(mapped_dir):
+    paths = sorted(mapped_dir.glob("*.h5"))
+    pool = FilePool(paths, maxopen=1)
+
+    with pool.reading(paths):
+        experiments = [pool[path] for path in paths]
+        assert pool.nopen == len(paths)
+        assert all(experiments)
+    # BACK UNDER THE CAP ONCE READ
+    assert pool.nopen == 1 and pool.is_open(paths[-1])
+
+
+def test_writable_waits_for_readers(mapped_dir):
+    path = sorted(mapped_dir.glob("*.h5"))[0]
+    pool = FilePool([path])
+    reading, written = threading.Event(), threading.Event()
+
+    def write():
+        reading.wait()
+        with pool.writable(path) as experiment:
+            experiment.attrs["marker"] = True
+        written.set()
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    with pool.reading([path]):
+        experiment = pool[path]
+        reading.set()
+        assert not written.wait(0.2)
+        # STILL READABLE WHILE THE WRITER WAITS
+        assert len(experiment) == 20
+    thread.join()
+    assert written.is_set() and pool.nopen == 0
+
+
+def test_lazy_epochs_rebuilt_only_when_reopened(mapped_dir):
+    epochio = DissonanceReader([mapped_dir]).to_epoch_io(PARAMNAMES, nprocesses=1)
+    epochio.files.maxopen = 1
+    frame = epochio.query([dict(protocolname="LedPulse")])
+    assert frame.exppath.nunique() > 1
+
+    # SELECTION ACROSS MORE FILES THAN maxopen, EPOCHS BUILT ONCE WHILE READ
+    with epochio.files.reading(frame.exppath.unique()):
+        built = [epoch.materialize() for epoch in frame.epoch]
+        assert all(epoch.materialize() is ref for epoch, ref in zip(frame.epoch, built))
+
+    epochio.files.close()
+    assert all(epoch.materialize() is not ref for epoch, ref in zip(frame.epoch, built))
@@ -0,0 +1,85 @@
+import h5py
+import numpy as np
+import pytest
+
+from dissonance.io import (LAYOUTS, DissonanceReader, ParamsIndex,
+                           StorageLayout, SymphonyConverter, migrate)
+from .conftest import write_mapped_file, write_symphony_file
+
+
+@pytest.mark.parametrize("name", list(LAYOUTS))
+def test_migrate_keeps_epochs(tmp_path, name):
+    source = write_mapped_file(tmp_path / "2022-01-15A.h5")
+    with h5py.File(source, "r+") as f:
+        grp = next(iter(f["experiment"].values()))
+        grp.create_group("stimuli/Green LED").attrs["amplitude"] = 1.0
+        grp["Amp1"].attrs["path"] = "/response"
+
+    outputpath = tmp_path / "migrated" / "2022-01-15A.h5"
+    outputpath.parent.mkdir()
+    assert migrate(source, LAYOUTS[name], outputpath) == 20
+    assert not ParamsIndex(outputpath).is_stale
+
+    layout = LAYOUTS[name]
+    with h5py.File(source, "r") as f, h5py.File(outputpath, "r") as g:
+        assert sorted(f["experiment"]) == sorted(g["experiment"])
+        for epochname, grp in f["experiment"].items():
+            ogrp = g["experiment"][epochname]
+            assert dict(grp.attrs) == dict(ogrp.attrs)
+            assert sorted(grp) == sorted(ogrp)
+
+            assert ogrp["Amp1"].dtype == np.dtype(layout.tracedtype)
+            assert ogrp["Amp1"].compression == layout.compression
+            assert np.allclose(grp["Amp1"][:], ogrp["Amp1"][:], rtol=1e-6)
+            if "Spikes" in grp:
+                assert ogrp["Spikes"].dtype == np.dtype(layout.spikedtype)
+                assert np.array_equal(grp["Spikes"][:], ogrp["Spikes"][:])
+
+        first = next(iter(g["experiment"].values()))
+        assert first["stimuli/Green LED"].attrs["amplitude"] == 1.0
+        assert first["Amp1"].attrs["path"] == "/response"
+
+
+def test_migrate_in_place_reads_the_same(tmp_path):
+    write_mapped_file(tmp_path / "2022-01-15A.h5")
+    paramnames = ["protocolname", "cellname", "tracetype", "startdate"]
+    filters = [dict(protocolname="LedPulse")]
+
+    def read():
+        frame = DissonanceReader([tmp_path]).to_epoch_io(paramnames, nprocesses=1).query(filters)
+        return [
+            (epoch.trace, epoch.spikes if epoch.tracetype == "spiketrace" else None)
+            for epoch in frame.epoch]
+
+    expected = read()
+    migrate(tmp_path / "2022-01-15A.h5", LAYOUTS["float32"])
+    assert not list(tmp_path.glob("*.migrating"))
+
+    for (trace, spikes), (othertrace, otherspikes) in zip(expected, read()):
+        assert othertrace.dtype == float
+        assert np.allclose(trace, othertrace, rtol=1e-6)
+        if spikes is not None:
+            assert np.array_equal(spikes, otherspikes)
+
+
+def test_dataset_kwargs_equal_chunks():
+    layout = StorageLayout(chunksamples=1000, compression="gzip", level=1, shuffle=True)
+    kwargs = layout.dataset_kwargs(2500, "float64")
+    assert kwargs["chunks"] == (834,)
+    assert kwargs["compression_opts"] == 1
+    assert LAYOUTS["contiguous"].dataset_kwargs(2500, "float64") == dict(dtype="float64")
+    assert "chunks" not in layout.dataset_kwargs(0, "int32")
+
+
+def test_convert_with_layout(tmp_path):
+    folder = tmp_path / "GG2 KO"
+    folder.mkdir()
+    symphony_file = write_symphony_file(folder / "2022-01-15A.h5")
+
+    outputpath = tmp_path / "converted.h5"
+    SymphonyConverter(symphony_file, nprocesses=1, layout=LAYOUTS["lzf"]).convert(outputpath)
+    with h5py.File(outputpath, "r") as f:
+        for grp in f["experiment"].values():
+            assert grp["Amp1"].compression == "lzf"
+            if "Spikes" in grp:
+                assert grp["Spikes"].dtype.kind == "i"
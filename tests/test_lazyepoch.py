@@ -0,0 +1,26 @@
+import numpy as np
+
+from dissonance import epochtypes as et
+
+
+def test_query_lazy_matches_eager(epochio):
+    eager = epochio.query(None, lazy=False)
+    lazy = epochio.query(None)
+
+    assert eager.shape == lazy.shape
+    assert not any(epoch.is_materialized for epoch in lazy.epoch)
+
+    for expected, epoch in zip(eager.epoch, lazy.epoch):
+        assert isinstance(epoch, et.IEpoch)
+        assert epoch.__class__ is type(expected)
+        assert epoch.number == expected.number
+        assert epoch.startdate == expected.startdate
+        assert np.array_equal(epoch.trace, expected.trace)
+
+
+def test_groupby_lazy(epochio):
+    frame = epochio.query(None)
+    frame = frame.loc[frame.tracetype == "spiketrace"]
+
+    grps = et.groupby(frame, ["cellname"])
+    assert all(isinstance(epochs, et.SpikeEpochs) for epochs in grps.epoch)
@@ -0,0 +1,63 @@
+import h5py
+import numpy as np
+import pytest
+
+from dissonance.io.paramsindex import ParamsIndex
+
+
+@pytest.fixture
+def mapped(tmp_path):
+    filepath = tmp_path / "2022-01-15A.h5"
+    with h5py.File(filepath, "w") as f:
+        experiment = f.create_group("experiment")
+        for ii in range(6):
+            grp = experiment.create_group(f"epoch{1000 + ii}")
+            grp.attrs["protocolname"] = "LedPulse"
+            grp.attrs["lightamplitude"] = float(ii)
+            grp.attrs["cellname"] = f"c{ii % 2}"
+            grp.attrs["arr"] = np.arange(3)
+            if ii % 3 == 0:
+                grp.attrs["extra"] = ii
+    return filepath
+
+
+def test_index_matches_walk(mapped):
+    index = ParamsIndex(mapped)
+    frame = index.load()
+
+    with h5py.File(mapped, "r") as f:
+        expected = index.build(f["experiment"])
+
+    assert index.path.exists()
+    assert index.unindexed == ["arr"]
+    assert list(frame.number) == list(expected.number)
+    assert list(frame.cellname) == list(expected.cellname)
+    assert np.allclose(frame.lightamplitude, expected.lightamplitude.astype(float))
+    assert frame.extra.isna().tolist() == expected.extra.isna().tolist()
+
+
+def test_index_stale_after_write(mapped):
+    index = ParamsIndex(mapped)
+    index.write()
+    assert not index.is_stale
+
+    with h5py.File(mapped, "r+") as f:
+        f["experiment/epoch1000"].attrs["genotype"] = "GG2 KO"
+    assert index.is_stale
+    assert "genotype" in index.load().columns
+
+
+def test_index_in_memory_when_unwritable(mapped, monkeypatch):
+    index = ParamsIndex(mapped)
+    expected = index.load()
+    index.path.unlink()
+
+    def readonly(*args, **kwargs):
+        raise PermissionError("read only datastore")
+    monkeypatch.setattr("tempfile.mkstemp", readonly)
+
+    frame = index.load()
+    assert not index.path.exists()
+    assert index.unindexed == ["arr"]
+    assert frame.equals(expected)
+    assert not list(mapped.parent.glob("*.tmp"))
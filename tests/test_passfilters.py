@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from scipy import fft
+
+from dissonance.analysis_functions import passfilters as pf
+
+DT = 1e-4
+
+
+def complex_high_pass(X, F, dt):
+    """Full complex FFT filter the real FFT masks reproduce"""
+    df = round(F * dt * X.shape[-1])
+    trans = fft.fft(X, axis=-1)
+    trans[..., 0:df] = 0
+    trans[..., -df:] = 0
+    return fft.ifft(trans, axis=-1).real
+
+
+def complex_low_pass(X, F, dt):
+    df = round(F * dt * X.shape[-1])
+    trans = fft.fft(X, axis=-1)
+    trans[..., df:-df] = 0
+    return fft.ifft(trans, axis=-1).real
+
+
+@pytest.mark.parametrize("L", [2000, 2001])
+@pytest.mark.parametrize("F", [70, 500, 4999])
+def test_matches_complex_fft(L, F):
+    X = np.random.default_rng(0).normal(size=(4, L))
+    assert np.allclose(pf.high_pass_filter(X, F, DT), complex_high_pass(X, F, DT))
+    assert np.allclose(pf.low_pass_filter(X, F, DT), complex_low_pass(X, F, DT))
+
+
+def test_band_pass_shares_transform():
+    X = np.random.default_rng(1).normal(size=(3, 5000))
+    band, high = pf.band_pass_filters(X, [(70, 500), (500, None)], DT, axis=1)
+
+    assert np.allclose(band, complex_low_pass(complex_high_pass(X, 70, DT), 500, DT))
+    assert np.allclose(band, pf.band_pass_filter(X, 70, 500, DT))
+    assert np.allclose(high, pf.high_pass_filter(X, 500, DT))
+    # TIME ALONG THE FIRST AXIS
+    assert np.allclose(pf.high_pass_filter(X.T, 500, DT, axis=0), high.T)
+
+
+def test_masks_cached():
+    pf._mask.cache_clear()
+    X = np.ones((2, 1000))
+    pf.high_pass_filter(X, 500, DT)
+    pf.high_pass_filter(X, 500, DT)
+    assert pf._mask.cache_info().hits == 1
+    assert not pf._mask(1000, 500, None, DT).flags.writeable
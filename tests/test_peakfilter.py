@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from dissonance import epochtypes as et
+from dissonance.analysis_functions import filter_peaky_things as fp
+
+
+def pandas_filter(trace, delta=0.10, clip_range=3000, span=10):
+    """Series based FBEWMA filter the array version reproduces"""
+    clipped = pd.Series(np.where(np.abs(trace) > clip_range, np.nan, trace))
+    fwd = clipped.ewm(span=span).mean()
+    bwd = clipped[::-1].ewm(span=span).mean()[::-1]
+    fbewma = (fwd.values + bwd.values) / 2
+    removed = pd.Series(np.where(np.abs(clipped - fbewma) > delta, np.nan, clipped))
+    return removed.interpolate().fillna(0.0).values
+
+
+def spikey_traces(n, L, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.cumsum(rng.normal(scale=0.05, size=(n, L)), axis=1)
+    X[:, ::37] += 5.0
+    X[:, :3] = 5000.0
+    X[:, L // 2:L // 2 + 4] = -4000.0
+    return X
+
+
+def test_matches_pandas():
+    X = spikey_traces(3, 1000)
+    X[1, -5:] = np.nan
+    for trace, filtered in zip(X, fp.filter_peaks(X)):
+        assert np.allclose(filtered, pandas_filter(trace))
+
+    frame = fp.PeakFilter.filter_peaky_things(X[0])
+    assert list(frame.columns) == ["x", "y_spikey", "y_interpolated"]
+    assert np.allclose(frame.y_interpolated, pandas_filter(X[0]))
+
+
+def test_ewma_and_interpolate_match_pandas():
+    x = spikey_traces(1, 200)[0]
+    x[[0, 1, 50, 51, 52, 199]] = np.nan
+    series = pd.Series(x)
+    assert np.allclose(fp.ewma(x, 10), series.ewm(span=10).mean(), equal_nan=True)
+    assert np.allclose(fp.interpolate_gaps(x), series.interpolate(), equal_nan=True)
+
+
+def test_batch_along_axis():
+    X = spikey_traces(4, 500)
+    filtered = fp.filter_peaks(X, axis=1)
+    assert np.allclose(fp.filter_peaks(X.T, axis=0).T, filtered)
+    assert np.allclose(filtered[2], fp.filter_peaks(X[2]))
+
+
+def test_from_h5_filters_block(epochio):
+    frame = epochio.query([dict(tracetype="wholetrace")])
+    block = et.WholeEpochs(list(frame.epoch))
+
+    peakfilter = fp.PeakFilter.from_h5(block, delta=0.5)
+    assert peakfilter.trace_filtered.shape == block.traces.shape
+    assert np.allclose(peakfilter.trace_filtered[0], pandas_filter(block.traces[0], delta=0.5))
+
+    single = fp.PeakFilter.from_h5(block.epochs[0]._epochgrp, delta=0.5)
+    assert np.allclose(single.trace_filtered, peakfilter.trace_filtered[0])
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from dissonance import epochtypes as et
+from dissonance.analysis_functions.psth import calculate_psths, calculate_psths_multi
+
+
+def dense_psth(spikes, length, stimtime, inc):
+    """Reference - count spikes in a dense array of the trace length"""
+    x = np.zeros(length)
+    x[spikes] = 1
+    psth = np.array([np.sum(x[ii:ii + inc]) for ii in range(0, length, inc)])
+    return 100 * (psth - np.mean(psth[:int(stimtime // inc)]))
+
+
+@pytest.fixture
+def spiketrains():
+    rng = np.random.default_rng(0)
+    lengths = [20000, 19950, 15000]
+    spikes = [np.sort(rng.choice(length, 200, replace=False)) for length in lengths]
+    stimtimes = [500.0, 5000.0, 1000.0]
+    return spikes, lengths, stimtimes
+
+
+@pytest.mark.parametrize("inc", [50, 100, 250])
+def test_psths_match_dense(spiketrains, inc):
+    psths = calculate_psths(*spiketrains, inc)
+    assert psths.shape == (3, 20000 // inc)
+
+    for psth, (spikes, length, stimtime) in zip(psths, zip(*spiketrains)):
+        expected = dense_psth(spikes, length, stimtime, inc)
+        assert np.allclose(psth[:len(expected)], expected)
+        assert np.all(psth[len(expected):] == 0)
+
+
+def test_psths_multi(spiketrains):
+    psths = calculate_psths_multi(*spiketrains, [50, 100, 250])
+    for inc, values in psths.items():
+        assert np.allclose(values, calculate_psths(*spiketrains, inc))
+
+
+class NoRead:
+    """Dataset stand in that only knows its shape"""
+
+    def __init__(self, shape):
+        self.shape = shape
+
+    def __getitem__(self, val):
+        raise AssertionError("trace read")
+
+
+def test_spike_epochs_psths_from_spikes(epochio):
+    frame = epochio.query({"tracetype": "spiketrace"}, lazy=False)
+    epochs = et.SpikeEpochs(list(frame.epoch.values))
+    for epoch in epochs:
+        epoch._response_ds = NoRead(epoch._response_ds.shape)
+
+    assert epochs.psths.shape == (len(epochs), 20)
+    assert np.allclose(epochs.psth, epochs.psths.mean(axis=0))
+
+    epochs.binsize = 50
+    assert epochs.psths.shape == (len(epochs), 40)
+    assert epochs[0].psth.shape == (40,)
@@ -0,0 +1,163 @@
+import numpy as np
+import pytest
+from scipy import fft
+from sklearn.cluster import KMeans
+
+from dissonance.analysis_functions import spike_detection as sd
+from dissonance.analysis_functions.spike_detection import (
+    detect_spikes, detect_spikes_batch, get_peaks, get_rebounds, two_means)
+
+
+def spike_trace(rng, nspikes, amplitude=20.0, samples=20000):
+    trace = rng.normal(scale=0.5, size=samples) + np.cumsum(rng.normal(scale=0.01, size=samples))
+    for idx in rng.choice(samples - 20, nspikes, replace=False) + 10:
+        trace[idx - 1:idx + 3] -= amplitude * np.array([0.3, 1.0, 0.4, 0.1])
+    return trace
+
+
+@pytest.fixture
+def traces():
+    rng = np.random.default_rng(0)
+    return np.vstack([
+        spike_trace(rng, nspikes, amplitude)
+        for nspikes in (0, 2, 30, 80)
+        for amplitude in (0.5, 20.0)])
+
+
+def baseline_high_pass(X, F, dt):
+    """Reference - full complex FFT high pass"""
+    df = round(F * dt * len(X))
+    trans = fft.fft(X)
+    trans[0:df] = 0
+    trans[-df:] = 0
+    return fft.ifft(trans).real
+
+
+def baseline_detect_spikes(R):
+    """Reference - per trace detector with KMeans, before batching"""
+    trace = baseline_high_pass(R, sd.HIGHPASSCUT_SPIKES, sd.SAMPLE_INTERVAL)
+    trace[:20] = R[:20] - np.mean(R[:20])
+    if abs(max(trace)) > abs(min(trace)):
+        trace = -trace
+
+    peaks, peak_times = get_peaks(trace, -1)
+    peak_times = peak_times[np.flatnonzero(peaks < 0)]
+
+    # REMOVE SINGLE SAMPLE PEAKS
+    _, peak_times_res_even = get_peaks(trace[0::2], -1)
+    _, peak_times_res_odd = get_peaks(trace[1::2], -1)
+    peak_times = np.array(sorted(set(peak_times) & set(
+        [*(peak_times_res_even * 2), *(2 * peak_times_res_odd + 1)])), dtype=int)
+    peaks = trace[peak_times]
+
+    sp = violation_idx = None
+    if len(peaks):
+        rebounds = loop_rebounds(peak_times, trace, sd.SEARCH_INTERVAL_POINTS)
+        peak_amps = abs(peaks) + rebounds
+
+        if np.max(R) > np.min(R):
+            init = np.array([[np.percentile(peak_amps, q=0.5)], [peak_amps.max()]])
+            clusters = KMeans(
+                n_clusters=2, init=init, n_init=1,
+                max_iter=10000).fit(peak_amps.reshape(-1, 1))
+            idx, centroids = clusters.labels_, clusters.cluster_centers_
+
+            m_idx = np.where(centroids == max(centroids))[0]
+            spike_ind_log = np.where(idx == m_idx)[0]
+
+            spike_peaks = peak_amps[np.flatnonzero(idx)]
+            nonspike_peaks = peak_amps[np.flatnonzero(idx == 0)]
+            nonspike_idx = np.where(idx == 0)[0]
+            sigma = np.sqrt(nonspike_peaks).std()
+
+            no_four_sigma_difference = (
+                np.mean(np.sqrt(spike_peaks)) < (np.mean(np.sqrt(nonspike_peaks)) + 4 * sigma))
+            if (not no_four_sigma_difference) and len(spike_ind_log) > 0:
+                sp = peak_times[spike_ind_log]
+                max_noise_peak_idx = np.flatnonzero(nonspike_peaks == max(nonspike_peaks))
+                violation_idx = peak_times[nonspike_idx[max_noise_peak_idx]]
+                if len(sp) == 1:
+                    sp = violation_idx = None
+    return sp, violation_idx
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_batch_matches_baseline(traces):
+    results = detect_spikes_batch(traces)
+    assert len(results) == traces.shape[0]
+
+    for trace, (spikes, violation) in zip(traces, results):
+        expected_spikes, expected_violation = baseline_detect_spikes(trace)
+        if expected_spikes is None:
+            assert spikes is None and violation is None
+        else:
+            assert np.array_equal(spikes, expected_spikes)
+            assert np.array_equal(violation, expected_violation)
+
+    single = detect_spikes(traces[5])
+    assert np.array_equal(single[0], results[5][0])
+
+
+def test_batch_finds_spikes(traces):
+    nspikes = [None if spikes is None else len(spikes) for spikes, _ in detect_spikes_batch(traces)]
+    # SPIKES CAN LAND ON TOP OF EACH OTHER
+    assert nspikes[0] is None
+    assert 28 <= nspikes[5] <= 30
+    assert 76 <= nspikes[7] <= 80
+
+
+def lloyd(X, init, max_iter=10000):
+    centroids = np.array(init, dtype=float)
+    labels = None
+    for _ in range(max_iter):
+        new = np.abs(X - centroids[1]) < np.abs(X - centroids[0])
+        if labels is not None and np.array_equal(new, labels):
+            break
+        labels = new
+        centroids = np.array([X[~labels].mean(), X[labels].mean()])
+    return labels
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_two_means_matches_lloyd(seed):
+    rng = np.random.default_rng(seed)
+    X = np.concatenate([rng.gamma(2.0, size=500), rng.normal(12.0, size=rng.integers(2, 40))])
+    init = (np.percentile(X, q=0.5), X.max())
+
+    assert np.array_equal(two_means(X, init), lloyd(X, init))
+
+
+def test_two_means_single_value():
+    assert two_means(np.ones(5), (1.0, 1.0)) is None
+
+
+def loop_rebounds(peaks_idx, trace_in, search_interval):
+    """Reference - window per peak"""
+    trace = abs(trace_in)
+    peaks = trace[peaks_idx]
+    r = np.zeros(peaks.shape)
+
+    for i, peak in enumerate(peaks):
+        end_point = min(peaks_idx[i] + search_interval, len(trace)) + 1
+        next_min, _ = get_peaks(trace[peaks_idx[i]:end_point], -1)
+        next_min = peak if len(next_min) == 0 else next_min[0]
+
+        next_max, _ = get_peaks(trace[peaks_idx[i]:end_point], 1)
+        next_max = 0 if len(next_max) == 0 else next_max[0]
+
+        r[i] = 0 if next_min < peak else next_max
+    return r
+
+
+@pytest.mark.parametrize("search_interval", [1, 2, 10, 50])
+def test_rebounds_match_loop(traces, search_interval):
+    rng = np.random.default_rng(search_interval)
+    for trace in traces:
+        peaks_idx = np.sort(rng.choice(len(trace), 500, replace=False))
+        # PEAKS AT THE END OF THE TRACE HAVE TRUNCATED WINDOWS
+        peaks_idx = np.concatenate([peaks_idx, np.arange(len(trace) - search_interval - 2, len(trace))])
+        peaks_idx = np.unique(np.clip(peaks_idx, 0, len(trace) - 1))
+
+        assert np.array_equal(
+            get_rebounds(peaks_idx, trace, search_interval),
+            loop_rebounds(peaks_idx, trace, search_interval))
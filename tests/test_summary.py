@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from dissonance.analysis import summary
+from dissonance.analysis_functions import HillEquation, WeberEquation
+
+PARAMNAMES = [
+    "led", "protocolname", "celltype", "genotype", "cellname",
+    "lightmean", "lightamplitude", "tracetype", "startdate", "holdingpotential"]
+
+
+def test_cell_and_genotype_tables(mapped_dir, tmp_path):
+    params = summary.load_params(list(mapped_dir.glob("*.h5")), PARAMNAMES, nprocesses=1)
+    tables = summary.summarize(params, nprocesses=1)
+
+    cells = tables["cells"]
+    assert cells.nepochs.sum() == len(params)
+    assert set(cells.cellname) == set(params.cellname)
+    assert cells.loc[cells.tracetype == "wholetrace", "gain"].notnull().all()
+    assert cells.loc[cells.tracetype == "spiketrace", "gain"].isnull().all()
+
+    genotypes = tables["genotypes"]
+    keys = ["tracetype", "lightmean", "lightamplitude"]
+    expected = cells.groupby(keys).peakamplitude.mean()
+    assert np.allclose(genotypes.set_index(keys).peakamplitude.loc[expected.index], expected)
+
+    # SAME TABLES FROM WORKER PROCESSES
+    parallel = summary.summarize(params, nprocesses=2)
+    pd.testing.assert_frame_equal(parallel["cells"], cells)
+
+    paths = summary.write_tables(tables, tmp_path / "out", "Test")
+    assert [path.name for path in paths] == [
+        "Test_cells.csv", "Test_cellfits.csv", "Test_genotypes.csv", "Test_genotypefits.csv"]
+    assert len(pd.read_csv(paths[0])) == len(cells)
+
+
+def test_excluded_startdates(mapped_dir, tmp_path):
+    paths = list(mapped_dir.glob("*.h5"))
+    params = summary.load_params(paths, PARAMNAMES, nprocesses=1)
+    filterpath = tmp_path / "unchecked.csv"
+    params[["startdate"]].iloc[:3].to_csv(filterpath, index=False)
+
+    assert len(summary.load_params(paths, PARAMNAMES, filterpath=filterpath, nprocesses=1)) == len(params) - 3
+    assert len(summary.load_params(paths, PARAMNAMES, protocols=["Other"], nprocesses=1)) == 0
+
+
+def test_fits():
+    X = np.array([0.5, 1.0, 2.0, 4.0, 8.0, 16.0])
+    Y = -HillEquation(2.0, 0.0, 100.0, 3.0)(X)
+    fit = summary.fit_hill(X, Y)
+    assert fit["model"] == "hill" and fit["r2"] > 0.99
+    assert np.isclose(fit["xhalf"], 3.0, rtol=1e-3)
+    assert summary.fit_hill(X[:3], Y[:3]) is None
+
+    lightmeans = np.array([0.0, 10.0, 100.0, 1000.0])
+    gains = WeberEquation(50.0)(lightmeans) * 4
+    fit = summary.fit_weber(lightmeans, np.array([1.0, 10.0, 100.0, 1000.0]), gains)
+    assert np.isclose(fit["beta"], 50.0, rtol=1e-3)
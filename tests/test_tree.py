@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+from dissonance.analysis.trees import Node, Tree
+
+LABELS = ["genotype", "cellname", "startdate"]
+KEYS = [
+    ("KO", "c0", "2022-01-15 10:00:00"),
+    ("KO", "c0", "2022-01-15 10:00:03"),
+    ("KO", "c1", "2022-01-15 10:00:06"),
+    ("control", "c2", "2022-01-15 10:00:09"),
+]
+
+
+def shape(node):
+    return {child.uid: shape(child) for child in node}
+
+
+def test_build_sorted_and_unsorted():
+    expected = {
+        "KO": {
+            "c0": {"2022-01-15 10:00:00": {}, "2022-01-15 10:00:03": {}},
+            "c1": {"2022-01-15 10:00:06": {}}},
+        "control": {"c2": {"2022-01-15 10:00:09": {}}}}
+
+    assert shape(Tree("Name", LABELS, KEYS)) == expected
+    # UNSORTED KEYS AND DUPLICATES MERGE INTO EXISTING NODES
+    shuffled = [KEYS[3], KEYS[1], KEYS[2], KEYS[0], KEYS[1]]
+    assert shape(Tree("Name", LABELS, shuffled)) == expected
+
+
+def test_lookup_and_paths():
+    tree = Tree("Name", LABELS, KEYS)
+    cell = tree["KO"]["c0"]
+
+    assert "c0" in tree["KO"] and cell in tree["KO"]
+    assert "c3" not in tree["KO"]
+    assert [leaf.uid for leaf in tree["KO"].leaves] == [key[2] for key in KEYS[:3]]
+    assert cell["2022-01-15 10:00:03"].path == dict(
+        Name="Name", genotype="KO", cellname="c0", startdate="2022-01-15 10:00:03")
+
+
+def test_leaves_found_by_string():
+    startdate = pd.Timestamp("2022-01-15 10:00:00")
+    tree = Tree("Name", LABELS, [("KO", "c0", startdate)])
+    assert tree["KO"]["c0"][startdate].uid == startdate
+    assert tree["KO"]["c0"][str(startdate)].uid == startdate
+
+
+def test_missing_values_share_node():
+    keys = np.array([("KO", np.nan, "a"), ("KO", np.nan, "b")], dtype=object)
+    tree = Tree("Name", LABELS, keys)
+    assert len(tree["KO"].children) == 1
+    assert len(list(tree.leaves)) == 2
+
+
+def test_missing_values_merge_when_not_adjacent():
+    tree = Tree("root", ["x", "y"], [("a", np.nan), ("b", 1.0), ("a", float("nan")), ("a", None)])
+    assert len(tree["a"].children) == 1
+    assert len(tree["b"].children) == 1
+
+
+def test_add_merges_children():
+    root = Node("Name", "root")
+    for leaf in ("a", "b"):
+        branch = Node("cellname", "c0")
+        branch.add(Node("startdate", leaf))
+        root.add(branch)
+
+    assert len(root.children) == 1
+    assert [leaf.uid for leaf in root.leaves] == ["a", "b"]
+    assert all(leaf.parent is root["c0"] for leaf in root["c0"])
+
+
+def test_paths_and_leaves_cached():
+    tree = Tree("Name", LABELS, KEYS)
+    cell = tree["KO"]["c0"]
+
+    path = cell.path
+    path["startdate"] = "changed"
+    assert cell.path == dict(Name="Name", genotype="KO", cellname="c0")
+    assert tree["KO"].path == dict(Name="Name", genotype="KO")
+
+    assert cell.leaves is cell.leaves
+    assert cell.nleaves == 2 and tree.nleaves == 4
+    assert list(cell.leafuids) == [key[2] for key in KEYS[:2]]
+    assert list(cell.subpaths)[1] == dict(zip(["Name", *LABELS], ["Name", *KEYS[1]]))
+    assert cell.leaves[0].leaves == [cell.leaves[0]]
+
+
+def test_add_resets_leaves():
+    tree = Tree("Name", LABELS, KEYS)
+    cell = tree["KO"]["c1"]
+    assert tree.nleaves == 4
+
+    cell.add(Node("startdate", "2022-01-15 10:00:12"))
+    assert cell.nleaves == 2
+    assert tree["KO"].nleaves == 4
+    assert tree.nleaves == 5
+    assert tree.leafuids[-2] == "2022-01-15 10:00:12"
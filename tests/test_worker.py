@@ -0,0 +1,121 @@
+import pytest
+from PyQt5.QtCore import QEventLoop, QThread, QTimer
+from PyQt5.QtWidgets import QApplication
+
+from dissonance.analysis import BrowsingAnalysis
+from dissonance.viewer.worker import AnalysisWorker
+
+SPLITS = ["genotype", "cellname", "lightmean", "lightamplitude"]
+
+
+@pytest.fixture
+def worker(epochio):
+    app = QApplication.instance() or QApplication([])
+    worker = AnalysisWorker(epochio, BrowsingAnalysis(SPLITS))
+    thread = QThread()
+    worker.moveToThread(thread)
+    yield worker, thread
+    thread.quit()
+    thread.wait()
+
+
+def wait_for(signal, trigger, timeout=10000):
+    """Call trigger and wait for signal. Connected first so fast results aren't missed."""
+    loop = QEventLoop()
+    signal.connect(loop.quit)
+    QTimer.singleShot(timeout, loop.quit)
+    trigger()
+    loop.exec_()
+    signal.disconnect(loop.quit)
+
+
+def test_stale_requests_dropped(worker):
+    worker, thread = worker
+    queried, prepared = [], []
+    worker.queried.connect(lambda requestid, eframe: queried.append(requestid))
+    worker.prepared.connect(lambda requestid, *args: prepared.append((requestid, *args)))
+
+    # BOTH QUEUED BEFORE THE WORKER RUNS, ONLY THE LATEST IS ANSWERED
+    first = worker.request("lightmean", [dict(cellname="20220115A_c0", tracetype="spiketrace")])
+    last = worker.request("lightmean", [dict(cellname="20220115A_c1", tracetype="spiketrace")])
+    assert worker.is_stale(first) and not worker.is_stale(last)
+
+    wait_for(worker.prepared, thread.start)
+
+    assert queried == [last]
+    requestid, level, eframe, grps = prepared[0]
+    assert (requestid, level) == (last, "lightmean")
+    assert set(eframe.cellname) == {"20220115A_c1"}
+    assert len(grps) == eframe.lightamplitude.nunique()
+
+
+def test_prepare_computes_blocks(worker, epochio):
+    worker, _ = worker
+    analysis = worker.analysis
+    eframe = epochio.query([dict(cellname="20220115A_c1", tracetype="spiketrace")], lazy=False)
+
+    # PSTHS ARE READY BEFORE PLOT IS HANDED THE GROUPS
+    grps = analysis.prepare("lightmean", eframe)
+    assert len(grps) > 0
+    assert all(epochs._psth is not None for epochs in grps.epoch)
+    assert analysis.prepare("startdate", eframe.iloc[:1]) is None
+
+
+def test_reselect_uses_cache(worker, epochio):
+    worker, thread = worker
+    thread.start()
+    queries = []
+    query = epochio.query
+    epochio.query = lambda *args, **kwargs: queries.append(1) or query(*args, **kwargs)
+
+    prepared = []
+    worker.prepared.connect(lambda requestid, level, eframe, grps: prepared.append(grps))
+    filters = [dict(cellname="20220115A_c1", tracetype="spiketrace")]
+
+    failed = []
+    worker.failed.connect(lambda requestid, message: failed.append(message))
+
+    def select():
+        wait_for(worker.prepared, lambda: worker.request("lightmean", filters))
+        assert failed == []
+
+    select()
+    select()
+    assert len(queries) == 1 and prepared[0] is prepared[1]
+
+    # UNCHECKING AN EPOCH OF THE SELECTION INVALIDATES IT
+    startdate = epochio.frame.startdate.iloc[epochio.positions(filters)[0]]
+    epochio.set_include([startdate], False)
+    select()
+    assert len(queries) == 2 and prepared[-1] is not prepared[0]
+
+    # AS DOES EDITING PARAMETERS
+    select()
+    epochio.update(filters, "celltype", "RGC\\ON-alpha")
+    select()
+    assert len(queries) == 3
+
+
+def test_cached_under_token_of_query(worker, epochio):
+    worker, thread = worker
+    thread.start()
+    filters = [dict(cellname="20220115A_c1", tracetype="spiketrace")]
+    startdate = epochio.frame.startdate.iloc[epochio.positions(filters)[0]]
+
+    # FLAGS TOGGLED AFTER THE CACHE IS CHECKED, BEFORE THE QUERY
+    compute = worker._compute
+    def toggled(*args):
+        epochio.set_include([startdate], False)
+        return compute(*args)
+    worker._compute = toggled
+
+    queried = []
+    worker.queried.connect(lambda requestid, eframe: queried.append(eframe))
+    wait_for(worker.queried, lambda: worker.request("", filters))
+    assert startdate not in set(queried[-1].startdate)
+
+    # TOGGLED BACK, THE RESULT WITHOUT THE EPOCH ISN'T SERVED
+    worker._compute = compute
+    epochio.set_include([startdate], True)
+    wait_for(worker.queried, lambda: worker.request("", filters))
+    assert startdate in set(queried[-1].startdate)